@@ -20,13 +20,15 @@ in game.py.
 You can analyze action frames by modifying algocore.py.
 
 The GameState.map object can be manually manipulated to create hypothetical 
-board states. Though, we recommended making a copy of the map to preserve 
-the actual current map state.
+board states. Do it on a copy from game_state.fork() to preserve the actual 
+current map state, or take a game_state.snapshot() and restore() it afterwards.
 """
 
 class AlgoStrategy(gamelib.AlgoCore):
     def __init__(self):
         super().__init__()
+        # Set to True to warm the path caches on a background thread during the action phase
+        self.prefetch_enabled = False
         random.seed()
 
         self.EMP_COUNT = 2
@@ -41,12 +43,17 @@ class AlgoStrategy(gamelib.AlgoCore):
         self.enemy_removed_units = []
         self.enemy_removed_units_dict = {}
         self.game_state = None
+        self.current_action = None
         self.actions = [[],[]]
         self.stationary_units = [{}, {}]
         self.flag_final_attack = False
         
         #strategy flags
         self.locs_block_and_final_attack = []
+
+        #only the enemy's events used by gamelib.Action are decoded from action frames
+        self.echo_frames = 0
+        self.subscribe(events=["spawn", "attack", "move", "breach", "selfDestruct"], players=[1])
         
 
     def on_game_start(self, config):
@@ -100,36 +107,36 @@ class AlgoStrategy(gamelib.AlgoCore):
         game engine.
         """
                 
-        #if not first turn, parse last turn's action phase strings
-        if self.game_state is not None:
-            self.parse_action_phase()          
-        
-        self.__action_strings = []
+        #last turn's action phase was parsed as its frames arrived
+        self.current_action = None
         
-        self.game_state = gamelib.AdvancedGameState(self.config, turn_state)
+        self.game_state = gamelib.AdvancedGameState(self.config, turn_state, transpositions=self.transpositions)
+        self.adopt_prefetch(self.game_state)
         gamelib.debug_write('Performing turn {} of your custom algo strategy'.format(self.game_state.turn_number))
         #self.game_state.suppress_warnings(True)  # Uncomment this line to suppress warnings.        
 
         self.starter_algo(self.game_state)        
         
         self.game_state.submit_turn()
+        self.prefetch(self.game_state)
         
     def on_action_frame(self, action_string):
-        self.__action_strings.append(action_string)
-        
-    def parse_action_phase(self):
         """
-        This function is called every turn in game state wrapper as an argument.
-        It records game_state from previous rounds. The first part records 
-        breach_info, i.e., location damaged by enemy's information unit.
-        The second part records firewalls removed by enemy. Third part
-        records FILTERS built by enemy. Fourth part records DESTRUCTORS
-        built by enemy.
+        This function is called for every frame of the action phase, as it arrives.
+        It records what the enemy did this turn: breach_info, i.e., locations 
+        damaged by enemy's information unit, firewalls removed by enemy, and 
+        firewalls built by enemy. The frame is parsed right away so nothing 
+        is left to do when the next turn starts.
         """
-        #add actions of opponent
-        self.actions[1].append(gamelib.Action(self.config, self.game_state, self.helper_map, self.__action_strings, 1))
-        #add actions of self
-        #self.actions[0].append(gamelib.Action(self.config, self.pre_game_state, self.helper_map, self.__action_strings, 0))                
+        if self.game_state is None:
+            return
+        if self.current_action is None:
+            #add actions of opponent
+            self.current_action = gamelib.Action(self.config, self.game_state, self.helper_map, player_index=1)
+            self.actions[1].append(self.current_action)
+            #add actions of self
+            #self.actions[0].append(gamelib.Action(self.config, self.game_state, self.helper_map, player_index=0))
+        self.current_action.add_frame(action_string)
 
 
     def is_firewall_horizontal(self, threshold_ratio):
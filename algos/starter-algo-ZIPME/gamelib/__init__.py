@@ -5,10 +5,16 @@ The gamelib package contains modules that assist in algo creation
 from .algocore import AlgoCore
 from .util import debug_write
 from .game_state import GameState
-from .unit import GameUnit
+from .unit import GameUnit, UnitSpec
 from .game_map import GameMap
 from .advanced_game_state import AdvancedGameState
 from .action import Action
 from .unit_group import UnitGroup
-__all__ = ["advanced_game_state", "algocore", "game_state", "game_map", "navigation", "unit", "util", "action", "unit_group"]
+from .threat_map import ThreatMap
+from .simulator import ActionSimulator
+from .planner import TurnBudget, AnytimePlanner
+from .metrics import METRICS, Metrics
+from .transposition import TranspositionCache
+from .spatial import MobileUnitIndex
+__all__ = ["advanced_game_state", "algocore", "game_state", "game_map", "navigation", "unit", "util", "action", "unit_group", "threat_map", "simulator", "planner", "metrics", "profiling", "transposition", "min_cut", "spatial"]
  
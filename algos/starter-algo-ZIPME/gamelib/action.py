@@ -1,4 +1,4 @@
-from .util import debug_write
+from .util import debug_write, decode_json
 from .unit_group import UnitGroup
 import json
 
@@ -32,12 +32,18 @@ class Action:
 
     """
 
-    def __init__(self, config, game_state, helper_map, serialized_strings, player_index):
+    def __init__(self, config, game_state, helper_map, serialized_strings=None, player_index=1):
         """ Setup a turns variables using arguments passed
 
+        Frames are consumed one at a time by add_frame as they arrive, so nothing is left to parse
+        when the next turn starts and the raw strings are not kept.
+
         Args:
             * config (JSON): A json object containing information about the game
-            * serialized_string (string): A string containing information about the game state at the start of this turn
+            * game_state (:obj: GameState): The game state of the turn this action phase follows
+            * helper_map (:obj: GameMap): The map holding the statistics updated from the action phase
+            * serialized_strings (list): Action frames received so far, as json strings or parsed dicts. Can be left empty and fed to add_frame
+            * player_index (int): The player whose actions are recorded, 0 for you 1 for the enemy
 
         """
     
@@ -79,107 +85,120 @@ class Action:
         self.BITS = 0
         self.CORES = 1
 
-        self.__parse_frames(game_state, helper_map, serialized_strings, player_index)
+        self.game_state = game_state
+        self.helper_map = helper_map
+        self.n_frames = 0
+        self.turn_number = None
+        self.firewall_spawned = [[], [], []]
+        self.removed = [[], [], []]
+        self.attacker_group_spawned = [[], [], []]
+        self.unit_id_to_unit_group = {}
+        self.__player_id = "1" if player_index == 0 else "2"
+
+        for serialized_string in serialized_strings or []:
+            self.add_frame(serialized_string)
 
     def single_player_event(self, event, player_id):
-        return filter(lambda x: x[-1] == player_id, event)
-   
+        return filter(lambda x: str(x[-1]) == player_id, event)
+
+    def add_frame(self, frame):
+        """Updates the unit groups and helper map with one action frame
+
+        Args:
+            * frame: The action frame as a json string, or already parsed into a dict
 
- 
-    def __parse_frames(self, game_state, helper_map, serialized_strings, player_index):
         """
-        Fills in map based on the serialized game state so that self.game_map[x,y] is a list of GameUnits at that location.
-        state_line is the game state as a json string.
+        if isinstance(frame, (str, bytes)):
+            frame = decode_json(frame)
+        if self.n_frames == 0:
+            self.__parse_spawn_frame(frame)
+        self.n_frames += 1
+        self.__parse_events(frame)
+
+    def __parse_spawn_frame(self, spawn_frame):
         """
-        
-        self.n_frames = len(serialized_strings)
-        spawn_frame = json.loads(serialized_strings[0])
+        Reads the resources used and the units spawned from the first frame of the action phase
+        """
+        game_state = self.game_state
+        helper_map = self.helper_map
+        player_index = self.player_index
         self.turn_number = spawn_frame["turnInfo"][1]
         if player_index == 0:
             STATS = "p1Stats"
             UNITS = "p1Units"
-            PLAYER_ID = "1"
         else:
             STATS = "p2Stats"
             UNITS = "p2Units"
-            PLAYER_ID = "2" 
-        self.health, cores, bits, time = map(float, spawn_frame[STATS])
+        self.health, cores, bits, time = map(float, spawn_frame[STATS][:4])
         units = spawn_frame[UNITS]
         self.cores_used = cores - game_state._player_resources[player_index]["cores"]
         self.bits_used = bits - game_state._player_resources[player_index]["bits"]
         
         #parse spawned units
-        self.firewall_spawned = [[], [], []]
-        self.removed = [[], [], []]
-        self.attacker_group_spawned = [[], [], []]
         information_units_spawned = [{}, {}, {}]
-        self.unit_id_to_unit_group = {}
-        for unit in self.single_player_event(spawn_frame[EVENT][SPAWN], PLAYER_ID):
+        for unit in self.single_player_event(spawn_frame[EVENT][SPAWN], self.__player_id):
             loc, unit_type_id, unit_id, play_id = unit
             x, y = map(int, loc)
-            unit_type = ALL_UNITS[int(unit_type_id)]
-            helper_map.n_units_ever_spawned[x][y][int(unit_type_id)] += 1
+            unit_type_id = int(unit_type_id)
+            unit_type = ALL_UNITS[unit_type_id]
+            helper_map.n_units_ever_spawned[x][y][unit_type_id] += 1
             if is_stationary(unit_type):
                 self.firewall_spawned[unit_type_id].append((x,y))
             elif unit_type == REMOVE:
-                helper_map.remove_turns[x][y].append(self.turn_number)
+                helper_map.remove_turn[x][y].append(self.turn_number)
                 for i in range(3):
                     for u2 in units[i]:
                         if [u2[0], u2[1]] == loc:
                             self.removed[i].append((x,y,float(u2[2])))
             else:
-                if (x,y) not in information_units_spawned[int(unit_type_id)-3]:
-                    information_units_spawned[int(unit_type_id)-3][(x,y)] = [unit_id]
-                else:
-                    information_units_spawned[int(unit_type_id)-3][(x,y)].append(unit_id)
+                information_units_spawned[unit_type_id-3].setdefault((x,y), []).append(unit_id)
         for i in range(3):
-            for key, val in information_units_spawned[i]:
+            for key, val in information_units_spawned[i].items():
                 unit_group = UnitGroup(INFORMATION_TYPES[i], [key], len(val))
                 self.attacker_group_spawned[i].append(unit_group)
                 self.unit_id_to_unit_group.update(dict.fromkeys(val, unit_group))
-        
+
+    def __parse_events(self, frame):
+        """
+        Records the damage dealt, paths, breaches and self destructs of one frame
+        """
+        helper_map = self.helper_map
+        turn_number = self.turn_number
+        events = frame[EVENT]
         #parse information unit_group path and damage dealt
-        for frame in map(json.loads, serialized_strings):
-            for attacker, receiver, damage, attacker_type_id, attacker_id, receiver_id, player_id in self.single_player_event(frame[EVENT][ATTACK], PLAYER_ID):
-                x, y = map(int, attacker)
-                x2, y2 = map(int, receiver)
-
-                if self.turn_number not in helper_map.attack_turn[x][y]:
-                    helper_map.attack_turn[x][y][game_state.turn_number] = damage
-                else:
-                    helper_map.attack_turn[x][y][game_state.turn_number] += damage
-
-                self.update_helper_map_priority_from_attack_damage(helper_map, (x, y), damage, weight= 0.3)
-
-                if self.turn_number not in helper_map.damage_turn[x][y]:
-                    helper_map.damage_turn[x2][y2][game_state.turn_number] = damage
-                else:
-                    helper_map.damage_turn[x2][y2][game_state.turn_number] += damage
-
-                self.update_helper_map_priority_from_attack_damage(helper_map, (x2, y2), damage, weight= 0.4)
-
-                if attacker_type_id in ["3", "4", "5"]:
-                    unit_group = self.unit_id_to_unit_group[attacker_id]
-                    unit_group.add_attack(float(damage))
-
-            unique_update_group = set()
-            for pre_loc, loc, not_used, unit_type_id, unit_id, player_index in self.single_player_event(frame[EVENT][MOVE], PLAYER_ID):
-                unit_group = self.unit_id_to_unit_group[unit_id]
-                x, y = map(int, loc)
-                if unit_group not in unique_update_group:
-                    unit_group.append_path((x,y))
-                    unique_update_group.add(unit_group)
-
-            for loc, damage, unit_type_id, unit_id, player_index in self.single_player_event(frame[EVENT][BREACH], PLAYER_ID):
-                unit_group = self.unit_id_to_unit_group[unit_id]
-                unit_group.add_breach(1)
-                x, y = map(int, loc)
-                helper_map.breach_turn[x][y].append(self.turn_number)
+        for attacker, receiver, damage, attacker_type_id, attacker_id, receiver_id, player_id in self.single_player_event(events[ATTACK], self.__player_id):
+            x, y = map(int, attacker)
+            x2, y2 = map(int, receiver)
+
+            helper_map.attack_turn[x][y][turn_number] = helper_map.attack_turn[x][y].get(turn_number, 0) + damage
+            self.update_helper_map_priority_from_attack_damage(helper_map, (x, y), damage, weight= 0.3)
 
+            helper_map.damage_turn[x2][y2][turn_number] = helper_map.damage_turn[x2][y2].get(turn_number, 0) + damage
+            self.update_helper_map_priority_from_attack_damage(helper_map, (x2, y2), damage, weight= 0.4)
+
+            unit_group = self.unit_id_to_unit_group.get(attacker_id)
+            if unit_group is not None:
+                unit_group.add_attack(float(damage))
+
+        unique_update_group = set()
+        for pre_loc, loc, not_used, unit_type_id, unit_id, player_index in self.single_player_event(events[MOVE], self.__player_id):
+            unit_group = self.unit_id_to_unit_group.get(unit_id)
+            x, y = map(int, loc)
+            if unit_group is not None and unit_group not in unique_update_group:
+                unit_group.append_path((x,y))
+                unique_update_group.add(unit_group)
+
+        for loc, damage, unit_type_id, unit_id, player_index in self.single_player_event(events[BREACH], self.__player_id):
+            unit_group = self.unit_id_to_unit_group.get(unit_id)
+            x, y = map(int, loc)
+            helper_map.breach_turn[x][y].append(turn_number)
+            if unit_group is not None:
+                unit_group.add_breach(1)
                 self.update_helper_map_priority_from_enemy_path(helper_map, unit_group, weight= 0.2)
 
-            for loc, receivers, damage, unit_type_id, unit_id, player_index in self.single_player_event(frame[EVENT][SELFDESTRUCT], PLAYER_ID):
-                unit_group = self.unit_id_to_unit_group[unit_id]
+        for loc, receivers, damage, unit_type_id, unit_id, player_index in self.single_player_event(events[SELFDESTRUCT], self.__player_id):
+            unit_group = self.unit_id_to_unit_group.get(unit_id)
+            if unit_group is not None:
                 unit_group.add_selfdestruct_damage(damage * len(receivers))
                 
     
@@ -188,7 +207,7 @@ class Action:
         for location in enemy_path:
             helper_map.priority[location[0]][location[1]] += weight
   
-    def update_helper_map_priority_from_attach_damage(self, helper_map, location, damage, weight= 0.2):
+    def update_helper_map_priority_from_attack_damage(self, helper_map, location, damage, weight= 0.2):
 
         helper_map.priority[location[0]][location[1]] += damage * weight
 
@@ -1,5 +1,7 @@
 from .game_state import GameState, GameUnit
-import sys
+from .game_map import CELLS, CELL_INDEX, EMPTY, get_cell_set_in_range, get_squared_distances
+from .simulator import ActionSimulator
+from .metrics import METRICS
 import warnings
 
 class AdvancedGameState(GameState):
@@ -21,66 +23,91 @@ class AdvancedGameState(GameState):
 
         """
         
-        from .game_state import SCRAMBLER, is_stationary
-
         if not isinstance(attacking_unit, GameUnit):
             warnings.warn("Passed a {} to get_target as attacking_unit. Expected a GameUnit.".format(type(attacking_unit)))
             return
 
-        attacker_location = [attacking_unit.x, attacking_unit.y]
-        possible_locations = self.game_map.get_locations_in_range(attacker_location, attacking_unit.range)
-        target = None
-        target_stationary = True
-        target_distance = sys.maxsize
-        target_stability = sys.maxsize
-        target_y = self.ARENA_SIZE
-        target_x_distance = 0
+        with METRICS.timer("get_target"):
+            index = self.game_map.get_cell_index([attacking_unit.x, attacking_unit.y])
+            if index == EMPTY:
+                warnings.warn("Attacking unit at {} is not in the arena bounds.".format([attacking_unit.x, attacking_unit.y]))
+                return None
+            return self.__pick_target(attacking_unit, index, self.__get_firewall_buckets(1 - attacking_unit.player_index))
 
-        for location in possible_locations:
-            for unit in self.game_map[location]:
-                """
-                NOTE: scrambler units cannot attack firewalls so skip them if unit is firewall
-                """
-                if unit.player_index == attacking_unit.player_index or (attacking_unit.unit_type == SCRAMBLER and is_stationary(unit)):
-                    continue
-
-                new_target = False
-                unit_stationary = unit.stationary
-                unit_distance = self.game_map.distance_between_locations(location, [attacking_unit.x, attacking_unit.y])
-                unit_stability = unit.stability
-                unit_y = unit.y
-                unit_x_distance = abs(self.HALF_ARENA - 0.5 - unit.x)
-
-                if target_stationary and not unit_stationary:
-                    new_target = True
-                elif not target_stationary and unit_stationary:
-                    continue
-                
-                if target_distance > unit_distance:
-                    new_target = True
-                elif target_distance < unit_distance and not new_target:
-                    continue
-
-                if target_stability > unit_stability:
-                    new_target = True
-                elif target_stability < unit_stability and not new_target:
-                    continue
-
-                if target_y > unit_y:
-                    new_target = True
-                elif target_y < unit_y and not new_target:
-                    continue       
-
-                if target_x_distance < unit_x_distance:
-                    new_target = True
-                
-                if new_target:
-                    target = unit
-                    target_stationary = unit_stationary
-                    target_distance = unit_distance
-                    target_stability = unit_stability
-                    target_y = unit_y
-                    target_x_distance = unit_x_distance
+    def get_all_targets(self, player_index=None):
+        """Returns the target of every unit that attacks, resolved in one pass over the board.
+        Each target is the one get_target would choose, but the enemy firewalls are bucketed by cell once 
+        and enemy information units are found through the GameMap's spatial hash, rather than scanning the range of every attacker.
+
+        Args:
+            * player_index: Only resolve the targets of this player's units, both players' by default
+
+        Returns:
+            A list of (attacker, target) pairs for every destructor and information unit, ordered row by row and 
+            in cell order within a cell. The target is None when nothing is in range.
+
+        """
+        from .game_state import DESTRUCTOR, INFORMATION_TYPES
+
+        if player_index is None:
+            players = [0, 1]
+        elif not player_index == 0 and not player_index == 1:
+            self._invalid_player_index(player_index)
+            return []
+        else:
+            players = [player_index]
+
+        targets = []
+        with METRICS.timer("get_all_targets"):
+            for player in players:
+                firewalls = self.__get_firewall_buckets(1 - player)
+                attacker_cells = set()
+                for unit_type in [DESTRUCTOR] + INFORMATION_TYPES:
+                    attacker_cells.update(self.game_map.get_cell_indices_of(unit_type, player))
+                for index in sorted(attacker_cells):
+                    for unit in self.game_map[CELLS[index]]:
+                        if unit.player_index == player and (not unit.stationary or unit.unit_type == DESTRUCTOR):
+                            targets.append((unit, self.__pick_target(unit, index, firewalls)))
+        return targets
+
+    def __get_firewall_buckets(self, player_index):
+        """Buckets a player's firewalls by cell using the GameMap's unit index
+        """
+        from .game_state import FIREWALL_TYPES
+
+        cells = set()
+        for unit_type in FIREWALL_TYPES:
+            cells.update(self.game_map.get_cell_indices_of(unit_type, player_index))
+        buckets = {}
+        for index in cells:
+            units = [unit for unit in self.game_map[CELLS[index]] if unit.player_index == player_index and unit.stationary]
+            if units:
+                buckets[index] = units
+        return buckets
+
+    def __pick_target(self, attacking_unit, index, firewalls):
+        """Picks the target of a unit on a cell, given the enemy firewall buckets
+
+        Information units come first, so firewalls are only looked at when none is in range. 
+        Among them the nearest unit wins, then the lowest stability, the lowest y and the furthest x from the center.
+        Two cells never tie on all of those, so only units sharing a cell tie and the first of them is kept, like get_target does.
+        """
+        from .game_state import SCRAMBLER
+
+        target = None
+        target_key = None
+        distances = get_squared_distances(index)
+        enemy_units = self.game_map.get_units_in_range(CELLS[index], attacking_unit.range, 1 - attacking_unit.player_index)
+        # Scrambler units cannot attack firewalls
+        if not enemy_units and not attacking_unit.unit_type == SCRAMBLER:
+            in_range = get_cell_set_in_range(index, attacking_unit.range)
+            cells = [cell for cell in firewalls if cell in in_range] if len(firewalls) < len(in_range) else [cell for cell in in_range if cell in firewalls]
+            enemy_units = [unit for cell in cells for unit in firewalls[cell]]
+        for unit in enemy_units:
+            key = (distances[CELL_INDEX[unit.x, unit.y]], unit.stability, unit.y, -abs(self.HALF_ARENA - 0.5 - unit.x))
+            if target_key is None or key < target_key:
+                target = unit
+                target_key = key
         return target
 
     def get_attackers(self, location, player_index):
@@ -113,13 +140,40 @@ class AdvancedGameState(GameState):
                     attackers.append(unit)
         return attackers
     
+    def threat_map(self, player_index):
+        """Gets the destructor threat on every location of the board in one pass
+
+        Args:
+            * player_index: The index corresponding to the defending player, 0 for you 1 for the enemy
+
+        Returns:
+            A ThreatMap holding, for every location, the number of destructors that would attack a unit
+            controlled by the given player there and the damage per frame it would take. 
+            The map is reused until the stationary units on the board change.
+
+        """
+        if not player_index == 0 and not player_index == 1:
+            self._invalid_player_index(player_index)
+        return self._get_threat_map(player_index)
+
+    def simulate_action(self, deploys=None, enemy_deploys=()):
+        """Plays out the action phase frame by frame without changing the board
+
+        Args:
+            * deploys: Your information units, a list of (unit_type, location) or (unit_type, location, num).
+              Defaults to the information units you spawned this turn.
+            * enemy_deploys: Your opponent's information units, in the same format
+
+        Returns:
+            The result of ActionSimulator.simulate, holding the breaches, health lost and firewalls destroyed
+
+        """
+        return ActionSimulator(self).simulate(deploys, enemy_deploys)
+
     def simulate_path(self, unit_group, player_index):
-        from .game_state import DESTRUCTOR, UNIT_TYPE_TO_INDEX
+        from .game_state import UNIT_TYPE_TO_INDEX
         soldier_type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[unit_group.unit_type]]
-        damage = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[DESTRUCTOR]]["damage"]
-        damage_taken = 0.
-        for loc in unit_group.path:
-            damage_taken += len(self.get_attackers(loc, player_index)) * damage / soldier_type_config["speed"]
+        damage_taken = self.threat_map(player_index).path_damage(unit_group.path) / soldier_type_config["speed"]
         remaining_soldiers = unit_group.number - damage_taken // soldier_type_config["stability"]
         breach = 0.
         selfdestruct_damage = 0.
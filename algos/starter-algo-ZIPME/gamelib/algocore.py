@@ -1,17 +1,218 @@
 import json
+import os
+import re
+import time
 
 from .game_state import GameState
-from .util import get_command, debug_write, BANNER_TEXT, send_command
+from .unit import get_unit_specs
+from .planner import TurnBudget, BackgroundWorker
+from .metrics import METRICS
+from .transposition import TranspositionCache
+from .profiling import SlowTurnProfiler, get_board_hash
+from .util import get_command, debug_write, decode_json, BANNER_TEXT, send_command
+
+CONFIG = "config"
+TURN = "turn"
+ACTION_FRAME = "action_frame"
+END = "end"
+UNKNOWN = "unknown"
+
+
+class Message:
+    """A line received from the game, decoded once
+
+    Attributes:
+        * kind (str): CONFIG, TURN, ACTION_FRAME, END or UNKNOWN
+        * data (dict): The decoded json, None if the line was not valid json
+        * raw (str): The line as it was received
+        * decode_time (float): The seconds spent decoding the line
+
+    """
+    __slots__ = ("kind", "data", "raw", "decode_time")
+
+    def __init__(self, kind, data, raw, decode_time):
+        self.kind = kind
+        self.data = data
+        self.raw = raw
+        self.decode_time = decode_time
+
+
+_raw_decoder = json.JSONDecoder()
+_key_patterns = {}
+_strings = re.compile(r'"(?:[^"\\]|\\.)*"')
+# Every action frame matches, turns, configs and end messages only if a nested value or string does
+_frame_hint = re.compile(r'"turnInfo"\s*:\s*\[\s*1\s*[,\]]')
+
+
+def _find_value(raw, key):
+    """Finds where the value of a top level key begins in raw
+
+    Candidates are found with a regular expression. Each one is then checked to be outside every string 
+    and directly inside the top level object, so keys of nested objects and text in strings are skipped.
+    """
+    pattern = _key_patterns.get(key)
+    if pattern is None:
+        pattern = re.compile(r'"{}"\s*:\s*'.format(re.escape(key)))
+        _key_patterns[key] = pattern
+    position = 0
+    depth = 0
+    for match in pattern.finditer(raw):
+        segment = raw[position:match.start()]
+        if "\\" in segment:
+            segment = _strings.sub("", segment)
+        else:
+            # Without escapes every other quote opens a string, so splitting on them is enough
+            segment = segment.split('"')
+            segment = "".join(segment[::2]) if len(segment) % 2 else '"'
+        if '"' in segment:
+            # The candidate is inside a string, the next one is measured from the same position
+            continue
+        depth += segment.count("{") + segment.count("[") - segment.count("}") - segment.count("]")
+        position = match.start()
+        if depth == 1:
+            return match.end()
+    raise KeyError(key)
+
+
+def _decode_value(raw, key):
+    """Decodes only the value of a top level key in raw
+    """
+    return _raw_decoder.raw_decode(raw, _find_value(raw, key))[0]
+
+
+class FrameEvents:
+    """The events of a FrameView, decoded the first time one is read
+
+    Event types that were not subscribed to read as empty lists, as do events of players that were not.
+    """
+    def __init__(self, raw, events=None, players=None):
+        self.__raw = raw
+        self.__events = events
+        self.__players = players
+        self.__all = None
+        self.__decoded = {}
+
+    def __getitem__(self, event):
+        decoded = self.__decoded.get(event)
+        if decoded is None:
+            decoded = []
+            if self.__events is None or event in self.__events:
+                if self.__all is None:
+                    self.__all = _decode_value(self.__raw, "events")
+                decoded = self.__all[event]
+                if self.__players is not None:
+                    decoded = [item for item in decoded if item[-1] in self.__players]
+            self.__decoded[event] = decoded
+        return decoded
+
+    def get(self, event, default=None):
+        try:
+            return self[event]
+        except KeyError:
+            return default
+
+
+class FrameView:
+    """An action frame that only decodes the parts that are read
+
+    frame[key] and frame["events"][event] decode one value of the raw json the first time 
+    they are used, so frames whose events are never read cost little more than receiving them.
+
+    Attributes:
+        * raw (str): The frame as it was received
+        * events (:obj: FrameEvents): The events of the frame
+
+    """
+    def __init__(self, raw, events=None, players=None):
+        self.raw = raw
+        self.events = FrameEvents(raw, events, players)
+        self.__values = {}
+
+    def __getitem__(self, key):
+        if key == "events":
+            return self.events
+        if key not in self.__values:
+            self.__values[key] = _decode_value(self.raw, key)
+        return self.__values[key]
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+def read_message(line, frame_filter=None):
+    """Decodes a line from the game and works out what kind of message it is
+
+    Args:
+        * line: The line received from the game
+        * frame_filter: None to decode action frames in full, or an (events, players) pair to return them as 
+          a FrameView that only decodes those events of those players. Either can be None to keep all of them.
+
+    Returns:
+        A Message. The decode_time of a FrameView only covers reading its turnInfo.
+
+    """
+    start = time.perf_counter()
+    # Other messages are decoded once in full below, the search only rules out that they are frames
+    if frame_filter is not None and _frame_hint.search(line):
+        try:
+            turn_info = _decode_value(line, "turnInfo")
+        except (KeyError, ValueError):
+            turn_info = None
+        if turn_info and int(turn_info[0]) == 1:
+            frame = FrameView(line, *frame_filter)
+            return Message(ACTION_FRAME, frame, line, time.perf_counter() - start)
+
+    try:
+        data = decode_json(line)
+    except ValueError:
+        data = None
+    decode_time = time.perf_counter() - start
+
+    kind = UNKNOWN
+    if isinstance(data, dict):
+        if "turnInfo" in data:
+            kind = {0: TURN, 1: ACTION_FRAME, 2: END}.get(int(data["turnInfo"][0]), UNKNOWN)
+        elif "replaySave" in data.get("timingAndReplay", {}):
+            kind = CONFIG
+    return Message(kind, data, line, decode_time)
+
 
 class AlgoCore(object):
     """This class handles communication with the game itself. Your strategy should subclass it.
 
     Attributes:
         * config (JSON): json object containing information about the game
+        * decode_stats (dict): For each kind of message, the number received and the total and slowest seconds spent decoding them
+        * echo_frames (int): The number of action frames written to the debug output, set it to 0 before start to skip the echo
+        * turn_budget (:obj: TurnBudget): The time left for the current turn, started when its message arrived
+        * background (:obj: BackgroundWorker): The worker started by prefetch, if one is running
+        * transpositions (:obj: TranspositionCache): Results memoized by board, kept for the whole match. 
+          Pass it to each turn's GameState, as in GameState(config, state, transpositions=self.transpositions)
+        * prefetch_enabled (bool): Whether prefetch starts a worker. Off by default, set it to True before start 
+          to precompute on a background thread during the action phase
+        * metrics (:obj: Metrics): The shared timers and counters. Set GAMELIB_METRICS to a file path 
+          to write a json line per turn and a report at the end of the match to it
+        * profiler (:obj: SlowTurnProfiler): Profiles one turn in every GAMELIB_PROFILE_EVERY, 10 by default, and the turn
+          after any slow one, and dumps the profiles of slow turns. Off unless GAMELIB_PROFILE names a directory 
+          for the dumps, see SlowTurnProfiler.from_environment
 
     """
     def __init__(self):
         self.config = None
+        self.decode_stats = {}
+        self.echo_frames = 25
+        self.turn_budget = None
+        self.background = None
+        self.transpositions = TranspositionCache()
+        self.prefetch_enabled = False
+        self.metrics = METRICS
+        if os.environ.get("GAMELIB_METRICS") and METRICS.path is None:
+            METRICS.open(os.environ["GAMELIB_METRICS"])
+        self.profiler = SlowTurnProfiler.from_environment()
+        self.__frame_filter = None
 
     def on_game_start(self, config):
         """
@@ -22,8 +223,8 @@ class AlgoCore(object):
 
     def on_turn(self, game_state):
         """
-        This step function is called every turn and is passed a string containing
-        the current game state, which can be used to initialize a new GameMap
+        This step function is called every turn and is passed the current game state,
+        already decoded from json, which can be used to initialize a new GameState
         """
         self.submit_default_turn()
 
@@ -31,6 +232,72 @@ class AlgoCore(object):
         send_command("")
         send_command("")
 
+    def on_action_frame(self, action_frame_game_state):
+        """
+        After each deploy phase, the game engine will run an action phase of the round.
+        This function is called every frame of the action phase, with the state of that frame decoded from json.
+        Override this to record what happened as the frames arrive.
+        """
+        pass
+
+    def subscribe(self, events=None, players=None):
+        """Declares which parts of the action frames on_action_frame reads
+
+        Once called, on_action_frame receives each frame as a FrameView that only decodes the events subscribed to,
+        for the players subscribed to. Other event types read as empty lists. Subscribing to no events stops 
+        on_action_frame from being called at all.
+
+        Args:
+            * events: The event types to decode, like "breach", "attack", "move" or "selfDestruct". None decodes every event type.
+            * players: The players whose events are kept, 0 for you 1 for the enemy. None keeps both.
+
+        """
+        if players is not None:
+            # Events name players 1 and 2, as a number or a string
+            players = frozenset(id for player_index in players for id in (player_index + 1, str(player_index + 1)))
+        self.__frame_filter = (None if events is None else frozenset(events), players)
+
+    def planner(self, game_state, growth=2.):
+        """Makes an AnytimePlanner for the current turn, whose deadline counts from when the turn message arrived
+
+        Args:
+            * game_state: The GameState of the current turn
+            * growth: How many times longer each refinement depth is expected to take than the previous one
+
+        Returns:
+            The planner, see AnytimePlanner.run
+
+        """
+        return game_state.planner(self.turn_budget, growth)
+
+    def prefetch(self, game_state, task=None):
+        """Precomputes for the next turn on a background thread while the action phase plays out.
+        Call it after submitting a turn, then call adopt_prefetch with the next turn's game state.
+        Does nothing unless prefetch_enabled is set.
+
+        Args:
+            * game_state: The game state that was just submitted, it should not be changed afterwards
+            * task: An optional function taking (game_state, stop_event), see BackgroundWorker
+
+        """
+        if self.prefetch_enabled:
+            self.background = BackgroundWorker(game_state, task).start()
+
+    def adopt_prefetch(self, game_state):
+        """Hands the path and threat map caches warmed in the background to the new turn's game state
+
+        Args:
+            * game_state: The game state of the new turn
+
+        Returns:
+            The result of the prefetch task if the board is the one that was expected, None otherwise
+
+        """
+        if self.background is None:
+            return None
+        background, self.background = self.background, None
+        return background.adopt(game_state)
+
     def parse_action_phase(self, game_state):
         pass        
 
@@ -43,50 +310,78 @@ class AlgoCore(object):
         """
         debug_write(BANNER_TEXT)
 
-        print_string_flag = True
-        print_nums = 25
+        print_nums = self.echo_frames
         
         while True:
             # Note: Python blocks and hangs on stdin. Can cause issues if connections aren't setup properly and may need to
             # manually kill this Python program.
-            game_state_string = get_command()
-            if "replaySave" in game_state_string:
+            line = get_command()
+            received = time.perf_counter()
+            message = read_message(line, self.__frame_filter)
+            self.__record_decode_time(message)
+            if message.kind == CONFIG:
                 """
-                This means this must be the config file. So, load in the config file as a json and add it to your AlgoStrategy class.
+                This means this must be the config file. So, add it to your AlgoStrategy class.
                 """
-                parsed_config = json.loads(game_state_string)
-                self.on_game_start(parsed_config)
-            elif "turnInfo" in game_state_string:
-                state = json.loads(game_state_string)
-                stateType = int(state.get("turnInfo")[0])
-                if stateType == 0:
-                    """
-                    This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
-                    deploy phase. Printing is handled by the provided functions.
-                    """
-                    self.on_turn(game_state_string)
-                elif stateType == 1:
-                    """
-                    If stateType == 1, this game_state_string string represents the results of an action phase
-                    """
-                    if print_string_flag and print_nums > 0:
-                        debug_write(game_state_string)
-                        print_nums -= 1
-                    
-                    self.on_action_frame(game_state_string)
-                elif stateType == 2:
-                    """
-                    This is the end game message. This means the game is over so break and finish the program.
-                    """
-                    debug_write("Got end state quitting bot.")
-                    break
-                else:
-                    """
-                    Something is wrong? Recieved an incorrect or imporperly formatted string.
-                    """
-                    debug_write("Got unexpected string with turnInfo: {}".format(game_state_string))
+                get_unit_specs(message.data)
+                self.on_game_start(message.data)
+            elif message.kind == TURN:
+                """
+                This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
+                deploy phase. Printing is handled by the provided functions.
+                """
+                self.turn_budget = TurnBudget(self.config, received)
+                if self.background is not None:
+                    self.background.stop()
+                self.__start_turn_metrics(message, received)
+                if self.profiler is not None:
+                    self.profiler.start(received)
+                with self.metrics.timer("on_turn"):
+                    self.on_turn(message.data)
+                if self.profiler is not None:
+                    self.__dump_slow_turn(message.data)
+                self.metrics.end_turn()
+            elif message.kind == ACTION_FRAME:
+                """
+                This message represents the results of an action phase
+                """
+                if print_nums > 0:
+                    debug_write(message.raw)
+                    print_nums -= 1
+                
+                if self.__frame_filter is None or not self.__frame_filter[0] == frozenset():
+                    self.on_action_frame(message.data)
+            elif message.kind == END:
+                """
+                This is the end game message. This means the game is over so break and finish the program.
+                """
+                debug_write("Got end state quitting bot.")
+                self.metrics.report()
+                break
             else:
                 """
                 Something is wrong? Recieved an incorrect or imporperly formatted string.
                 """
-                debug_write("Got unexpected string : {}".format(game_state_string))
+                debug_write("Got unexpected string : {}".format(message.raw))
+
+    def __start_turn_metrics(self, message, received):
+        turn_number = int(message.data["turnInfo"][1])
+        self.metrics.start_turn(turn_number, received)
+        self.metrics.add_time("decode", message.decode_time)
+        # my_time is how long the engine waited for our previous turn, in milliseconds
+        if turn_number > 0:
+            self.metrics.record_engine_time(turn_number - 1, float(message.data["p1Stats"][3]) / 1000.)
+
+    def __dump_slow_turn(self, state):
+        path = self.profiler.stop(int(state["turnInfo"][1]), get_board_hash(state, self.config))
+        if path is not None:
+            debug_write("Turn {} was slow, profile written to {}".format(state["turnInfo"][1], path))
+
+    def __record_decode_time(self, message):
+        stats = self.decode_stats.get(message.kind)
+        if stats is None:
+            stats = {"count": 0, "total": 0., "max": 0.}
+            self.decode_stats[message.kind] = stats
+        stats["count"] += 1
+        stats["total"] += message.decode_time
+        stats["max"] = max(stats["max"], message.decode_time)
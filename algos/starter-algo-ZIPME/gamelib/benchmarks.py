@@ -0,0 +1,159 @@
+"""
+Throughput benchmarks for the gamelib helpers that run inside a turn's time budget.
+
+Run from the algo folder with
+
+    python -m gamelib.benchmarks [path/to/game-configs.json]
+
+"""
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from .game_state import GameState
+from .game_map import CELLS, EMPTY
+from .simulator import ActionSimulator
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(__file__), "..", "..", "..", "game-configs.json")
+EMPTY_TURN = """{"p2Units":[[],[],[],[],[],[],[]],"turnInfo":[0,0,-1],"p1Stats":[30.0,25.0,5.0,0],"p1Units":[[],[],[],[],[],[],[]],"p2Stats":[30.0,25.0,5.0,0],"events":{"selfDestruct":[],"breach":[],"damage":[],"shield":[],"move":[],"spawn":[],"death":[],"attack":[],"melee":[]}}"""
+
+
+def make_board(config, firewalls=40, seed=0):
+    """Makes a GameState with random firewalls on both halves of the board
+
+    Args:
+        * config: The game config
+        * firewalls: The number of firewalls each player gets
+        * seed: The random seed, so runs are comparable
+
+    Returns:
+        The GameState
+
+    """
+    rng = random.Random(seed)
+    game_state = GameState(config, EMPTY_TURN)
+    game_map = game_state.game_map
+    types = [unit_info["shorthand"] for unit_info in config["unitInformation"][:3]]
+    for player_index, arena in [(0, game_map.get_self_arena()), (1, game_map.get_enemy_arena())]:
+        for location in rng.sample(arena, firewalls):
+            game_map.add_unit(rng.choice(types), location, player_index)
+    return game_state
+
+
+def make_deploys(game_state, count, seed=0):
+    """Makes random deploys of information units from your edges
+
+    Returns:
+        A list of count deploys, each one a list of (unit_type, location, num)
+
+    """
+    rng = random.Random(seed)
+    config = game_state.config
+    types = [unit_info["shorthand"] for unit_info in config["unitInformation"][3:6]]
+    game_map = game_state.game_map
+    edges = [location for location in game_map.get_edge_locations(game_map.BOTTOM_LEFT) + game_map.get_edge_locations(game_map.BOTTOM_RIGHT)
+             if not game_state.contains_stationary_unit(location)]
+    return [[(rng.choice(types), rng.choice(edges), rng.randint(1, 8)) for _ in range(rng.randint(1, 3))] for _ in range(count)]
+
+
+def benchmark_simulator(config, options=40, firewalls=40, repeat=3):
+    """Times ActionSimulator on a random board
+
+    Args:
+        * config: The game config
+        * options: The number of deploys simulated per run
+        * firewalls: The number of firewalls each player gets
+        * repeat: The number of runs, the fastest is reported
+
+    Returns:
+        A dict with the options simulated per second, the seconds per option and the number
+        of options that fit in waitTimeBotSoft
+
+    """
+    game_state = make_board(config, firewalls)
+    deploys = make_deploys(game_state, options)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        simulator = ActionSimulator(game_state)
+        simulator.simulate_many(deploys)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    per_option = best / options
+    budget = config["timingAndReplay"]["waitTimeBotSoft"] / 1000.
+    return {"options_per_second": options / best, "seconds_per_option": per_option, "options_in_budget": int(budget / per_option)}
+
+
+def make_turn(config, firewalls=80, information=40, seed=0):
+    """Makes a turn message holding random units for both players
+
+    Args:
+        * config: The game config
+        * firewalls: The number of firewalls each player gets
+        * information: The number of information units each player gets
+
+    Returns:
+        The turn message, decoded from json
+
+    """
+    game_map = make_board(config, firewalls, seed).game_map
+    rng = random.Random(seed)
+    state = json.loads(EMPTY_TURN)
+    keys = ["p1Units", "p2Units"]
+    for index, unit_type in enumerate(game_map.stationary_type):
+        if unit_type != EMPTY:
+            x, y = CELLS[index]
+            state[keys[game_map.stationary_owner[index]]][unit_type].append([x, y, game_map.stationary_stability[index], str(rng.random())])
+    for key, arena in [("p1Units", game_map.get_self_arena()), ("p2Units", game_map.get_enemy_arena())]:
+        for _ in range(information):
+            x, y = rng.choice(arena)
+            state[key][rng.randint(3, 5)].append([x, y, 10.0, str(rng.random())])
+    return state
+
+
+def benchmark_parse(config, firewalls=80, information=40, repeat=20):
+    """Times parsing a turn message into a GameState
+
+    Args:
+        * config: The game config
+        * firewalls: The number of firewalls each player gets
+        * information: The number of information units each player gets
+        * repeat: The number of parses, the fastest is reported
+
+    Returns:
+        A dict with the seconds per parse and the bytes allocated by the GameState's units
+
+    """
+    state = make_turn(config, firewalls, information)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        GameState(config, state)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    game_state = GameState(config, state)
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return {"seconds_per_parse": best, "bytes_allocated": allocated}
+
+
+def main(argv):
+    with open(argv[1] if len(argv) > 1 else DEFAULT_CONFIG) as config_file:
+        config = json.load(config_file)
+    for firewalls in [0, 20, 40, 80]:
+        stats = benchmark_simulator(config, firewalls=firewalls)
+        print("simulate, {} firewalls each: {:.1f} options/s, {:.2f} ms/option, {} options in waitTimeBotSoft".format(
+            firewalls, stats["options_per_second"], stats["seconds_per_option"] * 1000, stats["options_in_budget"]))
+    for firewalls in [0, 80, 160]:
+        stats = benchmark_parse(config, firewalls=firewalls)
+        print("parse, {} firewalls and 40 information units each: {:.3f} ms, {:.1f} KiB".format(
+            firewalls, stats["seconds_per_parse"] * 1000, stats["bytes_allocated"] / 1024.))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -1,7 +1,170 @@
+import copy
 import math
+import random
 import warnings
+from array import array
 from .unit import GameUnit
 
+ARENA_SIZE = 28
+HALF_ARENA = ARENA_SIZE // 2
+
+
+def _build_cell_tables():
+    """Numbers every cell of the diamond shaped board once, row by row.
+
+    Returns:
+        The cells as (x, y) tuples in flat index order, the coordinate to index
+        table and an [x][y] bounds mask
+    """
+    cells = []
+    cell_index = {}
+    bounds_mask = [[False] * ARENA_SIZE for _ in range(ARENA_SIZE)]
+    for y in range(ARENA_SIZE):
+        row_size = y + 1 if y < HALF_ARENA else ARENA_SIZE - y
+        for x in range(HALF_ARENA - row_size, HALF_ARENA + row_size):
+            cell_index[(x, y)] = len(cells)
+            cells.append((x, y))
+            bounds_mask[x][y] = True
+    return tuple(cells), cell_index, bounds_mask
+
+# CELLS[i] is the (x, y) of flat index i, CELL_INDEX maps (x, y) back to i
+CELLS, CELL_INDEX, BOUNDS_MASK = _build_cell_tables()
+NUM_CELLS = len(CELLS)
+EMPTY = -1
+# Maps the bytes of GameMap.stationary_owner to 1 where a firewall stands and 0 where the cell is open
+BLOCKED_TABLE = bytes([0 if byte == 0xff else 1 for byte in range(256)])
+
+# Zobrist keys, one random 64 bit number per (cell, owner, unit type index). The seed is fixed so hashes are stable between runs.
+_ZOBRIST_TYPES = 8
+_zobrist_random = random.Random(0x5eed)
+ZOBRIST_KEYS = tuple(_zobrist_random.getrandbits(64) for _ in range(NUM_CELLS * 2 * _ZOBRIST_TYPES))
+del _zobrist_random
+
+
+def get_zobrist_key(index, player_index, type_index):
+    """Gets the Zobrist key of a stationary unit
+
+    Args:
+        * index: The flat index of its cell
+        * player_index: Its owner, 0 or 1
+        * type_index: The index of its type in config["unitInformation"]
+
+    Returns:
+        A 64 bit integer
+
+    """
+    return ZOBRIST_KEYS[(index * 2 + player_index) * _ZOBRIST_TYPES + type_index]
+
+_range_offsets = {}
+_cells_in_range = {}
+_cells_reaching = {}
+_cell_sets_in_range = {}
+_squared_distances = [None] * NUM_CELLS
+
+
+def get_range_offsets(radius):
+    """Gets the (dx, dy) offsets of every location in range of a cell.
+
+    The stencil is computed once per radius. Like the original scan it covers x - radius 
+    to x + radius truncated to whole cells, so for fractional radii it reaches one cell 
+    further towards lower coordinates.
+
+    Args:
+        * radius: The radius of the area
+
+    Returns:
+        A tuple of (dx, dy) offsets, ordered by dx then dy
+
+    """
+    offsets = _range_offsets.get(radius)
+    if offsets is None:
+        low = -math.ceil(radius)
+        high = math.floor(radius)
+        # A unit with a given range affects all locations who's centers are within that range + 0.51 so we add 0.51 here
+        offsets = tuple((dx, dy) for dx in range(low, high + 1) for dy in range(low, high + 1)
+                        if math.sqrt(dx ** 2 + dy ** 2) < radius + 0.51)
+        _range_offsets[radius] = offsets
+    return offsets
+
+
+def get_cell_indices_in_range(index, radius):
+    """Gets the flat indices of the cells in range of a cell, clipped to the board.
+
+    Results are memoized per (cell, radius) and shared by every GameMap.
+
+    Args:
+        * index: The flat index of the center cell
+        * radius: The radius of the area
+
+    Returns:
+        A tuple of flat cell indices
+
+    """
+    key = (index, radius)
+    indices = _cells_in_range.get(key)
+    if indices is None:
+        x, y = CELLS[index]
+        indices = tuple(CELL_INDEX[(x + dx, y + dy)] for dx, dy in get_range_offsets(radius)
+                        if (x + dx, y + dy) in CELL_INDEX)
+        _cells_in_range[key] = indices
+    return indices
+
+
+def get_cell_indices_reaching(index, radius):
+    """Gets the flat indices of the cells whose range includes a cell, clipped to the board.
+
+    This is the set of locations a unit on the given cell can hit. It equals 
+    get_cell_indices_in_range for whole radii.
+
+    Args:
+        * index: The flat index of the cell being reached
+        * radius: The radius of the area
+
+    Returns:
+        A tuple of flat cell indices
+
+    """
+    key = (index, radius)
+    indices = _cells_reaching.get(key)
+    if indices is None:
+        x, y = CELLS[index]
+        indices = tuple(CELL_INDEX[(x - dx, y - dy)] for dx, dy in get_range_offsets(radius)
+                        if (x - dx, y - dy) in CELL_INDEX)
+        _cells_reaching[key] = indices
+    return indices
+
+
+def get_cell_set_in_range(index, radius):
+    """Gets the cells of get_cell_indices_in_range as a frozenset, for membership tests. Memoized the same way.
+    """
+    key = (index, radius)
+    indices = _cell_sets_in_range.get(key)
+    if indices is None:
+        indices = frozenset(get_cell_indices_in_range(index, radius))
+        _cell_sets_in_range[key] = indices
+    return indices
+
+
+def get_squared_distances(index):
+    """Gets the squared euclidean distance between a cell and every cell of the board.
+
+    Squared distances order cells the same way distances do, without a square root. 
+    The table of each cell is computed once and shared by every GameMap.
+
+    Args:
+        * index: The flat index of the cell
+
+    Returns:
+        A tuple of integers indexed by flat cell index
+
+    """
+    distances = _squared_distances[index]
+    if distances is None:
+        x, y = CELLS[index]
+        distances = tuple((x - other_x) ** 2 + (y - other_y) ** 2 for other_x, other_y in CELLS)
+        _squared_distances[index] = distances
+    return distances
+
 class GameMap:
     """Holds data about the current game map and provides functions
     useful for getting information related to the map.
@@ -9,6 +172,18 @@ class GameMap:
     game_map[x, y] will return a list of Units located at that location, 
     or an empty list if there are no units at the location
 
+    The 420 cells of the board are stored in a flat list numbered by CELL_INDEX. 
+    Alongside the unit lists, compact arrays describe the stationary unit on each 
+    cell, a set per player and unit type holds the cells with such a unit, and a 
+    MobileUnitIndex hashes the information units for nearest unit queries once one is made. 
+    They are kept up to date by add_unit, remove_unit, place_unit and 
+    game_map[x, y] = units, so append units through place_unit and move them with 
+    move_unit rather than mutating the list returned by game_map[x, y].
+
+    fork and snapshot share the unit lists instead of copying them. A shared list is 
+    copied the first time either map changes that cell, so changes never leak between 
+    a map, its forks and its snapshots. GameUnits are never copied, treat them as read only.
+
     Attributes:
         * config (JSON): Contains information about the game
         * ARENA_SIZE (int): The size of the arena.
@@ -17,6 +192,9 @@ class GameMap:
         * TOP_LEFT (int): A constant that represents the top left edge
         * BOTTOM_LEFT (int): Hidden challange! Can you guess what this constant represents???
         * BOTTOM_RIGHT (int): A constant that represents the bottom right edge
+        * stationary_owner (array): Player index of the firewall on each cell, EMPTY if there is none
+        * stationary_type (array): Unit type index of the firewall on each cell, EMPTY if there is none
+        * stationary_stability (array): Stability the firewall on each cell was placed with
 
     """
     def __init__(self, config):
@@ -33,18 +211,36 @@ class GameMap:
         self.TOP_LEFT = 1
         self.BOTTOM_LEFT = 2
         self.BOTTOM_RIGHT = 3
-        self.__map = self.__empty_grid()
+        self.__cells = [[] for _ in range(NUM_CELLS)]
+        # 1 where the unit list is this map's own, 0 where it may be shared with a fork or snapshot
+        self.__owned = bytearray(b"\x01") * NUM_CELLS
+        # id -> unit of the units placed since the last fork or snapshot, which no other map shares
+        self.__own_units = {}
+        self.__type_index = {unit_info["shorthand"]: i for i, unit_info in enumerate(config["unitInformation"])}
+        # __positions[player_index][type index] is the set of cell indices holding such a unit
+        self.__positions = [[set() for _ in self.__type_index] for _ in range(2)]
+        self.stationary_owner = array('b', [EMPTY]) * NUM_CELLS
+        self.stationary_type = array('b', [EMPTY]) * NUM_CELLS
+        self.stationary_stability = array('d', [0.0]) * NUM_CELLS
+        self.__layout_fingerprint = None
+        # The xor of the Zobrist keys of each player's stationary units
+        self.__zobrist = [0, 0]
+        # The MobileUnitIndex of the information units, built by the first query that needs it
+        self.__mobile = None
         self.__start = [13,0]
+        self.__warm_range_offsets()
     
     def __getitem__(self, location):
-        if len(location) == 2 and self.in_arena_bounds(location):
-            x,y = location
-            return self.__map[x][y]
+        index = CELL_INDEX.get(tuple(location), EMPTY)
+        if index != EMPTY:
+            return self.__cells[index]
         self._invalid_coordinates(location)
 
     def __setitem__(self, location, val):
-        if type(location) == tuple and len(location) == 2 and self.in_arena_bounds(location):
-            self.__map[location[0]][location[1]] = val
+        index = CELL_INDEX.get(location, EMPTY) if type(location) == tuple else EMPTY
+        if index != EMPTY:
+            self.__replace_cell(index, val)
+            return
         self._invalid_coordinates(location)
 
     def __iter__(self):
@@ -64,13 +260,134 @@ class GameMap:
         self.__start = new_location
         return location 
 
-    def __empty_grid(self):
-        grid = []
-        for x in range(0, self.ARENA_SIZE):
-            grid.append([])
-            for _ in range(0, self.ARENA_SIZE):
-                grid[x].append([])
-        return grid
+    def __append(self, index, unit):
+        if not self.__owned[index]:
+            self.__cells[index] = list(self.__cells[index])
+            self.__owned[index] = 1
+        self.__cells[index].append(unit)
+        self.__index_unit(index, unit)
+
+    def __replace_cell(self, index, units):
+        for unit in self.__cells[index]:
+            self.__get_positions(unit).discard(index)
+            if self.__mobile is not None:
+                self.__mobile.remove(unit)
+        self.__cells[index] = units
+        self.__owned[index] = 1
+        self.__clear_stationary(index)
+        for unit in units:
+            self.__index_unit(index, unit)
+
+    def __get_positions(self, unit):
+        if unit.player_index == 0 or unit.player_index == 1:
+            return self.__positions[unit.player_index][self.__type_index[unit.unit_type]]
+        # Units of invalid players are kept on the map but not indexed
+        return set()
+
+    def __get_mobile(self):
+        if self.__mobile is None:
+            from .spatial import MobileUnitIndex
+            self.__mobile = MobileUnitIndex()
+            for location, units in self.get_occupied():
+                index = CELL_INDEX[tuple(location)]
+                for unit in units:
+                    if getattr(unit, "stationary", None) is False and (unit.player_index == 0 or unit.player_index == 1):
+                        self.__mobile.add(unit, index)
+        return self.__mobile
+
+    def fork(self):
+        """Makes a copy of the map that can be changed without affecting this one
+
+        The copy takes time proportional to the number of cells, not units, since unit lists are 
+        only copied when one of the maps changes them.
+
+        Returns:
+            The new GameMap
+
+        """
+        fork = GameMap.__new__(GameMap)
+        fork.__dict__.update(self.__dict__)
+        fork.__cells = list(self.__cells)
+        fork.stationary_owner = array('b', self.stationary_owner)
+        fork.stationary_type = array('b', self.stationary_type)
+        fork.stationary_stability = array('d', self.stationary_stability)
+        fork.__positions = [[set(positions) for positions in player] for player in self.__positions]
+        fork.__zobrist = list(self.__zobrist)
+        fork.__mobile = None if self.__mobile is None else self.__mobile.copy()
+        self.__owned = bytearray(NUM_CELLS)
+        fork.__owned = bytearray(NUM_CELLS)
+        self.__own_units = {}
+        fork.__own_units = {}
+        return fork
+
+    def snapshot(self):
+        """Records the units on the map so restore can roll back to them
+
+        Returns:
+            An opaque snapshot to pass to restore, it can be restored any number of times
+
+        """
+        self.__owned = bytearray(NUM_CELLS)
+        self.__own_units = {}
+        return (tuple(self.__cells), array('b', self.stationary_owner), array('b', self.stationary_type),
+                array('d', self.stationary_stability), self.__layout_fingerprint,
+                tuple(tuple(frozenset(positions) for positions in player) for player in self.__positions),
+                tuple(self.__zobrist), None if self.__mobile is None else self.__mobile.copy())
+
+    def restore(self, snapshot):
+        """Rolls the map back to the units it held when snapshot was taken
+
+        Args:
+            * snapshot: A snapshot returned by this map's snapshot method
+
+        """
+        cells, owner, unit_type, stability, fingerprint, positions, zobrist, mobile = snapshot
+        self.__cells = list(cells)
+        self.__owned = bytearray(NUM_CELLS)
+        self.__own_units = {}
+        self.stationary_owner[:] = owner
+        self.stationary_type[:] = unit_type
+        self.stationary_stability[:] = stability
+        self.__layout_fingerprint = fingerprint
+        self.__positions = [[set(cell_indices) for cell_indices in player] for player in positions]
+        self.__zobrist = list(zobrist)
+        self.__mobile = None if mobile is None else mobile.copy()
+
+    def __warm_range_offsets(self):
+        for unit_info in self.config["unitInformation"]:
+            if "range" in unit_info:
+                get_range_offsets(unit_info["range"])
+        mechanics = self.config.get("mechanics", {})
+        if "selfDestructRadius" in mechanics:
+            get_range_offsets(mechanics["selfDestructRadius"])
+
+    def __index_unit(self, index, unit):
+        self.__own_units[id(unit)] = unit
+        self.__get_positions(unit).add(index)
+        # Removal units have no stationary attribute, they are neither firewalls nor information units
+        stationary = getattr(unit, "stationary", None)
+        if stationary is False and self.__mobile is not None and (unit.player_index == 0 or unit.player_index == 1):
+            self.__mobile.add(unit, index)
+        elif stationary:
+            self.__hash_stationary(index)
+            self.stationary_owner[index] = unit.player_index
+            self.stationary_type[index] = self.__type_index[unit.unit_type]
+            self.stationary_stability[index] = unit.stability
+            self.__hash_stationary(index)
+            self.__layout_fingerprint = None
+
+    def __clear_stationary(self, index):
+        self.__hash_stationary(index)
+        self.__layout_fingerprint = None
+        self.stationary_owner[index] = EMPTY
+        self.stationary_type[index] = EMPTY
+        self.stationary_stability[index] = 0.0
+
+    def __hash_stationary(self, index):
+        # Toggles the stationary unit on a cell in or out of its owner's hash
+        owner = self.stationary_owner[index]
+        if owner == 0 or owner == 1:
+            self.__zobrist[owner] ^= get_zobrist_key(index, owner, self.stationary_type[index])
 
     def _invalid_coordinates(self, location):
         warnings.warn("{} is out of bounds.".format(str(location)))
@@ -86,19 +403,7 @@ class GameMap:
         
         """
         x, y = location
-        half_board = self.HALF_ARENA
-
-        row_size = y + 1
-        startx = half_board - row_size
-        endx = startx + (2 * row_size) - 1
-        top_half_check = (y < self.HALF_ARENA and x >= startx and x <= endx)
-
-        row_size = (self.ARENA_SIZE - 1 - y) + 1
-        startx = half_board - row_size
-        endx = startx + (2 * row_size) - 1
-        bottom_half_check = (y >= self.HALF_ARENA and x >= startx and x <= endx)
-
-        return bottom_half_check or top_half_check
+        return (x, y) in CELL_INDEX
     
     def get_row(self, row):
         if row >= self.HALF_ARENA:
@@ -184,15 +489,120 @@ class GameMap:
         """
         if not self.in_arena_bounds(location):
             self._invalid_coordinates(location)
+            return
         if player_index < 0 or player_index > 1:
             warnings.warn("Player index {} is invalid. Player index should be 0 or 1.".format(player_index))
 
-        x, y = location
+        index = CELL_INDEX[tuple(location)]
         new_unit = GameUnit(unit_type, self.config, player_index, None, location[0], location[1])
         if not new_unit.stationary:
-            self.__map[x][y].append(new_unit)
+            self.__append(index, new_unit)
         else:
-            self.__map[x][y] = [new_unit]
+            self.__replace_cell(index, [new_unit])
+
+    def place_unit(self, unit):
+        """Add an existing GameUnit to the map at its own location.
+
+        Args:
+            * unit: The GameUnit to add, its x and y attributes are used as the location
+
+        Unlike add_unit this appends the unit as is, so it is used when parsing units sent by the game.
+        """
+        index = CELL_INDEX.get((unit.x, unit.y), EMPTY)
+        if index == EMPTY:
+            self._invalid_coordinates([unit.x, unit.y])
+            return
+        self.__append(index, unit)
+
+    def get_cell_index(self, location):
+        """Gets the flat index of a location, as used by the stationary_* arrays
+
+        Args:
+            * location: A map location
+
+        Returns:
+            The index of the location, or EMPTY if it is not on the board
+
+        """
+        return CELL_INDEX.get(tuple(location), EMPTY)
+
+    def get_cell_indices_of(self, unit_type, player_index=0):
+        """Gets the cells holding at least one unit of a type and player
+
+        Args:
+            * unit_type: The type of unit
+            * player_index: The player, 0 for you 1 for the enemy
+
+        Returns:
+            A frozenset of flat cell indices
+
+        """
+        return frozenset(self.__positions[player_index][self.__type_index[unit_type]])
+
+    def get_locations_of(self, unit_type, player_index=0):
+        """Gets the locations holding at least one unit of a type and player, without scanning the board
+
+        Args:
+            * unit_type: The type of unit
+            * player_index: The player, 0 for you 1 for the enemy
+
+        Returns:
+            A list of locations, ordered row by row
+
+        """
+        return [list(CELLS[index]) for index in sorted(self.__positions[player_index][self.__type_index[unit_type]])]
+
+    def count_locations_of(self, unit_type, player_index=0):
+        """Counts the locations holding at least one unit of a type and player, which for firewalls is the number of them
+        """
+        return len(self.__positions[player_index][self.__type_index[unit_type]])
+
+    def get_occupied(self):
+        """Iterates over the cells holding units, skipping the empty ones
+
+        Yields:
+            A (location, units) pair per occupied cell, ordered row by row
+
+        """
+        occupied = set()
+        for player in self.__positions:
+            for positions in player:
+                occupied.update(positions)
+        cells = self.__cells
+        for index in sorted(occupied):
+            yield list(CELLS[index]), cells[index]
+
+    def get_zobrist_hash(self, player_index=None):
+        """Gets a 64 bit hash of the stationary units on the board
+
+        The hash covers the cell, owner and type of every stationary unit, not their stability. It is 
+        updated as units are added and removed, so reading it is free, and equal boards hash equally 
+        across turns and runs.
+
+        Args:
+            * player_index: Only hash this player's stationary units, both players' by default
+
+        Returns:
+            The hash, an int
+
+        """
+        if player_index is None:
+            return self.__zobrist[0] ^ self.__zobrist[1]
+        return self.__zobrist[player_index]
+
+    def get_layout_fingerprint(self):
+        """Gets a fingerprint of which cells hold a stationary unit
+
+        The fingerprint is rebuilt only after the stationary units change, so it is cheap to use as a cache key
+        for anything that depends on the layout of firewalls, like paths.
+
+        Returns:
+            A bytes object with one byte per cell index, 1 where a firewall stands and 0 where the cell is open
+
+        """
+        if self.__layout_fingerprint is None:
+            self.__layout_fingerprint = self.stationary_owner.tobytes().translate(BLOCKED_TABLE)
+        return self.__layout_fingerprint
 
     def remove_unit(self, location):
         """Remove all units on the map in the given location.
@@ -205,9 +615,56 @@ class GameMap:
         """
         if not self.in_arena_bounds(location):
             self._invalid_coordinates(location)
+            return
         
-        x, y = location
-        self.__map[x][y] = []
+        self.__replace_cell(CELL_INDEX[tuple(location)], [])
+
+    def move_unit(self, unit, location):
+        """Moves an information unit already on the map to another location
+
+        Args:
+            * unit: The GameUnit to move
+            * location: The location it moves to
+
+        Use it to follow units through action frames, it keeps the unit indexes up to date 
+        without rebuilding either cell.
+
+        Returns:
+            The unit at its new location, None if it could not be moved. Use it rather than the unit passed in: 
+            when the unit is shared with a fork or snapshot of the map, which keep it where it was, the map moves
+            a copy instead, and references to the original, like earlier results of get_units_in_range, go stale.
+        """
+        index = CELL_INDEX.get(tuple(location), EMPTY)
+        old_index = CELL_INDEX.get((unit.x, unit.y), EMPTY)
+        if index == EMPTY:
+            self._invalid_coordinates(location)
+            return
+        if old_index == EMPTY or not any(other is unit for other in self.__cells[old_index]):
+            warnings.warn("Could not move {}, it is not on the map.".format(unit))
+            return
+        if getattr(unit, "stationary", True):
+            warnings.warn("Could not move {}, only information units move.".format(unit))
+            return
+        units = [other for other in self.__cells[old_index] if other is not unit]
+        self.__cells[old_index] = units
+        self.__owned[old_index] = 1
+        if not any(other.player_index == unit.player_index and other.unit_type == unit.unit_type for other in units):
+            self.__get_positions(unit).discard(old_index)
+        if self.__own_units.get(id(unit)) is unit:
+            unit.x, unit.y = CELLS[index]
+            self.__append(index, unit)
+            return unit
+        moved = copy.copy(unit)
+        self.__own_units[id(moved)] = moved
+        moved.x, moved.y = CELLS[index]
+        if not self.__owned[index]:
+            self.__cells[index] = list(self.__cells[index])
+            self.__owned[index] = 1
+        self.__cells[index].append(moved)
+        self.__get_positions(moved).add(index)
+        if self.__mobile is not None and unit in self.__mobile:
+            self.__mobile.replace(unit, moved, index)
+        return moved
 
     def get_locations_in_range(self, location, radius):
         """Gets locations in a circular area around a location
@@ -222,9 +679,64 @@ class GameMap:
         """
         if radius < 0 or radius > self.ARENA_SIZE:
             warnings.warn("Radius {} was passed to get_locations_in_range. Expected integer between 0 and {}".format(radius, self.ARENA_SIZE))
-        if not self.in_arena_bounds(location):
+        index = CELL_INDEX.get(tuple(location), EMPTY)
+        if index == EMPTY:
+            self._invalid_coordinates(location)
+            return self.__scan_locations_in_range(location, radius)
+        return [list(CELLS[i]) for i in get_cell_indices_in_range(index, radius)]
+
+    def get_locations_in_range_batch(self, locations, radius):
+        """Gets the locations in a circular area around each of several locations
+
+        Args:
+            * locations: The centers of our search areas
+            * radius: The radius of every search area
+
+        Returns:
+            A list holding, for each center in order, the locations within its search area
+
+        """
+        return [self.get_locations_in_range(location, radius) for location in locations]
+
+    def get_units_in_range(self, location, radius, player_index=None, unit_type=None):
+        """Gets the information units in a circular area around a location, without scanning every location in it
+
+        Args:
+            * location: The center of our search area
+            * radius: The radius of our search area, the area is the one get_locations_in_range returns
+            * player_index: Only get this player's units, both players' by default
+            * unit_type: Only get units of this type, every information type by default
+
+        Returns:
+            A list of GameUnits, nearest first
+
+        """
+        index = CELL_INDEX.get(tuple(location), EMPTY)
+        if index == EMPTY:
+            self._invalid_coordinates(location)
+            return []
+        return self.__get_mobile().get_units_in_range(index, radius, player_index, unit_type)
+
+    def get_nearest_units(self, location, k=1, player_index=None, unit_type=None):
+        """Gets the information units nearest to a location
+
+        Args:
+            * location: The location to search from
+            * k: The most units to get
+            * player_index: Only get this player's units, both players' by default
+            * unit_type: Only get units of this type, every information type by default
+
+        Returns:
+            A list of up to k GameUnits, nearest first
+
+        """
+        index = CELL_INDEX.get(tuple(location), EMPTY)
+        if index == EMPTY:
             self._invalid_coordinates(location)
+            return []
+        return self.__get_mobile().get_nearest(index, k, player_index, unit_type)
 
+    def __scan_locations_in_range(self, location, radius):
         x, y = location
         locations = []
         for i in range(int(x - radius), int(x + radius + 1)):
@@ -1,16 +1,40 @@
+import copy
 import math
 import json
 import warnings
-import queue
-
-from .navigation import ShortestPathFinder
-from .util import send_command, debug_write
-from .unit import GameUnit
-from .game_map import GameMap
+import threading
+
+from .navigation import ShortestPathFinder, PathCache
+from .util import send_command, debug_write, decode_json
+from .unit import GameUnit, get_unit_specs
+from .game_map import GameMap, CELLS, CELL_INDEX, EMPTY, NUM_CELLS
+from .threat_map import ThreatMap
+from .transposition import TranspositionCache
+from .min_cut import min_vertex_cut, UNCUTTABLE
+from .metrics import METRICS
+from .planner import AnytimePlanner, TurnBudget
 
 def is_stationary(unit_type):
     return unit_type in FIREWALL_TYPES
 
+# Units spawned on an edge path towards the edge across the board, indexed like GameMap's edge constants
+OPPOSITE_EDGE = [2, 3, 0, 1]
+
+
+def _build_half_board_neighbors():
+    # The cells around each cell that are on the same half of the board, in the order get_defense_line expands them
+    half = 28 // 2
+    neighbors = []
+    for x, y in CELLS:
+        neighbors.append(tuple(CELL_INDEX[(x + dx, y + dy)] for dx, dy in [(1,0),(1,1),(1,-1),(0,1),(0,-1),(-1,1),(-1,-1),(-1,0)]
+                               if (x + dx, y + dy) in CELL_INDEX and (y + dy < half) == (y < half)))
+    return tuple(neighbors)
+
+_HALF_BOARD_NEIGHBORS = _build_half_board_neighbors()
+# The cells a unit can step to from each cell
+_STEP_NEIGHBORS = tuple(tuple(CELL_INDEX[(x + dx, y + dy)] for dx, dy in [(1,0),(0,1),(-1,0),(0,-1)] if (x + dx, y + dy) in CELL_INDEX)
+                        for x, y in CELLS)
+
 class GameState:
     """Represents the entire gamestate for a given turn
     Provides methods related to resources and unit deployment
@@ -36,14 +60,24 @@ class GameState:
         * my_time (int): The time you took to submit your previous turn
         * enemy_health (int): Your opponents current remaining health
         * enemy_time (int): Your opponents current remaining time
+        * path_cache (:obj: PathCache): Paths found by find_path_to_edge, with hit and miss counters
+        * transpositions (:obj: TranspositionCache): Results keyed by the Zobrist hash of the board, see memoize.
+          Pass AlgoCore.transpositions to every turn's GameState to reuse them across turns
+        * submitted (bool): Whether the turn has been submitted, it can only be submitted once
+        * fork_of (:obj: GameState): The state this one was forked from, None for the turn's own state
+        * serialized_string (string or dict): The turn message as it was passed in, the json string or the 
+          dict AlgoCore already decoded it to
     """
 
-    def __init__(self, config, serialized_string):
+    def __init__(self, config, serialized_string, transpositions=None):
         """ Setup a turns variables using arguments passed
 
         Args:
             * config (JSON): A json object containing information about the game
-            * serialized_string (string): A string containing information about the game state at the start of this turn
+            * serialized_string (string): A string containing information about the game state at the start of this turn, 
+              or the dict it decodes to if it was already parsed
+            * transpositions (:obj: TranspositionCache): The cache to memoize into, a new one by default. 
+              Pass the same one every turn to reuse results while the board is unchanged
 
         """
         self.serialized_string = serialized_string
@@ -56,12 +90,19 @@ class GameState:
 
         self.game_map = GameMap(self.config)
         self._shortest_path_finder = ShortestPathFinder()
+        self.path_cache = PathCache()
+        self._threat_maps = {}
+        self.transpositions = TranspositionCache() if transpositions is None else transpositions
         self._build_stack = []
         self._deploy_stack = []
+        self.submitted = False
+        self.fork_of = None
+        self._submit_lock = threading.Lock()
         self._player_resources = [
                 {'cores': 0, 'bits': 0},  # player 0, which is you
                 {'cores': 0, 'bits': 0}]  # player 1, which is the opponent
-        self.__parse_state(serialized_string)
+        with METRICS.timer("parse_state"):
+            self.__parse_state(serialized_string)
         
         global FILTER, ENCRYPTOR, DESTRUCTOR, PING, EMP, SCRAMBLER, REMOVE, FIREWALL_TYPES, INFORMATION_TYPES, ALL_UNITS, UNIT_TYPE_TO_INDEX
         UNIT_TYPE_TO_INDEX = {}
@@ -92,11 +133,11 @@ class GameState:
     def restore_shouldnot(self):
         self.shouldnot = [[False] * self.ARENA_SIZE for _ in range(self.ARENA_SIZE)]
     
-    def set_should(self, locations = [], val):
+    def set_should(self, locations = [], val = True):
         for x, y in locations:
             self.should[x][y] = val
     
-    def set_shouldnot(self, locations = [], val):
+    def set_shouldnot(self, locations = [], val = True):
         for x, y in locations:
             self.shouldnot[x][y] = val
         
@@ -105,7 +146,7 @@ class GameState:
         Fills in map based on the serialized game state so that self.game_map[x,y] is a list of GameUnits at that location.
         state_line is the game state as a json string.
         """
-        state = json.loads(state_line)
+        state = decode_json(state_line) if isinstance(state_line, (str, bytes)) else state_line
 
         self.breach_info = state["events"]["breach"]
         self.p2_info = state["p2Units"]
@@ -136,9 +177,11 @@ class GameState:
         Helper function for __parse_state to add units to the map.
         """
         typedef = self.config.get("unitInformation")
+        specs = get_unit_specs(self.config)
         for i, unit_types in enumerate(units):
+            unit_type = typedef[i].get("shorthand")
+            spec = specs[unit_type]
             for uinfo in unit_types:
-                unit_type = typedef[i].get("shorthand")
                 sx, sy, shp = uinfo[:3]
                 x, y = map(int, [sx, sy])
                 hp = float(shp)
@@ -148,8 +191,8 @@ class GameState:
                         self.game_map[x,y][0].pending_removal = True
                     except:
                         print("Error! Program tried to die while parsing REMOVE unit")
-                unit = GameUnit(unit_type, self.config, player_number, hp, x, y)
-                self.game_map[x,y].append(unit)
+                unit = GameUnit(unit_type, self.config, player_number, hp, x, y, spec)
+                self.game_map.place_unit(unit)
 
     def __resource_required(self, unit_type):
         return self.CORES if is_stationary(unit_type) else self.BITS
@@ -172,55 +215,167 @@ class GameState:
     def _invalid_unit(self, unit):
         warnings.warn("Invalid unit {}".format(unit))
 
+    def memoize(self, key, compute, player_index=None):
+        """Gets a result that only depends on the stationary units, reusing it while they are unchanged
+
+        Args:
+            * key: Identifies the query and its arguments, like ("defense_line", 1)
+            * compute: A function without arguments that computes the result on a miss
+            * player_index: Set it if the result only depends on this player's stationary units, 
+              so it is also reused while the other player's change
+
+        Returns:
+            The result, shared with other callers so it should not be changed
+
+        """
+        return self.transpositions.memoize((key, player_index, self.game_map.get_zobrist_hash(player_index)), compute)
+
     #added by zzy
     def get_defense_line(self, player_index = 1):
-        dist = [[float('inf')] * self.ARENA_SIZE for _ in range(self.ARENA_SIZE)]
-        from_which = [[None] * self.ARENA_SIZE for _ in range(self.ARENA_SIZE)]
-        visited = [[False] * self.ARENA_SIZE for _ in range(self.ARENA_SIZE)]
-        start = (0, self.HALF_ARENA - 1 + player_index)
-        end = (self.ARENA_SIZE - 1, self.HALF_ARENA - 1 + player_index)
-        visited = [[False] * self.ARENA_SIZE for _ in range(self.ARENA_SIZE)]
-        distance = 0
-        if not self.contains_stationary_unit(start):
-            distance += 1
-        dist[start[0]][start[1]] = distance
-        layer = [queue.Queue() for _ in range(self.ARENA_SIZE+1)]
-        layer[distance].put(start)
-        flag_done = False
-        while not flag_done:
-            while not layer[distance].empty():
-                x, y = layer[distance].get()
-                if visited[x][y]:
+        # Any firewall blocks the line, including ones of the other player on this half, so it is keyed by the whole board
+        return list(self.memoize(("defense_line", player_index), lambda: self.__find_defense_line(player_index)))
+
+    def __find_defense_line(self, player_index):
+        # A 0-1 BFS where entering an open cell costs 1 and a blocked one 0. Cells are expanded in the 
+        # same order as the original layered search, so ties resolve to the same line.
+        blocked = self.game_map.stationary_owner
+        start = CELL_INDEX[(0, self.HALF_ARENA - 1 + player_index)]
+        end = CELL_INDEX[(self.ARENA_SIZE - 1, self.HALF_ARENA - 1 + player_index)]
+        dist = [NUM_CELLS] * NUM_CELLS
+        from_which = [EMPTY] * NUM_CELLS
+        visited = bytearray(NUM_CELLS)
+        distance = 0 if blocked[start] != EMPTY else 1
+        dist[start] = distance
+        layer = [start]
+        found = False
+        while not found:
+            next_layer = []
+            position = 0
+            # Cells reached at no cost join the layer being expanded, the others the next one
+            while position < len(layer):
+                index = layer[position]
+                position += 1
+                if visited[index]:
                     continue
-                visited[x][y] = True
-                if (x, y) == end:
-                    flag_done = True
+                visited[index] = 1
+                if index == end:
+                    found = True
                     break
-                for dx, dy in [(1,0),(1,1),(1,-1),(0,1),(0,-1),(-1,1),(-1,-1),(-1,0)]:
-                    x2, y2 = x + dx, y + dy
-                    if not self.game_map.in_arena_bounds((x2,y2)):
-                        continue
-                    if player_index == 1 and y2 < self.HALF_ARENA or player_index == 0 and y2 >= self.HALF_ARENA:
-                        continue
-                    if visited[x2][y2]:
+                for neighbor in _HALF_BOARD_NEIGHBORS[index]:
+                    if visited[neighbor]:
                         continue
-                    distance2 = distance
-                    #gamelib.debug_write('{},{} distance:{}\n'.format(x2,y2,distance2))
-                    if not self.contains_stationary_unit((x2,y2)):
-                        distance2 += 1
-                    if distance2 < dist[x2][y2]:
-                        dist[x2][y2] = distance2
-                        from_which[x2][y2] = x, y
-                    layer[distance2].put((x2, y2))                   
+                    if blocked[neighbor] != EMPTY:
+                        if distance < dist[neighbor]:
+                            dist[neighbor] = distance
+                            from_which[neighbor] = index
+                            layer.append(neighbor)
+                    elif distance + 1 < dist[neighbor]:
+                        dist[neighbor] = distance + 1
+                        from_which[neighbor] = index
+                        next_layer.append(neighbor)
+            layer = next_layer
             distance += 1
-        line = []
-        p = end
-        line.append(p)
-        while p != start:
-            p = from_which[p[0]][p[1]]
-            line.append(p)
+        line = [CELLS[end]]
+        index = end
+        while index != start:
+            index = from_which[index]
+            line.append(CELLS[index])
         return line
-            
+
+    def get_defense_lines(self):
+        """Gets the defense line and its openings for both players in one call
+
+        Returns:
+            A list indexed by player of (defense_line, openings), as returned by get_defense_line and get_openings
+
+        """
+        lines = []
+        for player_index in [0, 1]:
+            line = self.get_defense_line(player_index)
+            lines.append((line, self.get_openings(line)))
+        return lines
+
+    def plan_wall(self, unit_type=None, sources=None, sinks=None, keep_open=(), funnel=None):
+        """Finds the cheapest firewalls to build so enemy information units cannot reach your edges,
+        or can only get there through one funnel
+
+        This is a minimum cut of the board between sources and sinks, so it can wall deeper in your half than
+        the row next to the enemy when that is cheaper. Only open cells on your half can be built on, except 
+        the ones marked with set_shouldnot or given in keep_open.
+
+        Args:
+            * unit_type: The firewall to build, FILTER by default. Its cost is the cost of blocking a cell.
+            * sources: The locations enemy units start from, the enemy's edges by default
+            * sinks: The locations they try to reach, your edges by default
+            * keep_open: Locations that must not be built on
+            * funnel: An open location on your half to leave as the only way through, like in front of destructors.
+              The cells just above and below it are kept open too.
+
+        Returns:
+            A dict with "locations", the locations to build on ordered row by row, and "cost", their total cost. 
+            None if there is no such wall.
+
+        """
+        unit_type = FILTER if unit_type is None else unit_type
+        if unit_type not in FIREWALL_TYPES:
+            self._invalid_unit(unit_type)
+            return None
+        game_map = self.game_map
+        if sources is None:
+            sources = game_map.get_edge_locations(game_map.TOP_LEFT) + game_map.get_edge_locations(game_map.TOP_RIGHT)
+        if sinks is None:
+            sinks = game_map.get_edge_locations(game_map.BOTTOM_LEFT) + game_map.get_edge_locations(game_map.BOTTOM_RIGHT)
+        cost = self.type_cost(unit_type)
+        keep_open = set(CELL_INDEX.get(tuple(location), EMPTY) for location in keep_open)
+        costs = []
+        for index, (x, y) in enumerate(CELLS):
+            if game_map.stationary_owner[index] != EMPTY:
+                costs.append(None)
+            elif y < self.HALF_ARENA and not self.shouldnot[x][y] and index not in keep_open:
+                costs.append(cost)
+            else:
+                costs.append(UNCUTTABLE)
+        source_cells = [CELL_INDEX[tuple(location)] for location in sources if tuple(location) in CELL_INDEX]
+        sink_cells = [CELL_INDEX[tuple(location)] for location in sinks if tuple(location) in CELL_INDEX]
+
+        if funnel is not None:
+            x, y = funnel
+            entry, index, exit = (CELL_INDEX.get((x, y + 1), EMPTY), CELL_INDEX.get((x, y), EMPTY), CELL_INDEX.get((x, y - 1), EMPTY))
+            if y >= self.HALF_ARENA or EMPTY in (entry, index, exit) or None in (costs[entry], costs[index], costs[exit]):
+                warnings.warn("Could not funnel through {}, it and the cells above and below it must be open and on your half.".format(funnel))
+                return None
+            # Every other way through is cut, with the funnel's entry joined to the sources and its exit to the sinks
+            costs[entry] = costs[exit] = UNCUTTABLE
+            costs[index] = None
+            source_cells.append(entry)
+            sink_cells.append(exit)
+
+        found = min_vertex_cut(costs, _STEP_NEIGHBORS, source_cells, sink_cells)
+        if found is None:
+            return None
+        total, cut = found
+        if funnel is not None and not self.__reaches(source_cells[:-1], sink_cells[:-1], costs, set(cut)):
+            warnings.warn("Could not funnel through {}, the cheapest wall also cuts it off.".format(funnel))
+            return None
+        return {"locations": [list(CELLS[index]) for index in cut], "cost": total}
+
+    def __reaches(self, sources, sinks, costs, cut):
+        # Checks if units can walk from a source to a sink when the cut is built, the funnel being open
+        costs = [UNCUTTABLE if cost is None and self.game_map.stationary_owner[index] == EMPTY else cost
+                 for index, cost in enumerate(costs)]
+        sinks = set(sinks)
+        seen = set(index for index in sources if costs[index] is not None and index not in cut)
+        stack = list(seen)
+        while stack:
+            index = stack.pop()
+            if index in sinks:
+                return True
+            for neighbor in _STEP_NEIGHBORS[index]:
+                if neighbor not in seen and costs[neighbor] is not None and neighbor not in cut:
+                    seen.add(neighbor)
+                    stack.append(neighbor)
+        return False
+
     #added by zzy
     def get_openings(self, defense_line):
         return list(filter(lambda x: not self.contains_stationary_unit(x), defense_line))
@@ -240,10 +395,88 @@ class GameState:
         Must be called at the end of your turn or the algo will hang.
         
         """
-        build_string = json.dumps(self._build_stack)
-        deploy_string = json.dumps(self._deploy_stack)
-        send_command(build_string)
-        send_command(deploy_string)
+        self._submit(self._build_stack, self._deploy_stack)
+
+    def _submit(self, build_stack, deploy_stack):
+        """Sends the given stacks as this turn's build and deploy phases, unless the turn was already submitted.
+        An AnytimePlanner may submit from its watchdog thread, so this is done under a lock.
+        """
+        if self.fork_of is not None:
+            warnings.warn("A fork cannot be submitted, pass its stacks to the state it was forked from instead.")
+            return False
+        with self._submit_lock:
+            if self.submitted:
+                warnings.warn("The turn was already submitted, ignoring the new submission.")
+                return False
+            self.submitted = True
+            with METRICS.timer("submit"):
+                send_command(json.dumps(build_stack))
+                send_command(json.dumps(deploy_stack))
+            METRICS.mark_submitted()
+        return True
+
+    def planner(self, budget=None, growth=2.):
+        """Makes an AnytimePlanner that refines this turn and submits the best plan before the deadline
+
+        Args:
+            * budget: The TurnBudget of the turn. By default one starting now, AlgoCore.planner passes 
+              the one started when the turn message arrived.
+            * growth: How many times longer each refinement depth is expected to take than the previous one
+
+        Returns:
+            The planner, its watchdog is already running
+
+        """
+        return AnytimePlanner(self, TurnBudget(self.config) if budget is None else budget, growth)
+
+    def fork(self):
+        """Makes a copy of the state to try out hypothetical spawns and boards on
+
+        The map is copied on write, see GameMap.fork, so forking is cheap enough to do thousands of 
+        times a turn. The build and deploy stacks and resources are copied, and the path cache is 
+        shared since it is keyed by layout. A fork cannot be submitted, hand the stacks of the one 
+        you pick to the original state or to an AnytimePlanner.
+
+        Returns:
+            The new GameState
+
+        """
+        fork = copy.copy(self)
+        fork.game_map = self.game_map.fork()
+        fork._build_stack = list(self._build_stack)
+        fork._deploy_stack = list(self._deploy_stack)
+        fork._player_resources = [dict(resources) for resources in self._player_resources]
+        fork._threat_maps = dict(self._threat_maps)
+        fork.should = [list(row) for row in self.should]
+        fork.shouldnot = [list(row) for row in self.shouldnot]
+        fork.fork_of = self
+        return fork
+
+    def snapshot(self):
+        """Records the map, stacks and resources so restore can roll back to them
+
+        Returns:
+            An opaque snapshot to pass to restore, it can be restored any number of times
+
+        """
+        return (self.game_map.snapshot(), tuple(self._build_stack), tuple(self._deploy_stack),
+                [dict(resources) for resources in self._player_resources],
+                [list(row) for row in self.should], [list(row) for row in self.shouldnot])
+
+    def restore(self, snapshot):
+        """Rolls the map, stacks and resources back to when snapshot was taken
+
+        Args:
+            * snapshot: A snapshot returned by this state's snapshot method
+
+        """
+        game_map, build_stack, deploy_stack, player_resources, should, shouldnot = snapshot
+        self.game_map.restore(game_map)
+        self._build_stack[:] = build_stack
+        self._deploy_stack[:] = deploy_stack
+        self._player_resources = [dict(resources) for resources in player_resources]
+        self.should = [list(row) for row in should]
+        self.shouldnot = [list(row) for row in shouldnot]
 
     def get_resource(self, resource_type, player_index = 0):
         """Gets a players resources
@@ -464,11 +697,161 @@ class GameState:
             to get from it's starting location to the best available end location
 
         """
-        if self.contains_stationary_unit(start_location):
-            warnings.warn("Attempted to perform pathing from blocked starting location {}".format(start_location))
-            return
-        end_points = self.game_map.get_edge_locations(target_edge)
-        return self._shortest_path_finder.navigate_multiple_endpoints(start_location, end_points, self)
+        return self.find_paths_to_edge([start_location], target_edge)[0]
+
+    def find_paths_to_edge(self, start_locations, target_edge):
+        """Gets the paths units at several locations would take, sharing the work between them
+
+        Args:
+            * start_locations: A list of locations of hypothetical units. Pass None to use every location 
+              of the edge opposite target_edge, which are the spawn locations for that target.
+            * target_edge: The edge the units want to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc.
+
+        Returns:
+            A list with the path of each start location, in the same order, as find_path_to_edge would 
+            return it. Locations blocked by a firewall get None.
+
+        """
+        if start_locations is None:
+            start_locations = self.game_map.get_edge_locations(OPPOSITE_EDGE[target_edge])
+        fingerprint = self.game_map.get_layout_fingerprint()
+        paths = [None] * len(start_locations)
+        missing = []
+        for i, start_location in enumerate(start_locations):
+            if self.contains_stationary_unit(start_location):
+                warnings.warn("Attempted to perform pathing from blocked starting location {}".format(start_location))
+                continue
+            path = self.path_cache.get((fingerprint, tuple(start_location), target_edge))
+            if path is None:
+                missing.append(i)
+            else:
+                paths[i] = [start_location] + [list(location) for location in path[1:]]
+
+        if missing:
+            end_points = self.game_map.get_edge_locations(target_edge)
+            found = self._shortest_path_finder.navigate_multiple_starts([start_locations[i] for i in missing], end_points, self)
+            for i, path in zip(missing, found):
+                self.path_cache.put((fingerprint, tuple(start_locations[i]), target_edge), tuple(map(tuple, path)))
+                paths[i] = path
+        return paths
+
+    def get_pockets(self):
+        """Gets the pockets of pathable space on the current board
+
+        Use it to check which spawn locations can reach an edge, or where units that cannot will self destruct,
+        without pathing each one. For example get_pockets().get_self_destructs(locations, game_map.TOP_RIGHT).
+
+        Returns:
+            A PocketMap of the current layout of firewalls, shared with the pathfinder and only valid until the board changes
+
+        """
+        pockets = self._shortest_path_finder.pockets
+        pockets.sync(self.game_map.get_layout_fingerprint())
+        return pockets
+
+    def evaluate_placements(self, candidates, metric="exposure", player_index=1):
+        """Scores hypothetical firewall placements and removals without changing the board or your turn
+
+        Each candidate is applied to a copy of the current firewall layout, then the paths units of player_index
+        would take from every location of their spawn edges are found on it. Those units are assumed to take 
+        the path that breaches with the least destructor exposure, or the least exposed path if none breach.
+        Pathlengths and destructor ranges are repaired from one candidate to the next rather than recomputed.
+
+        Args:
+            * candidates: A list of candidates. A candidate is a (unit_type, location) pair, or a list of pairs 
+              to evaluate together. Use REMOVE as the unit_type to evaluate removing the firewall at location.
+              Placing on an occupied location replaces the firewall there. A placement belongs to the player 
+              whose half it is on, so only destructors of the other player change the exposure.
+            * metric: The name of a result field to use as the score, or a function that takes a result and returns its score
+            * player_index: The player whose units path across the board. 1 (the default) evaluates enemy attacks against you
+
+        Returns:
+            A list with a dict for each candidate, in the same order, holding:
+                * candidate: The candidate
+                * path: The path the units would take, or None if every spawn location is blocked
+                * path_length: The number of steps in that path
+                * breach_edge: The edge that path reaches, or None if the units would self destruct
+                * exposure: The destructor damage per frame summed over every location of that path
+                * breaches: The number of spawn locations with a path that reaches its target edge
+                * score: The candidate's value under metric
+
+        """
+        if not player_index == 1 and not player_index == 0:
+            self._invalid_player_index(player_index)
+        if player_index == 1:
+            spawn_edges = [self.game_map.TOP_LEFT, self.game_map.TOP_RIGHT]
+        else:
+            spawn_edges = [self.game_map.BOTTOM_LEFT, self.game_map.BOTTOM_RIGHT]
+        routes = []
+        for spawn_edge in spawn_edges:
+            target_edge = OPPOSITE_EDGE[spawn_edge]
+            routes.append((self.game_map.get_edge_locations(spawn_edge), target_edge, self.game_map.get_edge_locations(target_edge)))
+
+        base_layout = self.game_map.get_layout_fingerprint()
+        base_threat = self._get_threat_map(player_index)
+        destructor_type = UNIT_TYPE_TO_INDEX[DESTRUCTOR]
+        attacker = 1 - player_index
+        results = []
+        for candidate in candidates:
+            changes = [candidate] if isinstance(candidate[0], str) else candidate
+            layout = bytearray(base_layout)
+            added = []
+            removed = []
+            for unit_type, location in changes:
+                index = CELL_INDEX.get(tuple(location), EMPTY)
+                if index == EMPTY:
+                    warnings.warn("Candidate location {} is out of bounds.".format(location))
+                    continue
+                if unit_type == REMOVE:
+                    layout[index] = 0
+                    removed.append(index)
+                elif is_stationary(unit_type):
+                    layout[index] = 1
+                    if unit_type == DESTRUCTOR:
+                        # The threat map only holds the attacker's destructors, so the defender's own are left out
+                        if int(location[1] >= self.HALF_ARENA) == attacker:
+                            added.append(index)
+                    elif self.game_map.stationary_type[index] == destructor_type:
+                        removed.append(index)
+                else:
+                    self._invalid_unit(unit_type)
+            threat = base_threat.adjusted(added, removed) if added or removed else base_threat
+
+            best = None
+            breaches = 0
+            for starts, target_edge, end_points in routes:
+                for path in self._shortest_path_finder.navigate_layout(starts, end_points, layout):
+                    if path is None:
+                        continue
+                    breach = path[-1] in end_points
+                    breaches += breach
+                    option = (not breach, threat.path_damage(path), len(path) - 1, path, target_edge if breach else None)
+                    if best is None or option[:3] < best[:3]:
+                        best = option
+
+            result = {"candidate": candidate, "path": None, "path_length": None, "breach_edge": None, "exposure": None, "breaches": breaches}
+            if best is not None:
+                result.update({"path": best[3], "path_length": best[2], "breach_edge": best[4], "exposure": best[1]})
+            result["score"] = metric(result) if callable(metric) else result[metric]
+            results.append(result)
+        return results
+
+    def _get_threat_map(self, player_index):
+        """Gets the ThreatMap of the destructors attacking player_index's units, 
+        reusing it until the stationary units on the board change
+        """
+        game_map = self.game_map
+        key = (game_map.stationary_owner.tobytes(), game_map.stationary_type.tobytes())
+        cached = self._threat_maps.get(player_index)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        destructor_index = UNIT_TYPE_TO_INDEX[DESTRUCTOR]
+        destructor_config = self.config["unitInformation"][destructor_index]
+        destructors = sorted(game_map.get_cell_indices_of(DESTRUCTOR, 1 - player_index))
+        threat = ThreatMap(player_index, destructors, destructor_config["range"], destructor_config["damage"])
+        self._threat_maps[player_index] = (key, threat)
+        return threat
 
     def contains_stationary_unit(self, location):
         """Check if a location is blocked
@@ -481,6 +864,9 @@ class GameState:
             
         """
         x, y = map(int, location)
+        index = CELL_INDEX.get((x, y), EMPTY)
+        if index != EMPTY and self.game_map.stationary_owner[index] == EMPTY:
+            return False
         for unit in self.game_map[x,y]:
             if unit.stationary:
                 return unit
@@ -0,0 +1,214 @@
+import json
+import threading
+import time
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+
+def percentiles(values, points=(50, 90, 99)):
+    """Gets nearest rank percentiles of a list of numbers
+
+    Args:
+        * values: The numbers
+        * points: The percentiles wanted
+
+    Returns:
+        A dict with a "p<point>" entry for each point and "max", all None if there are no values
+
+    """
+    ordered = sorted(values)
+    result = {}
+    for point in points:
+        result["p{}".format(point)] = ordered[min(len(ordered) - 1, max(0, -(-point * len(ordered) // 100) - 1))] if ordered else None
+    result["max"] = ordered[-1] if ordered else None
+    return result
+
+
+class Metrics:
+    """Named timers and counters, summarized per turn and reported at the end of the match
+
+    Timers and counters only record while a turn is running, so work done between turns does not skew the turns.
+    Every summary is written as one json line to the output file, if there is one.
+    They can be used from several threads. Threads that call ignore_thread, like BackgroundWorker's, record nothing,
+    so work they finish after the next turn started is not counted in it.
+
+    Attributes:
+        * enabled (bool): Whether timers and counters record anything
+        * turns (list): The summary of every finished turn
+        * engine_times (dict): The time the engine measured for each turn, in seconds, by turn number
+        * path (str): The JSONL file summaries are written to, None to keep them in memory only
+
+    """
+    def __init__(self, enabled=True, path=None):
+        self.enabled = enabled
+        self.turns = []
+        self.engine_times = {}
+        self.path = None
+        self._file = None
+        self._turn = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if path is not None:
+            self.open(path)
+
+    def open(self, path):
+        """Starts writing summaries to a JSONL file, appending to it if it exists
+        """
+        self.close()
+        self.path = path
+        self._file = open(path, "a")
+
+    def close(self):
+        """Stops writing summaries to the file
+        """
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+        self.path = None
+
+    def timer(self, name):
+        """Gets a context manager that adds the time spent inside it to the timer called name
+
+        Usage:
+            with METRICS.timer("pathfinding"):
+                ...
+
+        """
+        if not self.enabled or self._turn is None or getattr(self._local, "ignored", False):
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def ignore_thread(self):
+        """Stops recording timers and counters of the calling thread
+        """
+        self._local.ignored = True
+
+    def add_time(self, name, seconds):
+        """Adds one call taking the given number of seconds to the timer called name
+        """
+        if not self.enabled or self._turn is None or getattr(self._local, "ignored", False):
+            return
+        with self._lock:
+            turn = self._turn
+            if turn is None:
+                return
+            timer = turn["timers"].get(name)
+            if timer is None:
+                turn["timers"][name] = {"calls": 1, "seconds": seconds}
+            else:
+                timer["calls"] += 1
+                timer["seconds"] += seconds
+
+    def count(self, name, amount=1):
+        """Adds amount to the counter called name
+        """
+        if not self.enabled or self._turn is None or getattr(self._local, "ignored", False):
+            return
+        with self._lock:
+            turn = self._turn
+            if turn is None:
+                return
+            turn["counters"][name] = turn["counters"].get(name, 0) + amount
+
+    def start_turn(self, turn_number, start=None):
+        """Starts recording a turn
+
+        Args:
+            * turn_number: The turn number
+            * start: The time.perf_counter() at which the turn's message arrived, now by default
+
+        """
+        turn = {"type": "turn", "turn": turn_number, "start": time.perf_counter() if start is None else start,
+                      "submitted": None, "timers": {}, "counters": {}}
+        with self._lock:
+            self._turn = turn
+
+    def mark_submitted(self):
+        """Records that the turn was sent to the engine, the end of its latency
+        """
+        with self._lock:
+            if self._turn is not None and self._turn["submitted"] is None:
+                self._turn["submitted"] = time.perf_counter()
+
+    def end_turn(self):
+        """Finishes recording the turn and writes its summary
+
+        Returns:
+            The summary, holding the turn number, its latency from the message arriving until it was submitted
+            and the calls and seconds of every timer and the value of every counter. None if no turn was running.
+
+        """
+        with self._lock:
+            turn, self._turn = self._turn, None
+        if turn is None:
+            return None
+        end = turn.pop("submitted") or time.perf_counter()
+        turn["latency"] = end - turn.pop("start")
+        self.turns.append(turn)
+        self._write(turn)
+        return turn
+
+    def record_engine_time(self, turn_number, seconds):
+        """Records the time the engine measured for a turn, as reported in a later turn's my_time
+        """
+        self.engine_times[turn_number] = seconds
+
+    def report(self):
+        """Summarizes the match and writes the summary
+
+        Returns:
+            A dict holding the number of turns, percentiles of the turn latency and of the seconds per turn
+            of every timer, the total of every counter, and the gap between the engine's time and ours,
+            which is the time spent in I/O and waiting on the engine
+
+        """
+        timers = {}
+        counters = {}
+        for turn in self.turns:
+            for name, timer in turn["timers"].items():
+                timers.setdefault(name, []).append(timer["seconds"])
+            for name, value in turn["counters"].items():
+                counters[name] = counters.get(name, 0) + value
+        overhead = [self.engine_times[turn["turn"]] - turn["latency"] for turn in self.turns if turn["turn"] in self.engine_times]
+        report = {"type": "report", "turns": len(self.turns),
+                  "latency": percentiles([turn["latency"] for turn in self.turns]),
+                  "timers": {name: percentiles(values) for name, values in timers.items()},
+                  "counters": counters,
+                  "engine_overhead": percentiles(overhead)}
+        self._write(report)
+        return report
+
+    def _write(self, record):
+        if self._file is not None:
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+
+
+# Shared by gamelib and the strategy, AlgoCore opens its output file when GAMELIB_METRICS names one
+METRICS = Metrics()
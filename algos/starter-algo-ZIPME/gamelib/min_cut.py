@@ -0,0 +1,152 @@
+from collections import deque
+
+# Cells that cannot be blocked get this cost
+UNCUTTABLE = float("inf")
+
+
+def min_vertex_cut(costs, neighbors, sources, sinks):
+    """Finds the cheapest set of cells whose removal disconnects every source from every sink
+
+    Each cell is split into an in and out node joined by an arc of its cost, and neighboring cells are
+    joined by uncapacitated arcs, so a minimum cut of the flow network is a minimum cost set of cells.
+    Cells connected to a source or sink through cells that cannot be blocked are merged into it first,
+    then the maximum flow is found with Dinic's algorithm.
+
+    Args:
+        * costs: The cost of blocking each cell, UNCUTTABLE if it cannot be blocked, None if it is already blocked
+        * neighbors: For each cell, the cells a unit can move to from it
+        * sources: The cells units start from
+        * sinks: The cells units are trying to reach
+
+    Returns:
+        A (cost, cells) pair, the total cost and the sorted cells to block. None if the sources and sinks
+        cannot be separated without blocking an UNCUTTABLE cell.
+
+    """
+    num_cells = len(costs)
+    source_region = _flood(costs, neighbors, sources)
+    sink_region = _flood(costs, neighbors, sinks)
+    if source_region & sink_region:
+        return None
+    # Large enough that a cut through it is never cheapest, and finite so flows stay exact
+    infinite = sum(cost for cost in costs if cost is not None and cost != UNCUTTABLE) + 1.
+    source = 2 * num_cells
+    sink = source + 1
+    head = [[] for _ in range(sink + 1)]
+    to = []
+    capacity = []
+
+    def add_arc(start, end, amount):
+        head[start].append(len(to))
+        to.append(end)
+        capacity.append(amount)
+        head[end].append(len(to))
+        to.append(start)
+        capacity.append(0.)
+
+    for cell in range(num_cells):
+        cost = costs[cell]
+        if cost is None or cell in sink_region:
+            continue
+        if cell in source_region:
+            for neighbor in neighbors[cell]:
+                if neighbor in sink_region:
+                    return None
+                if costs[neighbor] is not None and neighbor not in source_region:
+                    add_arc(source, 2 * neighbor, infinite)
+            continue
+        add_arc(2 * cell, 2 * cell + 1, infinite if cost == UNCUTTABLE else cost)
+        for neighbor in neighbors[cell]:
+            if costs[neighbor] is None or neighbor in source_region:
+                continue
+            add_arc(2 * cell + 1, sink if neighbor in sink_region else 2 * neighbor, infinite)
+    for cell in set(sources):
+        if costs[cell] is not None and cell not in source_region:
+            add_arc(source, 2 * cell, infinite)
+    for cell in set(sinks):
+        if costs[cell] is not None and cell not in sink_region:
+            add_arc(2 * cell + 1, sink, infinite)
+
+    flow = 0.
+    while True:
+        level = _levels(head, to, capacity, source, sink)
+        if level[sink] < 0:
+            break
+        flow += _blocking_flow(head, to, capacity, level, source, sink)
+        if flow >= infinite:
+            return None
+
+    reachable = _levels(head, to, capacity, source, None)
+    cut = [cell for cell in range(num_cells) if reachable[2 * cell] >= 0 and reachable[2 * cell + 1] < 0]
+    return sum(costs[cell] for cell in cut), cut
+
+
+def _flood(costs, neighbors, cells):
+    # The cells that cannot be blocked and are connected to cells through others that cannot be blocked
+    region = set(cell for cell in cells if costs[cell] == UNCUTTABLE)
+    stack = list(region)
+    while stack:
+        cell = stack.pop()
+        for neighbor in neighbors[cell]:
+            if neighbor not in region and costs[neighbor] == UNCUTTABLE:
+                region.add(neighbor)
+                stack.append(neighbor)
+    return region
+
+
+def _levels(head, to, capacity, source, sink):
+    # Breadth first distances from the source in the residual network, stopping at the sink's level
+    level = [-1] * len(head)
+    level[source] = 0
+    queue = deque([source])
+    while queue:
+        node = queue.popleft()
+        if node == sink:
+            break
+        next_level = level[node] + 1
+        for arc in head[node]:
+            end = to[arc]
+            if capacity[arc] > 0 and level[end] < 0:
+                level[end] = next_level
+                queue.append(end)
+    return level
+
+
+def _blocking_flow(head, to, capacity, level, source, sink):
+    # Pushes flow along shortest augmenting paths until none is left, keeping each node's next arc to try
+    position = [0] * len(head)
+    total = 0.
+    path = []
+    node = source
+    while True:
+        if node == sink:
+            pushed = min([capacity[arc] for arc in path])
+            total += pushed
+            retreat = len(path)
+            for step in range(len(path) - 1, -1, -1):
+                arc = path[step]
+                capacity[arc] -= pushed
+                capacity[arc ^ 1] += pushed
+                if capacity[arc] <= 0:
+                    retreat = step
+            # Continue from the tail of the first saturated arc
+            del path[retreat:]
+            node = to[path[-1]] if path else source
+            continue
+        arcs = head[node]
+        next_level = level[node] + 1
+        for i in range(position[node], len(arcs)):
+            arc = arcs[i]
+            if capacity[arc] > 0 and level[to[arc]] == next_level:
+                position[node] = i
+                path.append(arc)
+                node = to[arc]
+                break
+        else:
+            if node == source:
+                return total
+            # Dead end, never come back to it in this phase
+            level[node] = -1
+            arc = path.pop()
+            node = to[arc ^ 1]
+            position[node] += 1
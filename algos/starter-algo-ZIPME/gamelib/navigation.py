@@ -1,24 +1,423 @@
 import heapq
-import math
 import sys
-import queue
+from collections import deque, OrderedDict
 from .util import debug_write
+from .game_map import CELLS, CELL_INDEX, NUM_CELLS, ARENA_SIZE, HALF_ARENA
+from .metrics import METRICS
 
-class Node:
-    """A pathfinding node
+
+def _build_neighbor_table():
+    """For each cell index, the indices of its neighbors in the order up, down, right, left.
+    Neighbors off the board are left out.
+    """
+    table = []
+    for x, y in CELLS:
+        neighbors = [(x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)]
+        table.append(tuple(CELL_INDEX[neighbor] for neighbor in neighbors if neighbor in CELL_INDEX))
+    return tuple(table)
+
+
+def _build_idealness_table(direction):
+    """The idealness of every cell index for units heading in the given direction
+    """
+    table = []
+    for x, y in CELLS:
+        idealness = 28 * y if direction[1] == 1 else 28 * (27 - y)
+        idealness += x if direction[0] == 1 else 27 - x
+        table.append(idealness)
+    return tuple(table)
+
+
+def _build_edge_masks():
+    """For each cell index, a bit mask of the edges it lies on, bit i for edge i in GameMap.get_edges order
+    """
+    masks = [0] * NUM_CELLS
+    for num in range(HALF_ARENA):
+        for edge, location in enumerate([(HALF_ARENA + num, ARENA_SIZE - 1 - num), (HALF_ARENA - 1 - num, ARENA_SIZE - 1 - num),
+                                         (HALF_ARENA - 1 - num, num), (HALF_ARENA + num, num)]):
+            masks[CELL_INDEX[location]] |= 1 << edge
+    return tuple(masks)
+
+
+NEIGHBORS = _build_neighbor_table()
+IDEALNESS = {direction: _build_idealness_table(direction) for direction in [(1, 1), (1, -1), (-1, 1), (-1, -1)]}
+EDGE_MASKS = _build_edge_masks()
+# The direction units heading to each edge prefer, in GameMap.get_edges order
+EDGE_DIRECTIONS = ((1, 1), (-1, 1), (-1, -1), (1, -1))
+_UNREACHED = [-1] * NUM_CELLS
+
+
+class PathCache:
+    """A least recently used cache of paths
+
+    Paths are keyed by the layout fingerprint of the board they were computed on, so placing or
+    removing a firewall makes every older entry unreachable without an explicit flush.
+
+    Attributes:
+        * max_size (int): The number of paths kept before the least recently used one is evicted
+        * hits (int): The number of lookups that found a path
+        * misses (int): The number of lookups that did not
+
+    """
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._paths = OrderedDict()
+
+    def get(self, key):
+        """Gets the cached path for a key, or None if there is none
+        """
+        path = self._paths.get(key)
+        if path is None:
+            self.misses += 1
+            METRICS.count("path_cache_misses")
+            return None
+        self._paths.move_to_end(key)
+        self.hits += 1
+        METRICS.count("path_cache_hits")
+        return path
+
+    def put(self, key, path):
+        """Caches the path for a key, evicting the least recently used path when full
+        """
+        self._paths[key] = path
+        self._paths.move_to_end(key)
+        if len(self._paths) > self.max_size:
+            self._paths.popitem(last=False)
+
+    def clear(self):
+        self._paths.clear()
+
+    def stats(self):
+        """Gets the hit and miss counters
+
+        Returns:
+            A dict with the number of hits, misses and cached paths
+
+        """
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._paths)}
+
+    def __len__(self):
+        return len(self._paths)
+
+class EdgeField:
+    """Pathlengths from every cell to the nearest open location of an edge, kept up to date as firewalls change
+
+    When the layout it is synced to changes by a few cells, only the region whose distance
+    depends on those cells is repaired instead of searching the whole board again.
+
+    Attributes:
+        * end_indices (tuple): The cell indices of the edge
+        * blocked (bytearray): The layout the pathlengths are valid for, 1 for every cell holding a firewall
+        * pathlength (list): The distance from each cell to the edge, -1 for blocked cells and cells that cannot reach it
+        * verify (bool): Recompute the pathlengths from scratch after every repair and raise an AssertionError if they differ
+        * repairs (int): The number of cell changes handled by repairing
+        * rebuilds (int): The number of times the pathlengths were computed from scratch
+
+    """
+    # Past this many changed cells a full search is cheaper than repairing each one
+    MAX_REPAIRS = 24
+
+    def __init__(self, end_indices, verify=False):
+        self.end_indices = tuple(end_indices)
+        self.end_set = frozenset(self.end_indices)
+        self.blocked = None
+        self.pathlength = list(_UNREACHED)
+        self.verify = verify
+        self.repairs = 0
+        self.rebuilds = 0
+
+    def sync(self, blocked):
+        """Brings the pathlengths up to date with a layout
+
+        Args:
+            * blocked: A bytes-like object with 1 for every cell holding a firewall
+
+        """
+        if self.blocked is None:
+            self.rebuild(blocked)
+            return
+        if self.blocked == blocked:
+            return
+        changed = [i for i, (old, new) in enumerate(zip(self.blocked, blocked)) if old != new]
+        if len(changed) > self.MAX_REPAIRS:
+            self.rebuild(blocked)
+            return
+        for index in changed:
+            if blocked[index]:
+                self._block(index)
+            else:
+                self._unblock(index)
+            self.repairs += 1
+        if self.verify:
+            self._check()
+
+    def rebuild(self, blocked):
+        """Computes the pathlengths for a layout from scratch
+
+        Args:
+            * blocked: A bytes-like object with 1 for every cell holding a firewall
+
+        """
+        self.blocked = bytearray(blocked)
+        self.pathlength = self._search(self.blocked)
+        self.rebuilds += 1
+
+    def _search(self, blocked):
+        pathlength = list(_UNREACHED)
+        current = deque()
+        for index in self.end_indices:
+            if not blocked[index]:
+                pathlength[index] = 0
+                current.append(index)
+        while current:
+            location = current.popleft()
+            next_pathlength = pathlength[location] + 1
+            for neighbor in NEIGHBORS[location]:
+                if blocked[neighbor] or not pathlength[neighbor] == -1:
+                    continue
+                pathlength[neighbor] = next_pathlength
+                current.append(neighbor)
+        return pathlength
+
+    def _check(self):
+        expected = self._search(self.blocked)
+        if not expected == self.pathlength:
+            wrong = [CELLS[i] for i in range(NUM_CELLS) if not expected[i] == self.pathlength[i]]
+            raise AssertionError("Repaired pathlengths differ from a full search at {}".format(wrong))
+
+    def _block(self, index):
+        """Places a firewall on a cell, then re-routes every cell whose shortest path went through it
+        """
+        blocked = self.blocked
+        pathlength = self.pathlength
+        old_pathlength = pathlength[index]
+        blocked[index] = 1
+        pathlength[index] = -1
+        if old_pathlength == -1:
+            return
+
+        # Walk down from the cell level by level. A cell loses its distance when none of
+        # its parents one step closer to the edge kept theirs.
+        affected = set()
+        level = old_pathlength + 1
+        frontier = [neighbor for neighbor in NEIGHBORS[index] if pathlength[neighbor] == level]
+        while frontier:
+            next_frontier = []
+            for location in frontier:
+                if location in affected:
+                    continue
+                has_parent = False
+                for neighbor in NEIGHBORS[location]:
+                    if pathlength[neighbor] == level - 1 and not blocked[neighbor] and neighbor not in affected:
+                        has_parent = True
+                        break
+                if has_parent:
+                    continue
+                affected.add(location)
+                next_frontier.extend(neighbor for neighbor in NEIGHBORS[location] if pathlength[neighbor] == level + 1)
+            frontier = next_frontier
+            level += 1
+
+        # Re-enter the affected region from its unaffected border
+        for location in affected:
+            pathlength[location] = -1
+        heap = []
+        for location in affected:
+            best = -1
+            for neighbor in NEIGHBORS[location]:
+                if neighbor in affected or blocked[neighbor] or pathlength[neighbor] == -1:
+                    continue
+                if best == -1 or pathlength[neighbor] + 1 < best:
+                    best = pathlength[neighbor] + 1
+            if not best == -1:
+                pathlength[location] = best
+                heap.append((best, location))
+        heapq.heapify(heap)
+        while heap:
+            distance, location = heapq.heappop(heap)
+            if distance > pathlength[location]:
+                continue
+            for neighbor in NEIGHBORS[location]:
+                if neighbor in affected and (pathlength[neighbor] == -1 or pathlength[neighbor] > distance + 1):
+                    pathlength[neighbor] = distance + 1
+                    heapq.heappush(heap, (distance + 1, neighbor))
+
+    def _unblock(self, index):
+        """Removes the firewall from a cell, then shortens every path that can now go through it
+        """
+        blocked = self.blocked
+        pathlength = self.pathlength
+        blocked[index] = 0
+        if index in self.end_set:
+            pathlength[index] = 0
+        else:
+            best = -1
+            for neighbor in NEIGHBORS[index]:
+                if blocked[neighbor] or pathlength[neighbor] == -1:
+                    continue
+                if best == -1 or pathlength[neighbor] + 1 < best:
+                    best = pathlength[neighbor] + 1
+            pathlength[index] = best
+            if best == -1:
+                return
+
+        current = deque([index])
+        while current:
+            location = current.popleft()
+            next_pathlength = pathlength[location] + 1
+            for neighbor in NEIGHBORS[location]:
+                if blocked[neighbor]:
+                    continue
+                if pathlength[neighbor] == -1 or pathlength[neighbor] > next_pathlength:
+                    pathlength[neighbor] = next_pathlength
+                    current.append(neighbor)
+
+
+class PocketMap:
+    """Labels the pockets of pathable space, the connected groups of open cells, kept up to date as firewalls change
+
+    Each pocket records which edges it touches and its most ideal cell for each direction, so whether a unit 
+    reaches its edge, and where it self destructs if it cannot, are lookups rather than searches. 
+    Placing a firewall only relabels the pocket it was in and removing one only the pockets it joins.
 
     Attributes:
-        * visited_idealness (bool): Have we visited this node during the idealness search step?
-        * visited_validate (bool): Have we visited this node during the validation step?
-        * blocked (bool): Is there a firewall at this node's location
-        * pathlength: The distance between this node and the target location
+        * blocked (bytearray): The layout the labels are valid for, 1 for every cell holding a firewall
+        * labels (list): The pocket of each cell, -1 for blocked cells
+        * pockets (dict): For each pocket, a (size, edge_mask, ideal) tuple. Bit i of edge_mask is set if it touches edge i,
+          and ideal maps each direction to the pocket's most ideal cell for units heading that way.
+        * relabels (int): The number of pockets labelled since the map was created
 
     """
+    # Past this many changed cells labelling the whole board is cheaper than updating each one
+    MAX_REPAIRS = 24
+
     def __init__(self):
-        self.visited_idealness = False
-        self.visited_validate = False
-        self.blocked = False
-        self.pathlength = -1
+        self.blocked = None
+        self.labels = list(_UNREACHED)
+        self.pockets = {}
+        self.relabels = 0
+        self._next_label = 0
+
+    def sync(self, blocked):
+        """Brings the labels up to date with a layout
+
+        Args:
+            * blocked: A bytes-like object with 1 for every cell holding a firewall
+
+        """
+        if self.blocked is not None and self.blocked == blocked:
+            return
+        changed = None
+        if self.blocked is not None:
+            changed = [i for i, (old, new) in enumerate(zip(self.blocked, blocked)) if old != new]
+        if changed is None or len(changed) > self.MAX_REPAIRS:
+            self.blocked = bytearray(blocked)
+            self.labels = list(_UNREACHED)
+            self.pockets = {}
+            for index in range(NUM_CELLS):
+                if not self.blocked[index] and self.labels[index] == -1:
+                    self._label(index)
+            return
+        for index in changed:
+            if blocked[index]:
+                self._block(index)
+            else:
+                self._unblock(index)
+
+    def can_reach(self, location, target_edge):
+        """Checks if a unit at a location can reach an edge
+
+        Args:
+            * location: The location of the unit
+            * target_edge: The edge, as in GameMap.get_edges
+
+        Returns:
+            True if the location is open and its pocket touches an open cell of the edge
+
+        """
+        label = self.labels[CELL_INDEX[tuple(location)]]
+        return not label == -1 and bool(self.pockets[label][1] >> target_edge & 1)
+
+    def get_ideal_tile(self, location, target_edge):
+        """Gets the most ideal cell of a location's pocket for units heading to an edge, ignoring the edge itself.
+        A unit that cannot reach the edge self destructs there.
+
+        Returns:
+            The location of the cell, None if the location is blocked
+
+        """
+        label = self.labels[CELL_INDEX[tuple(location)]]
+        if label == -1:
+            return None
+        return list(CELLS[self.pockets[label][2][EDGE_DIRECTIONS[target_edge]]])
+
+    def get_self_destructs(self, start_locations, target_edge):
+        """Predicts where units spawned at each start location self destruct
+
+        Args:
+            * start_locations: The locations units start at
+            * target_edge: The edge they are heading to, as in GameMap.get_edges
+
+        Returns:
+            A list with, for each start location in order, the location the unit self destructs at, 
+            or None if it reaches the edge or the start is blocked
+
+        """
+        direction = EDGE_DIRECTIONS[target_edge]
+        bit = 1 << target_edge
+        result = []
+        for location in start_locations:
+            label = self.labels[CELL_INDEX[tuple(location)]]
+            if label == -1 or self.pockets[label][1] & bit:
+                result.append(None)
+            else:
+                result.append(list(CELLS[self.pockets[label][2][direction]]))
+        return result
+
+    def get_ideal_index(self, index, direction):
+        """Gets the cell index of the most ideal cell in the pocket of an open cell index, for units heading in direction
+        """
+        return self.pockets[self.labels[index]][2][direction]
+
+    def _label(self, start):
+        label = self._next_label
+        self._next_label += 1
+        labels = self.labels
+        blocked = self.blocked
+        labels[start] = label
+        cells = [start]
+        for index in cells:
+            for neighbor in NEIGHBORS[index]:
+                if not blocked[neighbor] and not labels[neighbor] == label:
+                    labels[neighbor] = label
+                    cells.append(neighbor)
+        edge_mask = 0
+        for index in cells:
+            edge_mask |= EDGE_MASKS[index]
+        ideal = {direction: max(cells, key=idealness.__getitem__) for direction, idealness in IDEALNESS.items()}
+        self.pockets[label] = (len(cells), edge_mask, ideal)
+        self.relabels += 1
+
+    def _block(self, index):
+        old = self.labels[index]
+        self.blocked[index] = 1
+        self.labels[index] = -1
+        if old == -1:
+            return
+        del self.pockets[old]
+        # The pocket may have split, every part still holding the old label gets its own
+        for neighbor in NEIGHBORS[index]:
+            if self.labels[neighbor] == old:
+                self._label(neighbor)
+
+    def _unblock(self, index):
+        self.blocked[index] = 0
+        for neighbor in NEIGHBORS[index]:
+            self.pockets.pop(self.labels[neighbor], None)
+        self._label(index)
+
 
 """
 This class helps with pathfinding. We guarentee the results will
@@ -28,17 +427,30 @@ code to maximise time efficiancy
 class ShortestPathFinder:
     """Handles pathfinding
 
+    Cells are addressed by their flat index on the board (see GameMap.get_cell_index). The search
+    state lives in flat arrays that are reused between calls. Units whose pocket reaches their edge
+    follow an EdgeField per edge, which is repaired rather than recomputed when only a few firewalls change.
+    The self destruct location of the others comes from a PocketMap kept up to date the same way.
+
     Attributes:
         * HORIZONTAL (int): A constant representing a horizontal movement
         * VERTICAL (int): A constant representing a vertical movement
 
         * game_state (:obj: GameState): The current gamestate
-        * game_map (:obj: GameMap): The current gamemap
+        * blocked (bytearray): 1 for every cell holding a firewall during the last search
+        * pathlength (list): The distance between each cell and the self destruct location of the last pocket searched
+        * pockets (:obj: PocketMap): The pockets of the last layout a unit could not reach its edge in
+        * verify (bool): Check every repaired EdgeField against a full search, for use in tests
 
     """
-    def __init__(self):
+    def __init__(self, verify=False):
         self.HORIZONTAL = 1
         self.VERTICAL = 2
+        self.verify = verify
+        self.blocked = bytearray(NUM_CELLS)
+        self.pathlength = list(_UNREACHED)
+        self.pockets = PocketMap()
+        self._edge_fields = {}
 
     def navigate_multiple_endpoints(self, start_point, end_points, game_state):
         """Finds tha path a unit would take to reach a set of endpoints
@@ -55,48 +467,78 @@ class ShortestPathFinder:
         """
         if game_state.contains_stationary_unit(start_point):
             return
+        return self.navigate_multiple_starts([start_point], end_points, game_state)[0]
+
+    def navigate_multiple_starts(self, start_points, end_points, game_state):
+        """Finds the paths units at several starting locations would take to reach a set of endpoints
+
+        The pathlengths only depend on the pocket of pathable space a unit starts in, so they are
+        computed once per pocket and every path is traced from them.
+
+        Args:
+            * start_points: The starting locations of the units
+            * end_points: The end points of the units, should be a list of edge locations
+            * game_state: The current game state
+
+        Returns:
+            A list with the path of each start point, in the same order, as navigate_multiple_endpoints 
+            would return it. Start points blocked by a firewall get None.
 
-        #Initialize map 
-        self.game_state = game_state
-        self.game_map = [[Node() for x in range(self.game_state.ARENA_SIZE)] for y in range(self.game_state.ARENA_SIZE)]
-        #Fill in walls
-        for location in self.game_state.game_map:
-            if self.game_state.contains_stationary_unit(location):
-                self.game_map[location[0]][location[1]].blocked = True
-        #Do pathfinding
-        ideal_endpoints = self._idealness_search(start_point, end_points)
-        self._validate(ideal_endpoints, end_points)
-        return self._get_path(start_point, end_points)
-
-    def _idealness_search(self, start, end_points):
-        """
-        Finds the most ideal tile in our 'pocket' of pathable space. 
-        The edge if it is available, or the best self destruct location otherwise
         """
-        current = queue.Queue()
-        current.put(start)
-        best_idealness = self._get_idealness(start, end_points)
-        self.game_map[start[0]][start[1]].visited_idealness = True
-        most_ideal = start
-
-        while not current.empty():
-            search_location = current.get()
-            for neighbor in self._get_neighbors(search_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
-                    continue
+        self.game_state = game_state
+        return self.navigate_layout(start_points, end_points, game_state.game_map.get_layout_fingerprint())
 
-                x, y = neighbor
-                current_idealness = self._get_idealness(neighbor, end_points)
+    def navigate_layout(self, start_points, end_points, blocked, move_directions=None):
+        """Finds the paths units would take on a hypothetical layout of firewalls
 
-                if current_idealness > best_idealness:
-                    best_idealness = current_idealness
-                    most_ideal = neighbor
+        Args:
+            * start_points: The starting locations of the units
+            * end_points: The end points of the units, should be a list of edge locations
+            * blocked: A bytes-like object with 1 for every cell index holding a firewall, 
+              like GameMap.get_layout_fingerprint returns
+            * move_directions: The direction of the last move of each unit, HORIZONTAL, VERTICAL or 0 if it has not moved yet. 
+              Units rerouting mid round keep preferring to change direction, so pass this to continue their paths.
 
-                if not self.game_map[x][y].visited_idealness and not self.game_map[x][y].blocked:
-                    self.game_map[x][y].visited_idealness = True
-                    current.put(neighbor)
+        Returns:
+            A list with the path of each start point, in the same order. Start points blocked by a firewall get None.
 
-        return most_ideal
+        """
+        with METRICS.timer("pathfinding"):
+            self.blocked[:] = blocked
+            end_indices = [CELL_INDEX[tuple(location)] for location in end_points]
+            end_set = set(end_indices)
+            direction = self._get_direction_from_endpoints(end_points)
+            field = self._get_edge_field(end_indices)
+
+            self.pathlength[:] = _UNREACHED
+            paths = []
+            for i, start_point in enumerate(start_points):
+                start = CELL_INDEX[tuple(start_point)]
+                move_direction = move_directions[i] if move_directions else 0
+                if self.blocked[start]:
+                    paths.append(None)
+                elif not field.pathlength[start] == -1:
+                    # The pocket reaches the edge, so the most ideal tile is an endpoint and the edge's pathlengths apply
+                    paths.append(self._get_path(start_point, start, direction, field.pathlength, move_direction))
+                else:
+                    # Validation floods a whole pocket, so a start it reached already has its pathlengths
+                    if self.pathlength[start] == -1:
+                        # The pocket holds no endpoint, so the unit heads for its most ideal cell
+                        self.pockets.sync(self.blocked)
+                        self._validate(self.pockets.get_ideal_index(start, direction), end_indices, end_set)
+                    paths.append(self._get_path(start_point, start, direction, self.pathlength, move_direction))
+            return paths
+
+    def _get_edge_field(self, end_indices):
+        """Gets the EdgeField of a set of endpoints, synced to the blocked cells
+        """
+        key = tuple(end_indices)
+        field = self._edge_fields.get(key)
+        if field is None:
+            field = EdgeField(key, self.verify)
+            self._edge_fields[key] = field
+        field.sync(self.blocked)
+        return field
 
     def _get_neighbors(self, location):
         """Get the locations adjacent to a location
@@ -108,24 +550,24 @@ class ShortestPathFinder:
         """Prints a message to the games debug output
 
         Args:
-            * end_points: A set of endpoints, should be an edge 
+            * end_points: A set of endpoints, should be an edge
 
         Returns:
-            A direction [x,y] representing the edge. For example, [1,1] for the top right and [-1, 1] for the top left
+            A direction (x,y) representing the edge. For example, (1,1) for the top right and (-1, 1) for the top left
 
         """
         point = end_points[0]
         x, y = point
         direction = [1, 1]
-        if x < self.game_state.HALF_ARENA:
+        if x < HALF_ARENA:
            direction[0] = -1
-        if y < self.game_state.HALF_ARENA:
+        if y < HALF_ARENA:
             direction[1] = -1
-        return direction
+        return tuple(direction)
 
     def _get_idealness(self, location, end_points):
         """Get the idealness of a tile, the reachable tile the unit most wants to path to.
-        Better self destruct locations are more ideal. The endpoints are perfectly ideal. 
+        Better self destruct locations are more ideal. The endpoints are perfectly ideal.
 
         Returns:
             A location the unit will attempt to reach
@@ -134,114 +576,94 @@ class ShortestPathFinder:
             return sys.maxsize
 
         direction = self._get_direction_from_endpoints(end_points)
+        return IDEALNESS[direction][CELL_INDEX[tuple(location)]]
 
-        idealness = 0
-        if direction[1] == 1:
-            idealness += 28 * location[1]
-        else: 
-            idealness += 28 * (27 - location[1])
-        if direction[0] == 1:
-            idealness += location[0]
-        else: 
-            idealness += (27 - location[0])
-
-        return idealness
-
-    def _validate(self, ideal_tile, end_points):
-        """Breadth first search of the grid, setting the pathlengths of each node
+    def _validate(self, ideal_tile, end_indices, end_set):
+        """Breadth first search of the pocket around ideal_tile, or around the endpoints if it is one of them,
+        setting the pathlengths of each node. Pathlengths set earlier in other pockets are kept.
 
         """
+        pathlength = self.pathlength
+        blocked = self.blocked
+
         #VALDIATION
         #Add our most ideal tiles to current
-        current = queue.Queue()
-        if ideal_tile in end_points:
-            for location in end_points:
-               current.put(location)
+        current = deque()
+        if ideal_tile in end_set:
+            for location in end_indices:
+               current.append(location)
                #Set current pathlength to 0
-               self.game_map[location[0]][location[1]].pathlength = 0
-               self.game_map[location[0]][location[1]].visited_validate = True
+               pathlength[location] = 0
         else:
-            current.put(ideal_tile)
-            self.game_map[ideal_tile[0]][ideal_tile[1]].pathlength = 0
-            self.game_map[ideal_tile[0]][ideal_tile[1]].visited_validate = True
+            current.append(ideal_tile)
+            pathlength[ideal_tile] = 0
 
         #While current is not empty
-        while not current.empty():
-            current_location = current.get()
-            current_node = self.game_map[current_location[0]][current_location[1]]
-            for neighbor in self._get_neighbors(current_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+        while current:
+            current_location = current.popleft()
+            if blocked[current_location]:
+                continue
+            next_pathlength = pathlength[current_location] + 1
+            for neighbor in NEIGHBORS[current_location]:
+                if blocked[neighbor] or not pathlength[neighbor] == -1:
                     continue
-
-                neighbor_node = self.game_map[neighbor[0]][neighbor[1]]
-                if not neighbor_node.visited_validate and not current_node.blocked:
-                    neighbor_node.pathlength = current_node.pathlength + 1
-                    neighbor_node.visited_validate = True
-                    current.put(neighbor)
+                pathlength[neighbor] = next_pathlength
+                current.append(neighbor)
 
         #debug_write("Print after validate")
         #self.print_map()
         return
 
-    def _get_path(self, start_point, end_points):
+    def _get_path(self, start_point, start, direction, pathlength, move_direction=0):
         """Once all nodes are validated, and a target is found, the unit can path to its target
 
         """
         #GET THE PATH
         path = [start_point]
-        current = start_point
-        move_direction = 0
+        current = start
 
-        while not self.game_map[current[0]][current[1]].pathlength == 0:
-            #debug_write("current tile {} has cost {}".format(current, self.game_map[current[0]][current[1]].pathlength))
-            next_move = self._choose_next_move(current, move_direction, end_points)
-            #debug_write(next_move)
+        while not pathlength[current] == 0:
+            next_move = self._choose_next_move(current, move_direction, direction, pathlength)
 
-            if current[0] == next_move[0]:
+            if CELLS[current][0] == CELLS[next_move][0]:
                 move_direction = self.VERTICAL
             else:
                 move_direction = self.HORIZONTAL
-            path.append(next_move)
+            path.append(list(CELLS[next_move]))
             current = next_move
-        
+
         #debug_write(path)
         return path
-  
-    def _choose_next_move(self, current_point, previous_move_direction, end_points):
+
+    def _choose_next_move(self, current_point, previous_move_direction, direction, pathlength):
         """Given the current location and adjacent locations, return the best 'next step' for a given unit to take
         """
-        neighbors = self._get_neighbors(current_point)
-        #debug_write("Unit at {} previously moved {} and has these neighbors {}".format(current_point, previous_move_direction, neighbors))
-
+        blocked = self.blocked
         ideal_neighbor = current_point
-        best_pathlength = self.game_map[current_point[0]][current_point[1]].pathlength
-        for neighbor in neighbors:
-            #debug_write("Comparing champ {} and contender {}".format(ideal_neighbor, neighbor))
-            if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+        best_pathlength = pathlength[current_point]
+        for neighbor in NEIGHBORS[current_point]:
+            if blocked[neighbor]:
                 continue
 
             new_best = False
-            x, y = neighbor
-            current_pathlength = self.game_map[x][y].pathlength
+            current_pathlength = pathlength[neighbor]
 
             #Filter by pathlength
             if current_pathlength > best_pathlength:
                 continue
             elif current_pathlength < best_pathlength:
-                #debug_write("Contender has better pathlength at {} vs champs {}".format(current_pathlength, best_pathlength))
                 new_best = True
 
             #Filter by direction based on prev move
-            if not new_best and not self._better_direction(current_point, neighbor, ideal_neighbor, previous_move_direction, end_points):
+            if not new_best and not self._better_direction(CELLS[current_point], CELLS[neighbor], CELLS[ideal_neighbor], previous_move_direction, direction):
                 continue
 
             ideal_neighbor = neighbor
             best_pathlength = current_pathlength
 
-        #debug_write("Gave unit at {} new tile {}".format(current_point, ideal_neighbor))
         return ideal_neighbor
 
-    def _better_direction(self, prev_tile, new_tile, prev_best, previous_move_direction, end_points):
+    def _better_direction(self, prev_tile, new_tile, prev_best, previous_move_direction, direction):
         """Compare two tiles and return True if the unit would rather move to the new one
 
         """
@@ -250,26 +672,25 @@ class ShortestPathFinder:
         if previous_move_direction == self.HORIZONTAL and not new_tile[0] == prev_best[0]:
             #We want to go up now. If we have not changed our y, we are not going up
             if prev_tile[1] == new_tile[1]:
-                return False 
+                return False
             return True
         if previous_move_direction == self.VERTICAL and not new_tile[1] == prev_best[1]:
             if prev_tile[0] == new_tile[0]:
                 #debug_write("contender {} has the same x coord as prev tile {} so we will keep best move {}".format(new_tile, prev_tile, prev_best))
                 return False
             return True
-        if previous_move_direction == 0: 
-            if prev_tile[1] == new_tile[1]: 
+        if previous_move_direction == 0:
+            if prev_tile[1] == new_tile[1]:
                 return False
             return True
-        
-        #To make it here, both moves are on the same axis 
-        direction = self._get_direction_from_endpoints(end_points)
+
+        #To make it here, both moves are on the same axis
         if new_tile[1] == prev_best[1]: #If they both moved horizontal...
             if direction[0] == 1 and new_tile[0] > prev_best[0]: #If we moved right and right is our direction, we moved towards our direction
-                return True 
+                return True
             if direction[0] == -1 and new_tile[0] < prev_best[0]: #If we moved left and left is our direction, we moved towards our direction
-                return True 
-            return False 
+                return True
+            return False
         if new_tile[0] == prev_best[0]: #If they both moved vertical...
             if direction[1] == 1 and new_tile[1] > prev_best[1]: #If we moved up and up is our direction, we moved towards our direction
                 return True
@@ -282,11 +703,11 @@ class ShortestPathFinder:
         """Prints an ASCII version of the current game map for debug purposes
 
         """
-        for y in range(28):
-            for x in range(28):
-                node = self.game_map[x][28 - y - 1]
-                if not node.blocked and not node.pathlength == -1:
-                    self._print_justified(node.pathlength)
+        for y in range(ARENA_SIZE):
+            for x in range(ARENA_SIZE):
+                index = CELL_INDEX.get((x, ARENA_SIZE - y - 1))
+                if index is not None and not self.blocked[index] and not self.pathlength[index] == -1:
+                    self._print_justified(self.pathlength[index])
                 else:
                     sys.stderr.write("   ")
             debug_write("")
@@ -0,0 +1,272 @@
+import threading
+import time
+import warnings
+
+from .metrics import METRICS
+
+# The number of start locations BackgroundWorker paths between checks for a stop
+_WARM_CHUNK = 4
+
+
+class TurnBudget:
+    """The time left to plan a turn, measured against the limits in the config's timingAndReplay
+
+    AlgoCore starts one as each turn message arrives, so the time spent receiving and decoding it counts too.
+
+    Attributes:
+        * start (float): The time.perf_counter() at which the turn started
+        * soft_limit (float): Seconds after start at which the engine considers the turn late, waitTimeBotSoft
+        * hard_limit (float): Seconds after start at which the engine gives up on the turn, waitTimeBotMax
+        * margin (float): Seconds kept in reserve before soft_limit to submit the turn
+        * deadline (float): The time.perf_counter() by which planning should stop
+
+    """
+    def __init__(self, config, start=None, margin=0.25):
+        """Reads the limits from the config
+
+        Args:
+            * config: The game config
+            * start: The time.perf_counter() at which the turn started, now by default
+            * margin: Seconds kept in reserve before the soft limit
+
+        """
+        timing = config.get("timingAndReplay", {})
+        self.start = time.perf_counter() if start is None else start
+        self.soft_limit = timing.get("waitTimeBotSoft", 5000) / 1000.
+        self.hard_limit = timing.get("waitTimeBotMax", timing.get("waitTimeBotSoft", 5000)) / 1000.
+        self.margin = min(margin, self.soft_limit / 2)
+        self.deadline = self.start + self.soft_limit - self.margin
+
+    def elapsed(self):
+        """Gets the seconds since the turn started
+        """
+        return time.perf_counter() - self.start
+
+    def remaining(self):
+        """Gets the seconds left before planning should stop, 0 once the deadline has passed
+        """
+        return max(0., self.deadline - time.perf_counter())
+
+    def expired(self):
+        """Checks if planning should stop
+        """
+        return time.perf_counter() >= self.deadline
+
+    def has_time_for(self, seconds):
+        """Checks if a step expected to take the given number of seconds would finish before the deadline
+        """
+        return time.perf_counter() + seconds < self.deadline
+
+
+class AnytimePlanner:
+    """Refines a turn until its budget runs out, and always submits the best plan found in time
+
+    A watchdog thread submits the best plan so far when the deadline passes, even if a refinement step
+    is still running. The plan in the game state's build and deploy stacks when the planner is created
+    is the fallback if no better one was proposed.
+
+    The deadline is only enforced by the watchdog. It sends the turn from its own thread but cannot interrupt 
+    refine, which keeps running after the submit until it returns, so long refinements should check 
+    budget.expired() or submitted() and return early. Plans proposed after the submit are ignored.
+    GameState.planner and AlgoCore.planner make one for the current turn.
+
+    Attributes:
+        * game_state (:obj: GameState): The turn being planned
+        * budget (:obj: TurnBudget): The time available
+        * best (tuple): The (score, build_stack, deploy_stack) of the best plan so far
+        * depth (int): The deepest refinement that finished
+        * growth (float): How many times longer each depth is expected to take than the previous one
+
+    """
+    def __init__(self, game_state, budget, growth=2.):
+        """Starts the watchdog
+
+        Args:
+            * game_state: The GameState of the turn
+            * budget: The TurnBudget of the turn
+            * growth: How many times longer each depth is expected to take than the previous one
+
+        """
+        self.game_state = game_state
+        self.budget = budget
+        self.growth = growth
+        self.depth = 0
+        self.best = (float("-inf"), list(game_state._build_stack), list(game_state._deploy_stack))
+        self._lock = threading.Lock()
+        self._watchdog = threading.Timer(budget.remaining(), self._on_deadline)
+        self._watchdog.daemon = True
+        self._watchdog.start()
+
+    def propose(self, score, build_stack=None, deploy_stack=None):
+        """Offers a plan, which becomes the best one if it scores higher
+
+        Args:
+            * score: The value of the plan, higher is better
+            * build_stack: The firewalls to build, as in GameState._build_stack. Defaults to the game state's current stack
+            * deploy_stack: The information units to deploy. Defaults to the game state's current stack
+
+        Returns:
+            True if the plan is the new best, False if it scores lower or the turn was already submitted
+
+        """
+        if self.submitted():
+            return False
+        build_stack = list(self.game_state._build_stack if build_stack is None else build_stack)
+        deploy_stack = list(self.game_state._deploy_stack if deploy_stack is None else deploy_stack)
+        with self._lock:
+            if score <= self.best[0] or self.submitted():
+                return False
+            self.best = (score, build_stack, deploy_stack)
+            return True
+
+    def run(self, refine, max_depth=None):
+        """Calls refine with increasing depths until the budget runs out, then submits the best plan
+
+        Args:
+            * refine: A function taking (depth, budget) that returns a (score, build_stack, deploy_stack) plan or None.
+              It can also call propose itself, and should check budget.expired() in long loops.
+            * max_depth: The deepest refinement to try, no limit by default
+
+        Returns:
+            The best (score, build_stack, deploy_stack) plan, which has been submitted. 
+            If the watchdog submitted during refine, it is the plan that was sent then.
+
+        """
+        while not self.submitted() and not self.budget.expired() and (max_depth is None or self.depth < max_depth):
+            started = time.perf_counter()
+            plan = refine(self.depth + 1, self.budget)
+            if plan is not None:
+                self.propose(*plan)
+            self.depth += 1
+            if not self.budget.has_time_for((time.perf_counter() - started) * self.growth):
+                break
+        self.submit()
+        with self._lock:
+            return self.best
+
+    def submit(self):
+        """Submits the best plan if the turn has not been submitted yet
+
+        Returns:
+            True if this call submitted the turn
+
+        """
+        self._watchdog.cancel()
+        # Held while sending, so the watchdog and run never both try to submit
+        with self._lock:
+            if self.submitted():
+                return False
+            score, build_stack, deploy_stack = self.best
+            return self.game_state._submit(build_stack, deploy_stack)
+
+    def submitted(self):
+        """Checks if the turn has been submitted, by the planner or the game state
+        """
+        return self.game_state.submitted
+
+    def _on_deadline(self):
+        if self.submit():
+            warnings.warn("Planning ran past the deadline, submitted the best plan after depth {}".format(self.depth))
+
+
+class BackgroundWorker:
+    """Precomputes for the next turn on a thread while the action phase plays out
+
+    The worker warms the path and threat map caches of the submitted game state, whose board is 
+    the one expected next turn, then runs an optional task. When the next turn arrives adopt moves 
+    the caches onto the new game state. They are keyed by board layout, so they are reused where the 
+    board matches and ignored where it does not. The task's result is only returned if the firewall 
+    layout is exactly the expected one.
+
+    Attributes:
+        * game_state (:obj: GameState): The submitted game state the worker computes on
+        * fingerprint (bytes): The firewall layout the worker expects next turn
+        * result: What the task returned, None until it finishes
+        * error (Exception): What the task raised, if anything
+
+    """
+    def __init__(self, game_state, task=None):
+        """Prepares the worker, call start to run it
+
+        Args:
+            * game_state: The game state that was just submitted. The worker owns it until adopt is called.
+            * task: A function taking (game_state, stop_event) that precomputes something, like candidate builds.
+              It should return early once stop_event is set.
+
+        """
+        self.game_state = game_state
+        self.task = task
+        self.fingerprint = game_state.game_map.get_layout_fingerprint()
+        self.result = None
+        self.error = None
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        """Starts the worker thread
+
+        Returns:
+            The worker
+        """
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Asks the worker to stop at its next check, so it does not compete with planning the new turn
+        """
+        self._stop_event.set()
+
+    def adopt(self, game_state, timeout=0.05):
+        """Stops the worker and hands what it computed to the new turn's game state
+
+        Args:
+            * game_state: The game state of the new turn
+            * timeout: Seconds to wait for the worker to stop. If it is still running nothing is adopted.
+
+        Returns:
+            The task's result if the new firewall layout is the expected one, None otherwise
+
+        """
+        self.stop()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            warnings.warn("The background worker did not stop in time, its work was dropped.")
+            return None
+        if self.error is not None:
+            warnings.warn("The background worker failed: {}".format(self.error))
+        game_state.path_cache = self.game_state.path_cache
+        game_state._shortest_path_finder = self.game_state._shortest_path_finder
+        game_state._threat_maps = self.game_state._threat_maps
+        game_state.transpositions = self.game_state.transpositions
+        if game_state.game_map.get_layout_fingerprint() == self.fingerprint:
+            return self.result
+        return None
+
+    def _run(self):
+        # The worker often finishes after the next turn started, its timings would be counted in that turn
+        METRICS.ignore_thread()
+        try:
+            self._warm()
+            if self.task is not None and not self._stop_event.is_set():
+                self.result = self.task(self.game_state, self._stop_event)
+        except Exception as error:
+            self.error = error
+
+    def _warm(self):
+        from .game_state import OPPOSITE_EDGE
+        game_state = self.game_state
+        game_map = game_state.game_map
+        for target_edge in [game_map.TOP_RIGHT, game_map.TOP_LEFT, game_map.BOTTOM_LEFT, game_map.BOTTOM_RIGHT]:
+            if self._stop_event.is_set():
+                return
+            starts = [location for location in game_map.get_edge_locations(OPPOSITE_EDGE[target_edge])
+                      if not game_state.contains_stationary_unit(location)]
+            # Path a few starts at a time so a stop is noticed quickly, the edge's pathlengths are shared between them
+            for chunk in range(0, len(starts), _WARM_CHUNK):
+                if self._stop_event.is_set():
+                    return
+                game_state.find_paths_to_edge(starts[chunk:chunk + _WARM_CHUNK], target_edge)
+        for player_index in [0, 1]:
+            if self._stop_event.is_set():
+                return
+            game_state._get_threat_map(player_index)
@@ -0,0 +1,141 @@
+import cProfile
+import glob
+import os
+import time
+import zlib
+
+from .unit import get_unit_specs
+
+
+def get_board_hash(state, config):
+    """Gets a short hash of the firewalls on the board of a turn message
+
+    Information units, stability and unit ids are left out, so turns with the same firewall layout share a hash.
+
+    Args:
+        * state: The decoded turn message
+        * config: The game config, which gives the index of each firewall type in p1Units and p2Units
+
+    Returns:
+        8 hex digits
+
+    """
+    firewall_types = [spec.index for spec in get_unit_specs(config).values() if getattr(spec, "stationary", False)]
+    firewalls = sorted((player_index, unit_type, int(unit[0]), int(unit[1]))
+                       for player_index, key in enumerate(["p1Units", "p2Units"])
+                       for unit_type in firewall_types
+                       for unit in state[key][unit_type])
+    return "{:08x}".format(zlib.crc32(repr(firewalls).encode()))
+
+
+class SlowTurnProfiler:
+    """Profiles a sample of the turns with cProfile and keeps a pstats dump of the ones slower than a threshold
+
+    Profiling slows the turn down, so only one turn in every is profiled, plus the turn after any slow 
+    turn that was not, since slow turns tend to come in runs. Set every to 1 to profile every turn.
+    Dumps are named turn-<turn number>-<board hash>-<milliseconds>ms.prof, and only the newest keep of them
+    are left in the directory. Load one with pstats.Stats(path).sort_stats("cumulative").print_stats(30).
+    Only the thread calling start and stop is profiled, not the background worker.
+
+    Attributes:
+        * directory (str): The folder dumps are written to
+        * threshold (float): Turns taking longer than this many seconds are dumped
+        * keep (int): The most dumps left in the directory
+        * every (int): One turn in this many is profiled
+        * dumps (list): The path of every dump written
+
+    """
+    def __init__(self, directory, threshold_ms=1000, keep=10, every=10):
+        """Creates the directory if needed
+
+        Args:
+            * directory: The folder dumps are written to
+            * threshold_ms: Turns taking longer than this many milliseconds are dumped
+            * keep: The most dumps left in the directory, older ones are deleted
+            * every: One turn in this many is profiled, starting with the first
+
+        """
+        self.directory = directory
+        self.threshold = threshold_ms / 1000.
+        self.keep = max(1, keep)
+        self.every = max(1, every)
+        self.dumps = []
+        self._profile = None
+        self._start = None
+        self._turns = 0
+        self._armed = False
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_environment(cls, environ=os.environ):
+        """Makes a profiler if GAMELIB_PROFILE names a directory
+
+        GAMELIB_PROFILE_MS sets the threshold in milliseconds, 1000 by default,
+        GAMELIB_PROFILE_KEEP the number of dumps kept, 10 by default, and
+        GAMELIB_PROFILE_EVERY how often a turn is profiled, one in 10 by default.
+
+        Returns:
+            The profiler, or None when profiling is off
+        """
+        directory = environ.get("GAMELIB_PROFILE")
+        if not directory:
+            return None
+        return cls(directory, float(environ.get("GAMELIB_PROFILE_MS", 1000)), int(environ.get("GAMELIB_PROFILE_KEEP", 10)),
+                   int(environ.get("GAMELIB_PROFILE_EVERY", 10)))
+
+    def start(self, start=None):
+        """Starts timing a turn, and profiling it if it is sampled
+
+        Args:
+            * start: The time.perf_counter() the turn is measured from, now by default
+
+        Returns:
+            True if the turn is being profiled
+
+        """
+        self._start = time.perf_counter() if start is None else start
+        sampled = self._armed or self._turns % self.every == 0
+        self._turns += 1
+        self._armed = False
+        if sampled:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        return sampled
+
+    def stop(self, turn_number, board_hash):
+        """Stops profiling the turn and dumps it if it was slow
+
+        Args:
+            * turn_number: The turn number, used in the dump's name
+            * board_hash: A hash of the board, used in the dump's name
+
+        Returns:
+            The path of the dump, None if the turn was fast enough or was not being profiled
+
+        """
+        profile, self._profile = self._profile, None
+        if profile is not None:
+            profile.disable()
+        if self._start is None:
+            return None
+        elapsed = time.perf_counter() - self._start
+        self._start = None
+        if elapsed <= self.threshold:
+            return None
+        if profile is None:
+            # Profile the next turn instead, it is likely to be slow too
+            self._armed = True
+            return None
+        path = os.path.join(self.directory, "turn-{:04d}-{}-{}ms.prof".format(turn_number, board_hash, int(elapsed * 1000)))
+        profile.dump_stats(path)
+        self.dumps.append(path)
+        self._rotate()
+        return path
+
+    def _rotate(self):
+        dumps = sorted(glob.glob(os.path.join(self.directory, "turn-*.prof")), key=lambda path: (os.path.getmtime(path), path))
+        for path in dumps[:-self.keep]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
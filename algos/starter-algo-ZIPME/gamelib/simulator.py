@@ -0,0 +1,309 @@
+import warnings
+from array import array
+
+from .game_map import CELLS, CELL_INDEX, EMPTY, HALF_ARENA, BLOCKED_TABLE, get_cell_indices_in_range, get_squared_distances
+from .game_state import OPPOSITE_EDGE
+from .spatial import MobileUnitIndex
+
+class _SimUnit:
+    """An information unit taking part in a simulated action phase
+    """
+    __slots__ = ("player_index", "unit_type", "index", "stability", "shield", "max_stability", "frames_per_move",
+                 "timer", "moves", "path", "step", "move_direction", "target_edge", "range", "damage_f", "damage_i",
+                 "damage_to_player", "shielded_by", "targets_firewalls")
+
+    def __init__(self, player_index, unit_type, index, type_config, target_edge, frames_per_move, targets_firewalls):
+        self.player_index = player_index
+        self.unit_type = unit_type
+        self.index = index
+        self.max_stability = type_config["stability"]
+        self.stability = self.max_stability
+        self.shield = 0.
+        self.frames_per_move = frames_per_move
+        self.timer = frames_per_move
+        self.moves = 0
+        self.path = None
+        self.step = 0
+        self.move_direction = 0
+        self.target_edge = target_edge
+        self.range = type_config["range"]
+        self.damage_f = type_config["damageF"]
+        self.damage_i = type_config["damageI"]
+        self.damage_to_player = type_config.get("damageToPlayer", 1.)
+        self.shielded_by = set()
+        self.targets_firewalls = targets_firewalls
+
+
+class ActionSimulator:
+    """Plays out an action phase frame by frame on a copy of a GameState's board
+
+    Every frame runs in the order the game does:
+        1. Each encryptor shields every friendly information unit in its range that it has not shielded yet.
+           Shields then decay by shieldDecayPerFrame.
+        2. Each information unit whose move is due takes a step along its path. A unit at the end of its path
+           instead scores if it stands on its target edge, or self destructs otherwise, damaging enemy firewalls
+           within selfDestructRadius by its starting stability if it has moved at least stepsRequiredSelfDestruct times.
+        3. Every information unit and destructor attacks the target get_target would choose, all at once.
+        4. Units without stability are removed. If a firewall was destroyed and rerouteMidRound is set,
+           every unit repaths from where it stands.
+
+    The board is read once, so one simulator can try many deploys of the same turn.
+
+    Attributes:
+        * game_state (:obj: GameState): The state whose board is simulated
+        * config (JSON): Contains information about the game
+
+    """
+    def __init__(self, game_state):
+        """Reads the firewalls of a GameState
+
+        Args:
+            * game_state: The GameState to simulate from. Firewalls you built this turn are included.
+
+        """
+        self.game_state = game_state
+        self.config = game_state.config
+        self._finder = game_state._shortest_path_finder
+        unit_information = self.config["unitInformation"]
+        self._type_index = {info["shorthand"]: i for i, info in enumerate(unit_information)}
+        self._types = unit_information
+        # The unit type constants are read from the config by the first GameState
+        from .game_state import ENCRYPTOR, DESTRUCTOR, SCRAMBLER, REMOVE, INFORMATION_TYPES
+        self._encryptor = self._type_index[ENCRYPTOR]
+        self._destructor = self._type_index[DESTRUCTOR]
+        self._scrambler = self._type_index[SCRAMBLER]
+        self._remove = REMOVE
+        self._information = frozenset(self._type_index[unit_type] for unit_type in INFORMATION_TYPES)
+        mechanics = self.config["mechanics"]
+        self._shield_decay = mechanics.get("shieldDecayPerFrame", 0.)
+        self._self_destruct_steps = mechanics.get("stepsRequiredSelfDestruct", 0)
+        self._self_destruct_radius = mechanics.get("selfDestructRadius", 0.)
+        self._reroute = mechanics.get("rerouteMidRound", True)
+        self._cores_for_damage = self.config["resources"].get("coresForPlayerDamage", 0.)
+
+        game_map = game_state.game_map
+        self._owner = array('b', game_map.stationary_owner)
+        self._type = array('b', game_map.stationary_type)
+        self._stability = array('d', game_map.stationary_stability)
+        self._edges = game_map.get_edges()
+        self._edge_sets = [set(CELL_INDEX[tuple(location)] for location in edge) for edge in self._edges]
+
+    def simulate(self, deploys=None, enemy_deploys=(), max_frames=None):
+        """Plays out an action phase
+
+        Args:
+            * deploys: Your information units, a list of (unit_type, location) or (unit_type, location, num).
+              Defaults to the information units on the game map, which includes the ones you spawned this turn.
+            * enemy_deploys: Your opponent's information units, in the same format
+            * max_frames: Stop after this many frames, by default the phase runs until no information units are left
+
+        Returns:
+            A dict holding:
+                * frames: The number of frames played
+                * breaches: The number of units of each player that scored, indexed by player
+                * health_lost: The health each player lost, indexed by player
+                * cores_gained: The cores each player earned from scoring, indexed by player
+                * firewall_damage: The damage dealt to the firewalls of each player, indexed by player
+                * destroyed: The (unit_type, location, player_index) of every firewall destroyed
+                * self_destructs: The number of units of each player that self destructed, indexed by player
+                * survivors: The information units of each player still on the board, indexed by player
+
+        """
+        owner = array('b', self._owner)
+        types = array('b', self._type)
+        stability = array('d', self._stability)
+        result = {"frames": 0, "breaches": [0, 0], "health_lost": [0., 0.], "cores_gained": [0., 0.],
+                  "firewall_damage": [0., 0.], "destroyed": [], "self_destructs": [0, 0], "survivors": [0, 0]}
+
+        if deploys is None:
+            deploys = []
+            enemy_from_map = []
+            for location, cell_units in self.game_state.game_map.get_occupied():
+                for unit in cell_units:
+                    if not unit.unit_type == self._remove and not unit.stationary:
+                        (deploys if unit.player_index == 0 else enemy_from_map).append((unit.unit_type, location))
+            enemy_deploys = list(enemy_deploys) + enemy_from_map
+        units = self._spawn(deploys, 0, owner) + self._spawn(enemy_deploys, 1, owner)
+        mobile = MobileUnitIndex()
+        for unit in units:
+            mobile.add(unit, unit.index)
+        encryptor, destructor = self._encryptor, self._destructor
+        encryptors = [(index, owner[index], set(get_cell_indices_in_range(index, self._types[encryptor]["range"])))
+                      for index in range(len(types)) if types[index] == encryptor]
+        destructors = [index for index in range(len(types)) if types[index] == destructor]
+        shield_amount = self._types[encryptor].get("shieldAmount", 0.)
+        destructor_range = self._types[destructor]["range"]
+        destructor_damage = self._types[destructor]["damage"]
+        self._route(units, owner)
+
+        frame = 0
+        while units and (max_frames is None or frame < max_frames):
+            frame += 1
+            # Shields
+            for unit in units:
+                for index, encryptor_owner, covered in encryptors:
+                    if (unit.player_index == encryptor_owner and unit.index in covered and
+                            index not in unit.shielded_by and types[index] == encryptor):
+                        unit.shielded_by.add(index)
+                        unit.shield += shield_amount
+                        unit.stability += shield_amount
+                if unit.shield > 0:
+                    decay = min(self._shield_decay, unit.shield)
+                    unit.shield -= decay
+                    unit.stability -= decay
+
+            # Movement
+            damaged = set()
+            remaining = []
+            for unit in units:
+                unit.timer -= 1
+                if unit.timer > 0:
+                    remaining.append(unit)
+                    continue
+                unit.timer = unit.frames_per_move
+                if unit.step < len(unit.path) - 1:
+                    unit.step += 1
+                    next_index = unit.path[unit.step]
+                    unit.move_direction = self._finder.VERTICAL if CELLS[next_index][0] == CELLS[unit.index][0] else self._finder.HORIZONTAL
+                    unit.index = next_index
+                    mobile.move(unit, next_index)
+                    unit.moves += 1
+                    remaining.append(unit)
+                    continue
+                mobile.remove(unit)
+                if unit.index in self._edge_sets[unit.target_edge]:
+                    result["breaches"][unit.player_index] += 1
+                    result["health_lost"][1 - unit.player_index] += unit.damage_to_player
+                    result["cores_gained"][unit.player_index] += self._cores_for_damage
+                else:
+                    result["self_destructs"][unit.player_index] += 1
+                    if unit.moves >= self._self_destruct_steps:
+                        for index in get_cell_indices_in_range(unit.index, self._self_destruct_radius):
+                            if owner[index] == 1 - unit.player_index:
+                                stability[index] -= unit.max_stability
+                                result["firewall_damage"][owner[index]] += unit.max_stability
+                                damaged.add(index)
+            units = remaining
+
+            # Attacks, every target is chosen before any damage is dealt
+            hits = []
+            for unit in units:
+                target = self._get_target(unit.index, unit.player_index, unit.range, unit.targets_firewalls, mobile, owner, stability)
+                if target is not None:
+                    hits.append((target, unit.damage_f if isinstance(target, int) else unit.damage_i))
+            for index in destructors:
+                if types[index] == destructor:
+                    target = self._get_target(index, owner[index], destructor_range, False, mobile, owner, stability)
+                    if target is not None:
+                        hits.append((target, destructor_damage))
+            for target, damage in hits:
+                if isinstance(target, int):
+                    stability[target] -= damage
+                    result["firewall_damage"][owner[target]] += damage
+                    damaged.add(target)
+                else:
+                    absorbed = min(target.shield, damage)
+                    target.shield -= absorbed
+                    target.stability -= damage
+
+            # Removal
+            for unit in units:
+                if unit.stability <= 0:
+                    mobile.remove(unit)
+            units = [unit for unit in units if unit.stability > 0]
+            layout_changed = False
+            for index in sorted(damaged):
+                if stability[index] <= 0:
+                    result["destroyed"].append((self._types[types[index]]["shorthand"], list(CELLS[index]), owner[index]))
+                    owner[index] = EMPTY
+                    types[index] = EMPTY
+                    layout_changed = True
+            if layout_changed and self._reroute and units:
+                self._route(units, owner)
+
+        result["frames"] = frame
+        for unit in units:
+            result["survivors"][unit.player_index] += 1
+        return result
+
+    def simulate_many(self, options, enemy_deploys=(), max_frames=None):
+        """Plays out an action phase for each of several deploys
+
+        Args:
+            * options: A list of deploys, each in the format simulate takes
+            * enemy_deploys: Your opponent's information units, the same for every option
+            * max_frames: Stop each simulation after this many frames
+
+        Returns:
+            A list with the result of simulate for each option, in the same order
+
+        """
+        return [self.simulate(deploys, enemy_deploys, max_frames) for deploys in options]
+
+    def _spawn(self, deploys, player_index, owner):
+        units = []
+        for deploy in deploys:
+            unit_type, location = deploy[0], deploy[1]
+            num = deploy[2] if len(deploy) > 2 else 1
+            index = CELL_INDEX.get(tuple(location), EMPTY)
+            type_index = self._type_index.get(unit_type)
+            if type_index not in self._information:
+                warnings.warn("Invalid unit {}".format(unit_type))
+                continue
+            if index == EMPTY or not owner[index] == EMPTY:
+                warnings.warn("Could not simulate {} at location {}. Location is blocked or invalid.".format(unit_type, location))
+                continue
+            spawn_edge = None
+            for edge, edge_set in enumerate(self._edge_sets):
+                if index in edge_set:
+                    spawn_edge = edge
+                    break
+            if spawn_edge is None:
+                warnings.warn("Could not simulate {} at location {}. Information units must start on an edge.".format(unit_type, location))
+                continue
+            type_config = self._types[type_index]
+            frames_per_move = max(1, int(round(1 / type_config["speed"])))
+            for _ in range(num):
+                units.append(_SimUnit(player_index, unit_type, index, type_config, OPPOSITE_EDGE[spawn_edge],
+                                      frames_per_move, not type_index == self._scrambler))
+        return units
+
+    def _route(self, units, owner):
+        """Gives every unit its path from where it stands on the current firewalls
+        """
+        layout = owner.tobytes().translate(BLOCKED_TABLE)
+        by_edge = {}
+        for unit in units:
+            by_edge.setdefault(unit.target_edge, []).append(unit)
+        for target_edge, edge_units in by_edge.items():
+            paths = self._finder.navigate_layout([CELLS[unit.index] for unit in edge_units], self._edges[target_edge], layout,
+                                                 [unit.move_direction for unit in edge_units])
+            for unit, path in zip(edge_units, paths):
+                unit.path = [CELL_INDEX[tuple(location)] for location in path]
+                unit.step = 0
+
+    def _get_target(self, index, player_index, radius, targets_firewalls, mobile, owner, stability):
+        """Picks a target the way AdvancedGameState.get_target does:
+        information units first, then the nearest, lowest stability, lowest y and furthest from the center.
+
+        Returns:
+            An enemy _SimUnit, the cell index of an enemy firewall, or None
+        """
+        enemy = 1 - player_index
+        distances = get_squared_distances(index)
+        best = None
+        best_key = None
+        for unit in mobile.get_units_in_range(index, radius, enemy):
+            target_x, target_y = CELLS[unit.index]
+            key = (distances[unit.index], unit.stability, target_y, -abs(HALF_ARENA - 0.5 - target_x))
+            if best_key is None or key < best_key:
+                best, best_key = unit, key
+        if best is not None or not targets_firewalls:
+            return best
+        for target_index in get_cell_indices_in_range(index, radius):
+            if owner[target_index] == enemy:
+                target_x, target_y = CELLS[target_index]
+                key = (distances[target_index], stability[target_index], target_y, -abs(HALF_ARENA - 0.5 - target_x))
+                if best_key is None or key < best_key:
+                    best, best_key = target_index, key
+        return best
@@ -0,0 +1,251 @@
+import heapq
+import math
+
+from .game_map import ARENA_SIZE, CELLS, EMPTY, get_cell_set_in_range, get_squared_distances
+
+# The board is hashed into square buckets of this many cells a side
+BUCKET_SIZE = 4
+_BUCKETS_PER_SIDE = (ARENA_SIZE + BUCKET_SIZE - 1) // BUCKET_SIZE
+_CELL_BUCKET = tuple((x // BUCKET_SIZE) * _BUCKETS_PER_SIDE + y // BUCKET_SIZE for x, y in CELLS)
+_BOTH_PLAYERS = (0, 1)
+_range_buckets = {}
+
+
+def _get_range_buckets(index, radius):
+    # The buckets overlapping the square get_range_offsets scans around a cell, memoized per (cell, radius)
+    key = (index, radius)
+    buckets = _range_buckets.get(key)
+    if buckets is None:
+        x, y = CELLS[index]
+        low = -math.ceil(radius)
+        high = math.floor(radius)
+        buckets = tuple(bucket_x * _BUCKETS_PER_SIDE + bucket_y
+                        for bucket_x in range(max(x + low, 0) // BUCKET_SIZE, min(x + high, ARENA_SIZE - 1) // BUCKET_SIZE + 1)
+                        for bucket_y in range(max(y + low, 0) // BUCKET_SIZE, min(y + high, ARENA_SIZE - 1) // BUCKET_SIZE + 1))
+        _range_buckets[key] = buckets
+    return buckets
+
+
+def _bucket_distance(x, y, bucket):
+    # The squared distance from a cell to the nearest cell of a bucket
+    low_x = bucket // _BUCKETS_PER_SIDE * BUCKET_SIZE
+    low_y = bucket % _BUCKETS_PER_SIDE * BUCKET_SIZE
+    dx = max(low_x - x, 0, x - (low_x + BUCKET_SIZE - 1))
+    dy = max(low_y - y, 0, y - (low_y + BUCKET_SIZE - 1))
+    return dx ** 2 + dy ** 2
+
+
+class MobileUnitIndex:
+    """A spatial hash of information units, updated as they move between cells
+
+    The board is split into buckets of BUCKET_SIZE by BUCKET_SIZE cells, each holding the cells with units
+    of a player. Queries only visit the buckets their area overlaps, so finding the units near a cell costs
+    about the number of units there rather than the number of cells in range.
+
+    Units are anything with player_index and unit_type attributes, like GameUnits or simulated units,
+    and are tracked by identity. Units sharing a cell are kept in the order they were first added,
+    moving a unit does not change it.
+
+    """
+    def __init__(self):
+        # __buckets[player_index][bucket] maps each cell index of the bucket with units to their list
+        self.__buckets = [[{} for _ in range(_BUCKETS_PER_SIDE ** 2)] for _ in range(2)]
+        # id(unit) -> [unit, cell index, order it was added in]
+        self.__entries = {}
+        self.__added = 0
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __contains__(self, unit):
+        return id(unit) in self.__entries
+
+    def add(self, unit, index):
+        """Adds a unit on a cell, or moves it there if it is already in the index
+
+        Args:
+            * unit: The unit, owned by player 0 or 1
+            * index: The flat index of its cell
+
+        """
+        entry = self.__entries.get(id(unit))
+        if entry is not None:
+            self.move(unit, index)
+            return
+        self.__entries[id(unit)] = [unit, index, self.__added]
+        self.__added += 1
+        self.__buckets[unit.player_index][_CELL_BUCKET[index]].setdefault(index, []).append(unit)
+
+    def remove(self, unit):
+        """Removes a unit
+
+        Returns:
+            The flat index of the cell it was on, EMPTY if it was not in the index
+
+        """
+        entry = self.__entries.pop(id(unit), None)
+        if entry is None:
+            return EMPTY
+        self.__take(unit, entry[1])
+        return entry[1]
+
+    def move(self, unit, index):
+        """Moves a unit to another cell, keeping its place among units added after it
+
+        Args:
+            * unit: A unit in the index
+            * index: The flat index of its new cell
+
+        """
+        entry = self.__entries[id(unit)]
+        if entry[1] == index:
+            return
+        self.__take(unit, entry[1])
+        entry[1] = index
+        self.__insert(unit, index, entry[2])
+
+    def replace(self, unit, other, index):
+        """Swaps a unit for another on a cell, which takes its place among the units added after it
+
+        Args:
+            * unit: A unit in the index
+            * other: The unit taking its place, owned by the same player
+            * index: The flat index of the cell other is on
+
+        """
+        entry = self.__entries.pop(id(unit))
+        self.__take(unit, entry[1])
+        self.__entries[id(other)] = [other, index, entry[2]]
+        self.__insert(other, index, entry[2])
+
+    def clear(self):
+        for player in self.__buckets:
+            for bucket in player:
+                bucket.clear()
+        self.__entries.clear()
+
+    def copy(self):
+        """Copies the index, the copy holds the same units but changes independently
+        """
+        copy = MobileUnitIndex.__new__(MobileUnitIndex)
+        copy.__buckets = [[{index: list(units) for index, units in bucket.items()} for bucket in player] for player in self.__buckets]
+        copy.__entries = {key: list(entry) for key, entry in self.__entries.items()}
+        copy.__added = self.__added
+        return copy
+
+    def get_cell(self, unit):
+        """Gets the flat index of a unit's cell, EMPTY if it is not in the index
+        """
+        entry = self.__entries.get(id(unit))
+        return EMPTY if entry is None else entry[1]
+
+    def get_units(self, index, player_index=None, unit_type=None):
+        """Gets the units on a cell
+
+        Args:
+            * index: The flat index of the cell
+            * player_index: Only get this player's units, both players' by default
+            * unit_type: Only get units of this type, every type by default
+
+        Returns:
+            A list of units
+
+        """
+        units = []
+        for player in self.__players(player_index):
+            units.extend(self.__buckets[player][_CELL_BUCKET[index]].get(index, ()))
+        return self.__filter(units, unit_type)
+
+    def get_units_in_range(self, index, radius, player_index=None, unit_type=None):
+        """Gets the units in range of a cell, using the same area as GameMap.get_locations_in_range
+
+        Args:
+            * index: The flat index of the center cell
+            * radius: The radius of the area
+            * player_index: Only get this player's units, both players' by default
+            * unit_type: Only get units of this type, every type by default
+
+        Returns:
+            A list of units, nearest first. Units at the same distance are ordered by cell index.
+
+        """
+        found = []
+        for player in self.__players(player_index):
+            buckets = self.__buckets[player]
+            for bucket in _get_range_buckets(index, radius):
+                cells = buckets[bucket]
+                if cells:
+                    found.extend((cell, player, units) for cell, units in cells.items())
+        if not found:
+            return []
+        in_range = get_cell_set_in_range(index, radius)
+        distances = get_squared_distances(index)
+        found = [(distances[cell], cell, player, units) for cell, player, units in found if cell in in_range]
+        # A cell and player are never found twice, so the unit lists are never compared
+        found.sort()
+        units = [unit for _, _, _, cell_units in found for unit in cell_units]
+        return units if unit_type is None else self.__filter(units, unit_type)
+
+    def get_nearest(self, index, k=1, player_index=None, unit_type=None):
+        """Gets the k units nearest to a cell
+
+        Buckets are searched outwards from the cell, stopping once no unsearched bucket can hold a nearer unit.
+
+        Args:
+            * index: The flat index of the cell
+            * k: The number of units to get
+            * player_index: Only get this player's units, both players' by default
+            * unit_type: Only get units of this type, every type by default
+
+        Returns:
+            A list of up to k units, nearest first. Ties go to the lowest cell index, then to the unit added first.
+
+        """
+        if k <= 0:
+            return []
+        x, y = CELLS[index]
+        distances = get_squared_distances(index)
+        buckets = [(_bucket_distance(x, y, bucket), player, bucket)
+                   for player in self.__players(player_index)
+                   for bucket, cells in enumerate(self.__buckets[player]) if cells]
+        buckets.sort()
+        # Max heap of the k best (distance, cell, order) found so far
+        best = []
+        for bucket_distance, player, bucket in buckets:
+            if len(best) == k and bucket_distance > -best[0][0]:
+                break
+            for cell, units in self.__buckets[player][bucket].items():
+                distance = distances[cell]
+                for unit in self.__filter(units, unit_type):
+                    item = (-distance, -cell, -self.__entries[id(unit)][2], unit)
+                    if len(best) < k:
+                        heapq.heappush(best, item)
+                    elif item[:3] > best[0][:3]:
+                        heapq.heapreplace(best, item)
+        best.sort(key=lambda item: item[:3], reverse=True)
+        return [item[3] for item in best]
+
+    def __insert(self, unit, index, order):
+        units = self.__buckets[unit.player_index][_CELL_BUCKET[index]].setdefault(index, [])
+        position = len(units)
+        while position > 0 and self.__entries[id(units[position - 1])][2] > order:
+            position -= 1
+        units.insert(position, unit)
+
+    def __take(self, unit, index):
+        bucket = self.__buckets[unit.player_index][_CELL_BUCKET[index]]
+        units = bucket[index]
+        for position, other in enumerate(units):
+            if other is unit:
+                del units[position]
+                break
+        if not units:
+            del bucket[index]
+
+    def __players(self, player_index):
+        return _BOTH_PLAYERS if player_index is None else (player_index,)
+
+    def __filter(self, units, unit_type):
+        if unit_type is None:
+            return list(units)
+        return [unit for unit in units if unit.unit_type == unit_type]
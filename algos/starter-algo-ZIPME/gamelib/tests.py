@@ -1,8 +1,25 @@
 import unittest
 import json
+import warnings
+import io
+import time
+import contextlib
+import threading
+import os
+import tempfile
+from unittest import mock
 from .game_state import GameState
-from .unit import GameUnit
+from .unit import GameUnit, UnitSpec
 from .advanced_game_state import AdvancedGameState
+from .navigation import ShortestPathFinder, PocketMap
+from . import threat_map as threat_map_module
+from . import algocore as algocore_module
+from .action import Action
+from .simulator import ActionSimulator
+from .planner import TurnBudget, AnytimePlanner, BackgroundWorker
+from .metrics import Metrics, METRICS
+from .profiling import SlowTurnProfiler, get_board_hash
+from .algocore import AlgoCore, read_message, FrameView, CONFIG, TURN, ACTION_FRAME, UNKNOWN
 
 class BasicTests(unittest.TestCase):
 
@@ -183,10 +200,37 @@ class BasicTests(unittest.TestCase):
             game.game_map.add_unit("FF", [13,13])
         self.assertEqual(1, len(game.game_map[13,13]), "Towers seem to be stacking")
         
+    def test_stationary_arrays(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game_map = game.game_map
+        index = game_map.get_cell_index([13,13])
+        self.assertEqual(420, len(game_map.stationary_owner), "Every cell of the diamond should be numbered")
+        self.assertEqual(-1, game_map.get_cell_index([0,0]), "Corners are not part of the board")
+        game_map.add_unit("EI", [13,13], 1)
+        self.assertEqual(-1, game_map.stationary_owner[index], "Information units are not stationary")
+        game_map.add_unit("DF", [13,13], 1)
+        self.assertEqual(1, game_map.stationary_owner[index], "Firewall owner was not recorded")
+        self.assertEqual(2, game_map.stationary_type[index], "Firewall type was not recorded")
+        self.assertEqual(75, game_map.stationary_stability[index], "Firewall stability was not recorded")
+        game_map.remove_unit([13,13])
+        self.assertEqual(-1, game_map.stationary_type[index], "Removed firewall is still recorded")
+        game_map[13,13] = [GameUnit("FF", game.config, 0, 20, 13, 13)]
+        self.assertEqual(0, game_map.stationary_owner[index], "Assigned firewall was not recorded")
+        self.assertEqual(20, game_map.stationary_stability[index], "Assigned firewall stability was not recorded")
+
     def test_get_units_in_range(self, adv=False):
         game = self.make_turn_0_map(adv)
         self.assertEqual(1, len(game.game_map.get_locations_in_range([13,13], 0)), "We should be in 0 range of ourself")
         self.assertEqual(37, len(game.game_map.get_locations_in_range([13,13], 3)), "Wrong number of tiles in range")
+        self.assertEqual(14, len(game.game_map.get_locations_in_range([13,0], 3)), "Range should be clipped to the board")
+
+    def test_get_locations_in_range_batch(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        centers = [[13,0], [0,13], [13,13], [27,14]]
+        expected = [game.game_map.get_locations_in_range(center, 1.5) for center in centers]
+        self.assertEqual(expected, game.game_map.get_locations_in_range_batch(centers, 1.5), "Batch ranges should match single ranges")
+        game.game_map.get_locations_in_range([13,13], 3).append([0,0])
+        self.assertEqual(37, len(game.game_map.get_locations_in_range([13,13], 3)), "Cached ranges should not be shared with callers")
 
     def _test_get_attackers(self):
         game = self.make_turn_0_map(True)
@@ -204,6 +248,717 @@ class BasicTests(unittest.TestCase):
         game.game_map.add_unit("DF", [14,14], 1)
         self.assertEqual(3, len(game.get_attackers([13,13], 0)), "We should be in danger from 3 places")
 
+    def test_threat_map(self, adv=False):
+        # Cover the pure Python path, and in the thorough run the numpy one too when numpy is installed
+        backends = [None] if not adv or threat_map_module.np is None else [None, threat_map_module.np]
+        for np in backends:
+            with self.subTest(numpy=np is not None), mock.patch.object(threat_map_module, "np", np):
+                game = self.make_turn_0_map(True)
+                for location in [[12,14], [13,14], [14,14], [3,16]]:
+                    game.game_map.add_unit("DF", location, 1)
+                game.game_map.add_unit("DF", [12,12], 0)
+                threat = game.threat_map(0)
+                for x, y in game.game_map:
+                    attackers = game.get_attackers([x, y], 0)
+                    self.assertEqual(len(attackers), threat.count_at([x, y]), "Threat map disagrees with get_attackers at {}".format([x, y]))
+                    self.assertEqual(4 * len(attackers), threat.damage_at([x, y]), "Wrong damage per frame at {}".format([x, y]))
+                path = [[13,12], [13,13], [13,14]]
+                self.assertEqual(4 * 3 + 4 * 3 + 4 * 3, threat.path_damage(path), "Wrong damage along the path")
+                self.assertEqual(1, game.threat_map(1).count_at([13,13]), "Our destructor should threaten the enemy")
+
+    def test_find_path_to_edge(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        top_right = game.game_map.get_edge_locations(game.game_map.TOP_RIGHT)
+        path = game.find_path_to_edge([13,0], game.game_map.TOP_RIGHT)
+        self.assertEqual([13,0], path[0], "Path should start at the start location")
+        self.assertIn(path[-1], top_right, "Path should end on the target edge")
+        for (x1, y1), (x2, y2) in zip(path, path[1:]):
+            self.assertEqual(1, abs(x1 - x2) + abs(y1 - y2), "Path should move one tile at a time")
+        for x in range(1, 27):
+            game.game_map.add_unit("FF", [x, 13], 0)
+        path = game.find_path_to_edge([13,0], game.game_map.TOP_RIGHT)
+        self.assertEqual([26,12], path[-1], "Blocked units should stop at the most ideal tile of their pocket")
+        self.assertIsNone(game.find_path_to_edge([5,13], game.game_map.TOP_RIGHT), "Pathing from a firewall should fail")
+
+    def test_path_cache(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        first = game.find_path_to_edge([13,0], game.game_map.TOP_RIGHT)
+        first.append([0,0])
+        second = game.find_path_to_edge([13,0], game.game_map.TOP_RIGHT)
+        self.assertEqual(first[:-1], second, "Cached path should match the computed path")
+        self.assertEqual({"hits": 1, "misses": 1, "size": 1}, game.path_cache.stats(), "Second lookup should hit the cache")
+        game.attempt_spawn("FF", [[13,1]])
+        blocked = game.find_path_to_edge([13,0], game.game_map.TOP_RIGHT)
+        self.assertNotIn([13,1], blocked, "Placing a firewall should invalidate cached paths")
+        game.game_map.remove_unit([13,1])
+        self.assertEqual(second, game.find_path_to_edge([13,0], game.game_map.TOP_RIGHT), "Restoring the board should reuse the first path")
+        self.assertEqual(2, game.path_cache.hits, "Restored board should hit the cache")
+
+    def test_find_paths_to_edge(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        for x in range(3, 27):
+            game.game_map.add_unit("FF", [x, 13], 0)
+        game.game_map.add_unit("FF", [6, 7], 0)
+        starts = game.game_map.get_edge_locations(game.game_map.BOTTOM_LEFT)
+        expected = []
+        for start in starts:
+            if game.contains_stationary_unit(start):
+                expected.append(None)
+                continue
+            expected.append(game._shortest_path_finder.navigate_multiple_endpoints(start, game.game_map.get_edge_locations(game.game_map.TOP_RIGHT), game))
+        self.assertEqual(expected, game.find_paths_to_edge(None, game.game_map.TOP_RIGHT), "Batch paths should match single paths")
+        self.assertEqual(expected[3], game.find_path_to_edge(starts[3], game.game_map.TOP_RIGHT), "Single lookups should use the batch results")
+
+    def test_incremental_pathing(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game._shortest_path_finder = ShortestPathFinder(verify=True)
+        top_right = game.game_map.get_edge_locations(game.game_map.TOP_RIGHT)
+        walls = [[x, 13] for x in range(27, 0, -1)] + [[x, 11] for x in range(2, 26)] + [[6, 7], [7, 6]]
+        for wall in walls:
+            game.game_map.add_unit("FF", wall, 0)
+            path = game.find_path_to_edge([13,0], game.game_map.TOP_RIGHT)
+            self.assertEqual(ShortestPathFinder().navigate_multiple_endpoints([13,0], top_right, game), path, "Repaired path differs after placing {}".format(wall))
+        for wall in walls[::3]:
+            game.game_map.remove_unit(wall)
+            path = game.find_path_to_edge([13,0], game.game_map.TOP_RIGHT)
+            self.assertEqual(ShortestPathFinder().navigate_multiple_endpoints([13,0], top_right, game), path, "Repaired path differs after removing {}".format(wall))
+        field = list(game._shortest_path_finder._edge_fields.values())[0]
+        self.assertEqual(1, field.rebuilds, "Single firewall changes should be repaired, not rebuilt")
+
+    def test_evaluate_placements(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        for x in range(0, 27):
+            game.game_map.add_unit("FF", [x, 13], 0)
+        game.game_map.add_unit("DF", [25, 11], 0)
+        layout = game.game_map.get_layout_fingerprint()
+        candidates = [("FF", [27, 13]), ("DF", [26, 12]), [("RM", [25, 11]), ("RM", [13, 13])]]
+        results = game.evaluate_placements(candidates, "exposure")
+        self.assertEqual(layout, game.game_map.get_layout_fingerprint(), "Evaluating placements should not change the board")
+        self.assertEqual([], game._build_stack, "Evaluating placements should not build anything")
+        self.assertEqual(0, results[0]["breaches"], "Closing the last gap should stop every breach")
+        self.assertIsNone(results[0]["breach_edge"], "Sealed units should self destruct")
+        self.assertEqual(game.game_map.BOTTOM_RIGHT, results[1]["breach_edge"], "Units should still breach through the right gap")
+        self.assertGreater(results[1]["exposure"], 0, "The new destructor should cover the gap")
+        self.assertEqual(0, results[2]["exposure"], "Removing the only destructor should remove all exposure")
+        self.assertEqual(28, results[2]["breaches"], "Opening the middle should let every spawn location breach")
+        game.game_map.add_unit("DF", [26, 12], 0)
+        enemy_path = game.find_path_to_edge(results[1]["path"][0], game.game_map.BOTTOM_RIGHT)
+        self.assertEqual(enemy_path, results[1]["path"], "Hypothetical path should match the real one")
+
+        # Every unit of yours has to go through the gap at [13, 14], in range of the enemy destructor
+        game = self.make_turn_0_map(adv)
+        for x in range(28):
+            if x != 13:
+                game.game_map.add_unit("FF", [x, 14], 1)
+        game.game_map.add_unit("DF", [13, 16], 1)
+        own, enemy = [("FF", [12, 12]), ("DF", [12, 12])], [("FF", [12, 16]), ("DF", [12, 16])]
+        results = game.evaluate_placements(own + enemy, player_index=0)
+        self.assertGreater(results[0]["exposure"], 0)
+        self.assertEqual(results[0]["exposure"], results[1]["exposure"], "Your own destructors should not threaten your units")
+        self.assertEqual(results[0]["path"], results[1]["path"])
+        self.assertGreater(results[3]["exposure"], results[2]["exposure"], "Enemy destructors should threaten your units")
+
+    def test_simulate_action(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        # Only AdvancedGameState wraps the simulator
+        simulate_action = game.simulate_action if adv else lambda deploys: ActionSimulator(game).simulate(deploys)
+        result = simulate_action([("PI", [13, 0], 5)])
+        self.assertEqual([5, 0], result["breaches"], "Every ping should score on an empty board")
+        self.assertEqual(5, result["health_lost"][1])
+
+        for x in range(game.ARENA_SIZE):
+            game.game_map.add_unit("FF", [x, 14], 1)
+        result = simulate_action([("PI", [13, 0], 5)])
+        self.assertEqual([5, 0], result["self_destructs"], "A full wall should make every ping self destruct")
+        self.assertEqual([["FF", [26, 14], 1], ["FF", [27, 14], 1]], sorted(map(list, result["destroyed"])))
+        self.assertEqual(1, len(game.game_map[26, 14]), "Simulating should not change the board")
+
+    def test_action_frames(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        helper_map = game.game_map.__class__(game.config)
+        size = game.ARENA_SIZE
+        helper_map.attack_turn = [[{} for _ in range(size)] for _ in range(size)]
+        helper_map.damage_turn = [[{} for _ in range(size)] for _ in range(size)]
+        helper_map.remove_turn = [[[] for _ in range(size)] for _ in range(size)]
+        helper_map.breach_turn = [[[] for _ in range(size)] for _ in range(size)]
+        helper_map.n_units_ever_spawned = [[[0] * 7 for _ in range(size)] for _ in range(size)]
+        helper_map.priority = [[0 for _ in range(size)] for _ in range(size)]
+
+        def frame(**events):
+            all_events = {name: [] for name in ["selfDestruct", "breach", "damage", "shield", "move", "spawn", "death", "attack", "melee"]}
+            all_events.update(events)
+            return json.dumps({"p1Units": [[]] * 7, "p2Units": [[]] * 7, "turnInfo": [1, 0, 0], "p1Stats": [30.0, 25.0, 5.0, 0],
+                               "p2Stats": [30.0, 22.0, 2.0, 0], "events": all_events})
+
+        action = Action(game.config, game, helper_map, player_index=1)
+        action.add_frame(frame(spawn=[[[13, 27], 3, "1", 2], [[13, 27], 3, "2", 2], [[12, 16], 2, "3", 2]]))
+        action.add_frame(frame(move=[[[13, 27], [13, 26], [0, 0], 3, "1", 2], [[13, 27], [13, 26], [0, 0], 3, "2", 2]],
+                               attack=[[[13, 26], [13, 23], 1.0, 3, "1", "9", 2]]))
+        action.add_frame(json.loads(frame(breach=[[[13, 26], 1.0, 3, "1", 2]])))
+
+        self.assertEqual(3, action.n_frames)
+        self.assertEqual([(12, 16)], action.firewall_spawned[2])
+        self.assertEqual(-3, action.cores_used)
+        group = action.attacker_group_spawned[0][0]
+        self.assertEqual((2, [(13, 27), (13, 26)], 1.0, 1), (group.number, group.path, group.attack, group.breach))
+        self.assertEqual({0: 1.0}, helper_map.damage_turn[13][23])
+        self.assertEqual([0], helper_map.breach_turn[13][26])
+
+    def test_read_message(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        turn = read_message(game.serialized_string)
+        self.assertEqual(TURN, turn.kind)
+        self.assertEqual(game.turn_number, GameState(game.config, turn.data).turn_number, "GameState should accept a decoded turn")
+        self.assertEqual(CONFIG, read_message(json.dumps(game.config)).kind)
+        frame = dict(turn.data, turnInfo=[1, 0, 3])
+        self.assertEqual(ACTION_FRAME, read_message(json.dumps(frame)).kind)
+        self.assertEqual(UNKNOWN, read_message("not json").kind)
+        self.assertGreaterEqual(turn.decode_time, 0)
+
+    def test_frame_subscription(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        frame = json.loads(game.serialized_string)
+        frame["turnInfo"] = [1, 0, 4]
+        frame["events"]["breach"] = [[[13, 27], 1.0, 3, "1", 1], [[14, 0], 1.0, 3, "2", 2]]
+        frame["events"]["attack"] = [[[13, 26], [13, 23], 1.0, 3, "1", "9", 2]]
+
+        message = read_message(json.dumps(frame), (frozenset(["breach"]), frozenset([2, "2"])))
+        self.assertEqual(ACTION_FRAME, message.kind)
+        self.assertIsInstance(message.data, FrameView)
+        self.assertEqual([1, 0, 4], message.data["turnInfo"])
+        self.assertEqual([[[14, 0], 1.0, 3, "2", 2]], message.data["events"]["breach"], "Only the subscribed player's breaches should be kept")
+        self.assertEqual([], message.data["events"]["attack"], "Events not subscribed to should read as empty")
+        self.assertEqual(TURN, read_message(game.serialized_string, (frozenset(), None)).kind, "Turns should still be decoded in full")
+        with mock.patch.object(algocore_module, "_decode_value", side_effect=AssertionError("decoded twice")):
+            for line in [game.serialized_string, json.dumps(game.config), json.dumps(dict(frame, turnInfo=[2, 0, 4]))]:
+                self.assertIsInstance(read_message(line, (None, None)).data, dict, "Other messages should be decoded once in full")
+
+    def test_frame_duplicate_keys(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        state = json.loads(game.serialized_string)
+        frame = {"decoy": {"turnInfo": [0, 9, 9], "events": {"breach": [["decoy"]]}, "breach": [["decoy"]]},
+                 "note": 'say "turnInfo": [0] and "breach": []', "turnInfo": [1, 0, 4]}
+        frame.update((key, value) for key, value in state.items() if key != "turnInfo")
+        frame["events"]["breach"] = [[[14, 0], 1.0, 3, "2", 2]]
+
+        message = read_message(json.dumps(frame), (None, None))
+        self.assertEqual(ACTION_FRAME, message.kind, "Keys of earlier objects and strings should be skipped")
+        self.assertIsInstance(message.data, FrameView)
+        self.assertEqual([1, 0, 4], message.data["turnInfo"])
+        self.assertEqual([[[14, 0], 1.0, 3, "2", 2]], message.data["events"]["breach"])
+        self.assertEqual([], message.data["events"]["attack"])
+        self.assertIsNone(message.data.get("breach"), "Only top level keys should be found")
+
+    def test_anytime_planner(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        config = dict(game.config, timingAndReplay={"waitTimeBotSoft": 400, "waitTimeBotMax": 1000})
+        budget = TurnBudget(config, start=time.perf_counter() - 1, margin=0.05)
+        self.assertEqual((0.4, 1.0, 0.05), (budget.soft_limit, budget.hard_limit, budget.margin))
+        self.assertTrue(budget.expired())
+        self.assertEqual(0., budget.remaining())
+        self.assertFalse(budget.has_time_for(0))
+
+        config = dict(game.config, timingAndReplay={"waitTimeBotSoft": 1000000, "waitTimeBotMax": 1000000})
+        budget = TurnBudget(config)
+        depths = []
+
+        def refine(depth, budget):
+            depths.append(depth)
+            return depth, [("FF", depth, 13)], []
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            score, build_stack, deploy_stack = AnytimePlanner(game, budget).run(refine, max_depth=3)
+            game.submit_turn()
+        self.assertEqual([1, 2, 3], depths)
+        self.assertEqual((3, [("FF", 3, 13)]), (score, build_stack))
+        self.assertEqual(2, len(output.getvalue().splitlines()), "The turn should only be submitted once")
+
+    def test_anytime_planner_deadline(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        config = dict(game.config, timingAndReplay={"waitTimeBotSoft": 200, "waitTimeBotMax": 1000})
+        submitted = threading.Event()
+        submit = game._submit
+        def notify(build_stack, deploy_stack):
+            result = submit(build_stack, deploy_stack)
+            submitted.set()
+            return result
+        game._submit = notify
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output), warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            # The deadline has already passed, so the watchdog submits the game state's plan straight away
+            game.attempt_spawn("FF", [[13, 13]])
+            planner = AnytimePlanner(game, TurnBudget(config, start=time.perf_counter() - 1, margin=0.05))
+            self.assertTrue(submitted.wait(10), "The watchdog should submit once the deadline passed")
+        self.assertTrue(planner.submitted())
+        self.assertEqual('[["FF", 13, 13]]', output.getvalue().splitlines()[0])
+
+        game = self.make_turn_0_map(adv)
+        config = dict(game.config, timingAndReplay={"waitTimeBotSoft": 1000000, "waitTimeBotMax": 1000000})
+        planner = game.planner(TurnBudget(config))
+        self.assertIsInstance(planner, AnytimePlanner)
+
+        def refine(depth, budget):
+            # Stands in for the watchdog submitting while refine runs
+            planner.propose(depth, [("FF", depth, 13)], [])
+            planner.submit()
+            return depth + 1, [("FF", depth + 1, 13)], []
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output), warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            score, build_stack, deploy_stack = planner.run(refine)
+        self.assertEqual(2, len(output.getvalue().splitlines()))
+        self.assertEqual([], caught, "Run should not submit again after the watchdog")
+        self.assertEqual((1, [("FF", 1, 13)]), (score, build_stack), "Plans proposed after the submit should be ignored")
+        self.assertEqual(1, planner.depth)
+
+    def test_background_worker(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game.game_map.add_unit("FF", [13, 13], 0)
+        # The task runs after the caches are warmed, waiting on it stands in for the action phase
+        warmed = threading.Event()
+        def task(game_state, stop_event):
+            warmed.set()
+            return "candidates"
+        worker = BackgroundWorker(game, task).start()
+        self.assertTrue(warmed.wait(10))
+
+        next_turn = self.make_turn_0_map(adv)
+        next_turn.game_map.add_unit("FF", [13, 13], 0)
+        self.assertEqual("candidates", worker.adopt(next_turn, timeout=10), "The result should be used when the board is as expected")
+        self.assertEqual(("candidates", None), (worker.result, worker.error))
+        self.assertIs(game.path_cache, next_turn.path_cache)
+        self.assertIs(game._threat_maps, next_turn._threat_maps)
+        self.assertEqual({0, 1}, set(next_turn._threat_maps), "Both threat maps should be warmed")
+        misses = next_turn.path_cache.misses
+        next_turn.find_path_to_edge([13, 0], next_turn.game_map.TOP_RIGHT)
+        self.assertEqual(misses, next_turn.path_cache.misses, "Paths found in the background should be reused")
+
+        warmed.clear()
+        worker = BackgroundWorker(game, task).start()
+        self.assertTrue(warmed.wait(10))
+        changed = self.make_turn_0_map(adv)
+        self.assertIsNone(worker.adopt(changed, timeout=10), "The result should be dropped when the board changed")
+        self.assertIs(game.path_cache, changed.path_cache, "Caches are keyed by layout, so they are still handed over")
+
+        def fail(game_state, stop_event):
+            warmed.set()
+            raise ValueError("no candidates")
+        warmed.clear()
+        worker = BackgroundWorker(game, fail).start()
+        self.assertTrue(warmed.wait(10))
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            self.assertIsNone(worker.adopt(self.make_turn_0_map(adv), timeout=10))
+        self.assertIsInstance(worker.error, ValueError)
+        self.assertEqual(["The background worker failed: no candidates"], [str(warning.message) for warning in caught])
+
+        core = AlgoCore()
+        core.prefetch(game)
+        self.assertIsNone(core.background, "Prefetching should be off unless enabled")
+        core.prefetch_enabled = True
+        core.prefetch(game)
+        self.assertIsInstance(core.background, BackgroundWorker)
+        core.adopt_prefetch(self.make_turn_0_map(adv))
+        self.assertIsNone(core.background)
+
+        stopped = threading.Event()
+        worker = BackgroundWorker(self.make_turn_0_map(adv))
+        calls = []
+        def find_paths_to_edge(starts, target_edge):
+            calls.append(starts)
+            worker.stop()
+            stopped.set()
+        worker.game_state.find_paths_to_edge = find_paths_to_edge
+        worker.start()
+        self.assertTrue(stopped.wait(10))
+        fresh = self.make_turn_0_map(adv)
+        worker.adopt(fresh, timeout=10)
+        self.assertEqual(1, len(calls), "The worker should stop within an edge")
+        self.assertLessEqual(len(calls[0]), 4)
+        self.assertEqual({}, fresh._threat_maps, "A stopped worker should not warm the threat maps")
+
+    def test_metrics(self, adv=False):
+        metrics = Metrics()
+        with metrics.timer("ignored"):
+            pass
+        metrics.start_turn(0)
+        with metrics.timer("pathfinding"):
+            time.sleep(0.01)
+        metrics.add_time("pathfinding", 0.5)
+        metrics.count("simulations", 3)
+        metrics.mark_submitted()
+        turn = metrics.end_turn()
+        self.assertEqual(["pathfinding"], list(turn["timers"]), "Timers should only record during a turn")
+        self.assertEqual(2, turn["timers"]["pathfinding"]["calls"])
+        self.assertGreater(turn["timers"]["pathfinding"]["seconds"], 0.51)
+        self.assertEqual({"simulations": 3}, turn["counters"])
+
+        metrics.record_engine_time(0, turn["latency"] + 0.1)
+        report = metrics.report()
+        self.assertEqual(1, report["turns"])
+        self.assertAlmostEqual(0.1, report["engine_overhead"]["p50"])
+        self.assertEqual(report["timers"]["pathfinding"]["p99"], report["timers"]["pathfinding"]["max"])
+
+        metrics.start_turn(1)
+        def background():
+            metrics.ignore_thread()
+            metrics.add_time("pathfinding", 1.)
+            metrics.count("simulations")
+        def watchdog():
+            metrics.count("submits")
+        for target in [background, watchdog]:
+            thread = threading.Thread(target=target)
+            thread.start()
+            thread.join()
+        turn = metrics.end_turn()
+        self.assertEqual({}, turn["timers"], "Ignored threads should not record")
+        self.assertEqual({"submits": 1}, turn["counters"], "Other threads should record")
+
+        game = self.make_turn_0_map(adv)
+        METRICS.start_turn(0)
+        try:
+            game.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT)
+            game.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT)
+            game.get_defense_line(0)
+            game.get_defense_line(0)
+        finally:
+            counters = METRICS.end_turn()["counters"]
+        self.assertEqual(1, counters["path_cache_hits"])
+        self.assertEqual(1, counters["path_cache_misses"])
+        self.assertEqual(1, counters["transposition_hits"])
+        self.assertEqual(1, counters["transposition_misses"])
+
+    def test_slow_turn_profiler(self, adv=False):
+        config = self.make_turn_0_map(adv).config
+        state = {"p1Units": [[] for _ in range(7)], "p2Units": [[] for _ in range(7)]}
+        board_hash = get_board_hash(state, config)
+        state["p1Units"][3].append([13, 0, 15.0, "7"])
+        self.assertEqual(board_hash, get_board_hash(state, config), "Information units should not change the board hash")
+        state["p1Units"][0].append([13, 13, 60.0, "8"])
+        self.assertNotEqual(board_hash, get_board_hash(state, config))
+
+        with tempfile.TemporaryDirectory() as directory:
+            profiler = SlowTurnProfiler(directory, threshold_ms=1000, keep=2, every=1)
+            profiler.start()
+            self.assertIsNone(profiler.stop(0, board_hash), "Fast turns should not be dumped")
+            for turn_number in range(1, 4):
+                profiler.start(time.perf_counter() - 2)
+                path = profiler.stop(turn_number, board_hash)
+                self.assertTrue(os.path.basename(path).startswith("turn-{:04d}-{}-".format(turn_number, board_hash)))
+            self.assertEqual(["turn-0002", "turn-0003"], sorted(name[:9] for name in os.listdir(directory)), "Only the newest dumps should be kept")
+
+        with tempfile.TemporaryDirectory() as directory:
+            profiler = SlowTurnProfiler(directory, threshold_ms=1000, every=3)
+            sampled = []
+            for turn_number, slow in enumerate([False, True, False, False, False]):
+                sampled.append(profiler.start(time.perf_counter() - (2 if slow else 0)))
+                profiler.stop(turn_number, board_hash)
+            self.assertEqual([True, False, True, True, False], sampled, "One turn in every and the turn after a slow one should be profiled")
+            self.assertEqual([], profiler.dumps, "Slow turns that were not profiled have nothing to dump")
+
+    def test_fork_and_snapshot(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game.game_map.add_unit("FF", [13, 13], 0)
+        game.game_map.add_unit("PI", [13, 0], 0)
+
+        fork = game.fork()
+        fork.attempt_spawn("DF", [14, 13])
+        fork.game_map.add_unit("PI", [13, 0], 0)
+        fork.game_map.remove_unit([13, 13])
+        self.assertEqual(1, len(game.game_map[13, 0]), "Changes to a fork should not leak into the original")
+        self.assertTrue(game.contains_stationary_unit([13, 13]))
+        self.assertFalse(game.contains_stationary_unit([14, 13]))
+        self.assertEqual([], game._build_stack)
+        self.assertEqual(25, game.get_resource(game.CORES))
+        self.assertEqual(2, len(fork.game_map[13, 0]))
+        game.game_map.add_unit("PI", [13, 0], 0)
+        self.assertEqual(2, len(fork.game_map[13, 0]), "Changes to the original should not leak into a fork")
+        with warnings.catch_warnings(record=True):
+            warnings.simplefilter("ignore")
+            self.assertFalse(fork._submit([], []), "A fork should never submit the turn")
+
+        snapshot = game.snapshot()
+        fingerprint = game.game_map.get_layout_fingerprint()
+        for _ in range(2):
+            game.attempt_spawn("DF", [[12, 13], [11, 13]])
+            game.game_map.add_unit("PI", [13, 0], 0)
+            game.restore(snapshot)
+            self.assertEqual(fingerprint, game.game_map.get_layout_fingerprint())
+            self.assertEqual(2, len(game.game_map[13, 0]))
+            self.assertEqual([], game._build_stack)
+            self.assertEqual(25, game.get_resource(game.CORES))
+
+    def test_unit_specs(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game.game_map.add_unit("DF", [13, 13], 0)
+        game.game_map.add_unit("DF", [14, 13], 1)
+        first, second = game.game_map[13, 13][0], game.game_map[14, 13][0]
+        self.assertIs(first.spec, second.spec, "Units of a type should share their spec")
+        self.assertIsInstance(first.spec, UnitSpec)
+        self.assertEqual((True, 0, 4, 3, 75), (first.stationary, first.speed, first.damage, first.range, first.max_stability))
+        self.assertFalse(hasattr(first, "damage_f"), "Firewalls have no damage to firewalls")
+        self.assertFalse(hasattr(first, "__dict__"))
+        with self.assertRaises(AttributeError):
+            first.spec.damage = 10
+        emp = GameUnit("EI", game.config, 1, 5.0, 13, 20)
+        self.assertEqual((False, 5.0, 1), (emp.stationary, emp.stability, emp.player_index))
+
+        first.damage = 10
+        self.assertEqual((10, 4), (first.damage, second.damage), "Setting a field should only change that unit")
+        self.assertEqual(3, first.range)
+
+        encryptor = GameUnit("EF", game.config)
+        self.assertEqual((True, 10), (encryptor.stationary, encryptor.damage), "Encryptors should deal their shield")
+        self.assertEqual(0, GameUnit("RM", game.config).max_stability)
+
+    def test_unit_indexes(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game_map = game.game_map
+        game_map.add_unit("FF", [13, 13], 0)
+        game_map.add_unit("FF", [10, 13], 0)
+        game_map.add_unit("DF", [14, 14], 1)
+        game_map.add_unit("PI", [13, 0], 0)
+        game_map.add_unit("PI", [13, 0], 0)
+        self.assertEqual([[10, 13], [13, 13]], game_map.get_locations_of("FF"))
+        self.assertEqual(1, game_map.count_locations_of("DF", 1))
+        self.assertEqual(0, game_map.count_locations_of("DF", 0))
+        self.assertEqual(frozenset([game_map.get_cell_index([13, 0])]), game_map.get_cell_indices_of("PI"))
+
+        game_map.add_unit("DF", [13, 13], 0)
+        game_map.remove_unit([13, 0])
+        self.assertEqual([[10, 13]], game_map.get_locations_of("FF"), "Replaced firewalls should leave the index")
+        self.assertEqual([], game_map.get_locations_of("PI"))
+        game_map[13, 1] = [GameUnit("EI", game.config, 1, None, 13, 1)]
+        scanned = [[list(location), game_map[location]] for location in game_map.get_self_arena() + game_map.get_enemy_arena() if game_map[location]]
+        self.assertEqual(sorted(scanned), sorted([list(pair) for pair in game_map.get_occupied()]))
+        self.assertFalse(game.contains_stationary_unit([13, 1]))
+        self.assertEqual("DF", game.contains_stationary_unit([13, 13]).unit_type)
+
+        snapshot = game.snapshot()
+        fork = game.fork()
+        fork.game_map.add_unit("FF", [12, 13], 0)
+        game_map.remove_unit([10, 13])
+        self.assertEqual([[10, 13], [12, 13]], fork.game_map.get_locations_of("FF"))
+        game.restore(snapshot)
+        self.assertEqual([[10, 13]], game_map.get_locations_of("FF"))
+
+    def test_zobrist_hash(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game_map = game.game_map
+        self.assertEqual(0, game_map.get_zobrist_hash())
+        game_map.add_unit("FF", [13, 13], 0)
+        game_map.add_unit("DF", [13, 14], 1)
+        board_hash = game_map.get_zobrist_hash()
+        enemy_hash = game_map.get_zobrist_hash(1)
+        game_map.add_unit("PI", [13, 0], 0)
+        self.assertEqual(board_hash, game_map.get_zobrist_hash(), "Information units are not part of the layout")
+        game_map.add_unit("EF", [13, 13], 0)
+        self.assertNotEqual(board_hash, game_map.get_zobrist_hash())
+        self.assertEqual(enemy_hash, game_map.get_zobrist_hash(1))
+        game_map.add_unit("FF", [13, 13], 0)
+        self.assertEqual(board_hash, game_map.get_zobrist_hash(), "Undoing a change should restore the hash")
+
+        other = self.make_turn_0_map(adv)
+        other.game_map.add_unit("DF", [13, 14], 1)
+        other.game_map.add_unit("FF", [13, 13], 0)
+        self.assertEqual(board_hash, other.game_map.get_zobrist_hash(), "The hash should not depend on the order units were added")
+
+    def test_memoize_defense_line(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game.game_map.add_unit("FF", [13, 14], 1)
+        line = game.get_defense_line(1)
+        self.assertEqual(1, game.transpositions.misses)
+
+        next_turn = self.make_turn_0_map(adv)
+        next_turn.transpositions = game.transpositions
+        next_turn.game_map.add_unit("FF", [13, 14], 1)
+        self.assertEqual(line, next_turn.get_defense_line(1), "The board did not change, so the line should be reused")
+        self.assertEqual(1, game.transpositions.hits)
+        next_turn.game_map.add_unit("FF", [12, 14], 1)
+        next_turn.get_defense_line(1)
+        self.assertEqual(2, game.transpositions.misses)
+
+        # Firewalls of either player block the line, so the other player's count too
+        game = self.make_turn_0_map(adv)
+        line = game.get_defense_line(0)
+        for x in range(10, 18):
+            game.game_map.add_unit("FF", [x, 11], 1)
+        fresh = self.make_turn_0_map(adv)
+        for x in range(10, 18):
+            fresh.game_map.add_unit("FF", [x, 11], 1)
+        self.assertEqual(fresh.get_defense_line(0), game.get_defense_line(0))
+        self.assertNotEqual(line, game.get_defense_line(0), "The other player's firewalls should change the line")
+
+    def test_transpositions_across_turns(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        core = AlgoCore()
+        state_type = AdvancedGameState if adv else GameState
+        turn_0 = state_type(game.config, game.serialized_string, transpositions=core.transpositions)
+        turn_0.game_map.add_unit("FF", [13, 14], 1)
+        line = turn_0.get_defense_line(1)
+
+        state = json.loads(game.serialized_string)
+        state["turnInfo"] = [0, 1, -1]
+        state["p2Units"][0].append([13, 14, 60.0, "3"])
+        turn_1 = state_type(game.config, json.dumps(state), transpositions=core.transpositions)
+        self.assertEqual(1, turn_1.turn_number)
+        self.assertEqual(line, turn_1.get_defense_line(1))
+        self.assertEqual((1, 1), (core.transpositions.hits, core.transpositions.misses), "The next turn should reuse the result")
+        self.assertIsNot(core.transpositions, GameState(game.config, game.serialized_string).transpositions)
+
+    def test_defense_lines(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        for x in range(28):
+            if x != 20:
+                game.game_map.add_unit("FF", [x, 14], 1)
+        (own_line, own_openings), (enemy_line, enemy_openings) = game.get_defense_lines()
+        self.assertEqual([(x, 14) for x in range(27, -1, -1)], enemy_line, "A full wall should be the cheapest line")
+        self.assertEqual([(20, 14)], enemy_openings)
+        self.assertEqual(28, len(own_openings), "An empty half is all openings")
+        self.assertEqual((27, 13), own_line[0])
+        self.assertEqual((0, 13), own_line[-1])
+
+    def test_plan_wall(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        for x in range(28):
+            if x != 5:
+                game.game_map.add_unit("DF", [x, 13], 0)
+        self.assertEqual({"locations": [[5, 13]], "cost": 1}, game.plan_wall())
+        self.assertEqual([[5, 12]], game.plan_wall(keep_open=[[5, 13]])["locations"], "Kept open cells should be walled behind")
+        game.set_shouldnot([[5, 13], [5, 12]])
+        self.assertEqual([[5, 11], [4, 12], [6, 12]], game.plan_wall()["locations"])
+        self.assertEqual(9, game.plan_wall("DF")["cost"], "Costs should follow the firewall type")
+
+        game = self.make_turn_0_map(adv)
+        sealed = game.plan_wall()
+        self.assertEqual(28, sealed["cost"])
+        funnel = game.plan_wall(funnel=[13, 8])
+        self.assertNotIn([13, 8], funnel["locations"])
+        for location in funnel["locations"]:
+            game.game_map.add_unit("FF", location, 0)
+        path = game.find_path_to_edge([14, 27], game.game_map.BOTTOM_LEFT)
+        self.assertIn([13, 8], path, "The only way through should be the funnel")
+
+    def test_pockets(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        for x in range(10):
+            game.game_map.add_unit("FF", [x, 13], 0)
+        for y in range(4, 12):
+            game.game_map.add_unit("FF", [10, y], 0)
+        pockets = game.get_pockets()
+        self.assertTrue(pockets.can_reach([15, 1], game.game_map.TOP_LEFT))
+        self.assertTrue(pockets.can_reach([9, 12], game.game_map.TOP_LEFT), "The pocket is open at [10, 12]")
+        self.assertFalse(pockets.can_reach([0, 13], game.game_map.TOP_LEFT), "Blocked cells reach nothing")
+
+        game.game_map.add_unit("FF", [10, 12], 0)
+        starts = [[4, 9], [15, 1], [10, 12]]
+        destructs = game.get_pockets().get_self_destructs(starts, game.game_map.TOP_LEFT)
+        self.assertEqual(None, destructs[1])
+        self.assertEqual(None, destructs[2])
+        self.assertEqual(game.find_path_to_edge([4, 9], game.game_map.TOP_LEFT)[-1], destructs[0])
+        self.assertEqual(destructs[0], pockets.get_ideal_tile([9, 12], game.game_map.TOP_LEFT))
+        self.assertTrue(pockets.can_reach([9, 12], game.game_map.BOTTOM_LEFT))
+
+    def test_pocket_repairs(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        repaired = PocketMap()
+        repaired.sync(game.game_map.get_layout_fingerprint())
+        locations = [[x, y] for x in range(28) for y in range(28) if game.game_map.in_arena_bounds([x, y])]
+        for i in range(150):
+            location = locations[(i * 97) % len(locations)]
+            if game.contains_stationary_unit(location):
+                game.game_map.remove_unit(location)
+            else:
+                game.game_map.add_unit("FF", location, 0 if location[1] < 14 else 1)
+            layout = game.game_map.get_layout_fingerprint()
+            repaired.sync(layout)
+            rebuilt = PocketMap()
+            rebuilt.sync(layout)
+            for edge in range(4):
+                for location in locations:
+                    self.assertEqual(rebuilt.can_reach(location, edge), repaired.can_reach(location, edge))
+                    self.assertEqual(rebuilt.get_ideal_tile(location, edge), repaired.get_ideal_tile(location, edge))
+
+    def test_get_all_targets(self, adv=False):
+        game = self.make_turn_0_map(True)
+        game.game_map.add_unit("DF", [13, 13], 0)
+        game.game_map.add_unit("FF", [13, 15], 1)
+        game.game_map.add_unit("SI", [12, 16], 1)
+        game.game_map.add_unit("PI", [14, 16], 1)
+        game.game_map.add_unit("PI", [14, 16], 1)
+        game.game_map[14, 16][0].stability = 5
+        scrambler, first, second = game.game_map[12, 16][0], game.game_map[14, 16][0], game.game_map[14, 16][1]
+        destructor = game.game_map[13, 13][0]
+
+        targets = game.get_all_targets()
+        self.assertEqual([(destructor, first), (scrambler, None), (first, destructor), (second, destructor)], targets,
+                         "Information units should come before nearer firewalls, then the lowest stability")
+        for attacker, target in targets:
+            self.assertIs(target, game.get_target(attacker))
+        game.game_map.remove_unit([14, 16])
+        self.assertIs(scrambler, game.get_target(destructor))
+        self.assertEqual([(destructor, scrambler)], game.get_all_targets(0))
+
+    def test_mobile_unit_index(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game.game_map.add_unit("PI", [13, 5], 1)
+        game.game_map.add_unit("EI", [13, 6], 1)
+        game.game_map.add_unit("SI", [20, 10], 1)
+        game.game_map.add_unit("PI", [14, 5], 0)
+        game.game_map.add_unit("DF", [13, 4], 1)
+        ping, emp, scrambler = game.game_map[13, 5][0], game.game_map[13, 6][0], game.game_map[20, 10][0]
+
+        self.assertEqual([ping, emp, scrambler], game.game_map.get_nearest_units([13, 4], 3, 1), "Firewalls are not indexed")
+        self.assertEqual([emp], game.game_map.get_nearest_units([13, 4], unit_type="EI"))
+        self.assertEqual([ping, emp], game.game_map.get_units_in_range([13, 4], 2.5, 1))
+        fork = game.game_map.fork()
+        moved = game.game_map.move_unit(scrambler, [13, 7])
+        self.assertEqual([], game.game_map[20, 10])
+        self.assertEqual([13, 7], [moved.x, moved.y])
+        self.assertEqual([ping, emp, moved], game.game_map.get_units_in_range([13, 4], 3, 1))
+        self.assertEqual([ping, emp], fork.get_units_in_range([13, 4], 3, 1), "Forks should keep their own index")
+        self.assertEqual([scrambler], fork.get_nearest_units([21, 10], 1, 1))
+        self.assertEqual([20, 10], [scrambler.x, scrambler.y], "Forks should keep the unit where it was")
+        game.game_map.remove_unit([13, 5])
+        self.assertEqual([emp, moved], game.game_map.get_nearest_units([13, 4], 5, 1))
+        self.assertEqual(game.game_map[14, 5][0], game.game_map.get_nearest_units([13, 4], 5, 0)[0])
+
+    def test_move_unit_copy_on_write(self, adv=False):
+        game_map = self.make_turn_0_map(adv).game_map
+        game_map.add_unit("PI", [13, 0], 0)
+        ping = game_map[13, 0][0]
+        self.assertIs(ping, game_map.move_unit(ping, [13, 1]), "Units no other map shares should move in place")
+        self.assertEqual([13, 1], [ping.x, ping.y])
+        self.assertIs(ping, game_map.move_unit(ping, [13, 0]))
+        fork = game_map.fork()
+        moved = fork.move_unit(fork[13, 0][0], [13, 1])
+        self.assertEqual([13, 1], [moved.x, moved.y])
+        self.assertEqual([ping], game_map[13, 0])
+        self.assertEqual([13, 0], [ping.x, ping.y], "Moving in a fork should not move the parent's unit")
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            self.assertIsNotNone(game_map.move_unit(ping, [14, 1]))
+        self.assertEqual([], caught)
+        self.assertEqual([moved], fork[13, 1])
+        self.assertIs(moved, fork.move_unit(moved, [13, 2]), "A copy belongs to the map that made it")
+
+        game_map = self.make_turn_0_map(adv).game_map
+        game_map.add_unit("PI", [13, 0], 0)
+        ping = game_map[13, 0][0]
+        self.assertEqual([ping], game_map.get_units_in_range([13, 0], 0))
+        snapshot = game_map.snapshot()
+        game_map.move_unit(ping, [13, 1])
+        self.assertEqual([], game_map.get_units_in_range([13, 0], 0))
+        game_map.restore(snapshot)
+        self.assertEqual([13, 0], [ping.x, ping.y], "Restoring should bring back the unit where it was")
+        self.assertEqual([ping], game_map[13, 0])
+        self.assertEqual([ping], game_map.get_units_in_range([13, 0], 0))
+        self.assertEqual([], game_map.get_units_in_range([13, 1], 0))
+
     def test_print_unit(self, adv=False):
         game = self.make_turn_0_map(adv)
 
@@ -0,0 +1,123 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .game_map import CELL_INDEX, NUM_CELLS, EMPTY, get_cell_indices_reaching
+
+
+class ThreatMap:
+    """Destructor coverage of every cell on the board for one defending player.
+
+    Each destructor's range is stamped into a flat array indexed by cell index (see GameMap.get_cell_index),
+    using NumPy when it is installed and plain lists otherwise.
+
+    Attributes:
+        * player_index (int): The defending player, 0 for you 1 for the enemy
+        * destructor_indices (tuple): The cell indices of the destructors attacking that player
+        * radius (float): The range of a destructor
+        * damage_per_hit (float): The damage a destructor deals every frame
+        * counts: The number of destructors threatening each cell
+        * damage: The damage per frame a unit standing on each cell would take
+
+    """
+    def __init__(self, player_index, destructor_indices, radius, damage_per_hit):
+        """Stamps the range of every destructor into the map
+
+        Args:
+            * player_index: The defending player
+            * destructor_indices: The cell indices of the destructors attacking that player
+            * radius: The range of a destructor
+            * damage_per_hit: The damage a destructor deals every frame
+
+        """
+        self.player_index = player_index
+        self.destructor_indices = tuple(destructor_indices)
+        self.radius = radius
+        self.damage_per_hit = damage_per_hit
+        stamps = [get_cell_indices_reaching(index, radius) for index in destructor_indices]
+        if np is not None:
+            covered = np.fromiter((i for stamp in stamps for i in stamp), dtype=np.intp)
+            self.counts = np.bincount(covered, minlength=NUM_CELLS)
+            self.damage = self.counts * float(damage_per_hit)
+        else:
+            counts = [0] * NUM_CELLS
+            for stamp in stamps:
+                for i in stamp:
+                    counts[i] += 1
+            self.counts = counts
+            self.damage = [count * float(damage_per_hit) for count in counts]
+
+    def adjusted(self, added=(), removed=()):
+        """Gets a copy of this map with some destructors added or removed, restamping only their ranges
+
+        Args:
+            * added: The cell indices of destructors to add
+            * removed: The cell indices of destructors to remove
+
+        Returns:
+            A new ThreatMap, this one is left unchanged
+
+        """
+        # Only stamp real changes, adding an existing destructor or removing a missing one does nothing
+        added = [index for index in dict.fromkeys(added) if index not in self.destructor_indices]
+        removed = [index for index in dict.fromkeys(removed) if index in self.destructor_indices]
+        threat = ThreatMap.__new__(ThreatMap)
+        threat.player_index = self.player_index
+        threat.radius = self.radius
+        threat.damage_per_hit = self.damage_per_hit
+        threat.destructor_indices = tuple([index for index in self.destructor_indices if index not in removed] + added)
+        counts = self.counts.copy() if np is not None else list(self.counts)
+        for indices, amount in [(added, 1), (removed, -1)]:
+            for index in indices:
+                for i in get_cell_indices_reaching(index, self.radius):
+                    counts[i] += amount
+        threat.counts = counts
+        if np is not None:
+            threat.damage = counts * float(self.damage_per_hit)
+        else:
+            threat.damage = [count * float(self.damage_per_hit) for count in counts]
+        return threat
+
+    def _indices(self, path):
+        return [CELL_INDEX.get(tuple(location), EMPTY) for location in path]
+
+    def count_at(self, location):
+        """Gets the number of destructors threatening a location, 0 if it is off the board
+        """
+        index = CELL_INDEX.get(tuple(location), EMPTY)
+        return 0 if index == EMPTY else int(self.counts[index])
+
+    def damage_at(self, location):
+        """Gets the damage per frame a unit at a location would take, 0 if it is off the board
+        """
+        index = CELL_INDEX.get(tuple(location), EMPTY)
+        return 0. if index == EMPTY else float(self.damage[index])
+
+    def path_damage(self, path):
+        """Gets the total damage per frame summed over every location of a path
+
+        Args:
+            * path: A list of locations, as returned by find_path_to_edge
+
+        Returns:
+            The sum of the per frame damage of each location, locations off the board count as 0
+
+        """
+        indices = [i for i in self._indices(path) if i != EMPTY]
+        if np is not None:
+            return float(self.damage[indices].sum())
+        damage = self.damage
+        return float(sum(damage[i] for i in indices))
+
+    def paths_damage(self, paths):
+        """Gets path_damage for each of several paths
+
+        Args:
+            * paths: A list of paths
+
+        Returns:
+            A list with the total per frame damage of each path
+
+        """
+        return [self.path_damage(path) for path in paths]
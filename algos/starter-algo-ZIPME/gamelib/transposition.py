@@ -0,0 +1,77 @@
+from collections import OrderedDict
+from .metrics import METRICS
+
+_MISSING = object()
+
+
+class TranspositionCache:
+    """A least recently used cache of results that only depend on the stationary units on the board
+
+    Entries are keyed by a query and a Zobrist hash from GameMap.get_zobrist_hash, so a result computed
+    on one turn is found again on any later turn, fork or snapshot whose board hashes the same.
+    Cached values are shared, so callers should copy mutable ones before changing them.
+
+    Attributes:
+        * max_size (int): The number of results kept before the least recently used one is evicted
+        * hits (int): The number of lookups that found a result
+        * misses (int): The number of lookups that did not
+
+    """
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key, default=None):
+        """Gets the cached result for a key, or default if there is none
+        """
+        value = self._entries.get(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            METRICS.count("transposition_misses")
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        METRICS.count("transposition_hits")
+        return value
+
+    def put(self, key, value):
+        """Caches the result for a key, evicting the least recently used result when full
+        """
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def memoize(self, key, compute):
+        """Gets the cached result for a key, computing and caching it on a miss
+
+        Args:
+            * key: The query and board hash, like ("defense_line", player_index, board_hash)
+            * compute: A function without arguments that computes the result
+
+        Returns:
+            The result
+
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        """Gets the hit and miss counters
+
+        Returns:
+            A dict with the number of hits, misses and cached results
+
+        """
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+    def __len__(self):
+        return len(self._entries)
@@ -1,12 +1,123 @@
+from operator import attrgetter
+
+
 def is_stationary(unit_type, firewall_types):
     return unit_type in firewall_types
 
+
+class UnitSpec:
+    """The attributes shared by every unit of a type, read once from the config
+
+    Fields that do not apply to the type are left unset, so reading them raises AttributeError like it 
+    does on a GameUnit. Specs are read only, since every unit of the type shares one, use replace to change one.
+    What kind of unit a type is comes from the fields of its config: only information units have a speed,
+    only encryptors a shieldAmount, and removals have no stability.
+
+    Attributes:
+        * unit_type (string): The type's shorthand
+        * config (JSON): Contains information about the game
+        * index (integer): The type's index in config["unitInformation"]
+        * stationary (bool): Whether or not the type is a firewall, unset for removals
+        * speed (float): A unit will move once every 1/speed frames
+        * damage (int): The amount of damage this firwall type will deal to enemy information, or shield for encryptors
+        * damage_f (int): The amount of damage this information type will deal to enemy firewalls
+        * damage_i (int): The amount of damage this information type will deal to enemy information
+        * range (float): The effective range of the type
+        * max_stability (float): The starting stability of the type
+        * cost (int): The resource cost of the type
+
+    """
+    __slots__ = ("unit_type", "config", "index", "stationary", "speed", "damage", "damage_f", "damage_i",
+                 "range", "max_stability", "cost")
+
+    def __init__(self, config, index):
+        type_config = config["unitInformation"][index]
+        fields = {"unit_type": type_config.get("shorthand"), "config": config, "index": index}
+        if "stability" not in type_config:
+            fields["max_stability"] = 0
+        else:
+            fields["stationary"] = "speed" not in type_config
+            if fields["stationary"]:
+                fields["speed"] = 0
+                fields["damage"] = type_config["shieldAmount"] if "shieldAmount" in type_config else type_config["damage"]
+            else:
+                fields["speed"] = type_config["speed"]
+                fields["damage_f"] = type_config["damageF"]
+                fields["damage_i"] = type_config["damageI"]
+            fields["range"] = type_config["range"]
+            fields["max_stability"] = type_config["stability"]
+            fields["cost"] = type_config["cost"]
+        for name, value in fields.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("UnitSpec is read only")
+
+    def replace(self, **fields):
+        """Copies the spec with some fields changed
+
+        Args:
+            * fields: The new value of each field to change, like damage=4
+
+        Returns:
+            The new UnitSpec, the original is unchanged
+
+        """
+        copy = UnitSpec.__new__(UnitSpec)
+        for name in UnitSpec.__slots__:
+            if name in fields:
+                object.__setattr__(copy, name, fields.pop(name))
+            elif hasattr(self, name):
+                object.__setattr__(copy, name, getattr(self, name))
+        if fields:
+            raise AttributeError("UnitSpec has no field {}".format(", ".join(fields)))
+        return copy
+
+    def __repr__(self):
+        return "UnitSpec({})".format(self.unit_type)
+
+
+_specs = (None, None)
+
+
+def get_unit_specs(config):
+    """Gets the UnitSpec of every unit type in a config
+
+    The table is built once per config and reused until a different config is passed in.
+
+    Args:
+        * config: The game config
+
+    Returns:
+        A dict mapping each type's shorthand to its UnitSpec
+
+    """
+    global _specs
+    cached_config, specs = _specs
+    if cached_config is not config:
+        specs = {spec.unit_type: spec for spec in (UnitSpec(config, index) for index in range(len(config["unitInformation"])))}
+        _specs = (config, specs)
+    return specs
+
+
+def _spec_field(name):
+    def set_field(unit, value):
+        # The spec is shared by every unit of the type, so the unit gets its own copy
+        unit.spec = unit.spec.replace(**{name: value})
+    return property(attrgetter("spec." + name), set_field, doc="Read from the unit's UnitSpec")
+
+
 class GameUnit:
     """Holds information about a Unit. 
 
+    The attributes shared by every unit of a type are read from its UnitSpec, 
+    the unit itself only holds its owner, location and stability. Setting one of them
+    gives the unit its own copy of the spec, leaving the other units of the type unchanged.
+
     Attributes:
         * unit_type (string): This unit's type
         * config (JSON): Contains information about the game
+        * spec (:obj: UnitSpec): The attributes of this unit's type
         * player_index (integer): The player that controls this unit. 0 for you, 1 for your opponent.
         * x (integer): The x coordinate of the unit
         * y (integer): The y coordinate of the unit
@@ -19,41 +130,35 @@ class GameUnit:
         * max_stability (float): The starting stability of this unit. Note than stability can be increased beyond this value by encryptors
         * stability (float): The current health of this unit
         * cost (int): The resource cost of this unit
+        * pending_removal (bool): Whether this firewall's owner flagged it for removal
 
     """
-    def __init__(self, unit_type, config, player_index=None, stability=None, x=-1, y=-1):
+    __slots__ = ("spec", "player_index", "x", "y", "stability", "pending_removal")
+
+    def __init__(self, unit_type, config, player_index=None, stability=None, x=-1, y=-1, spec=None):
         """ Initialize unit variables using args passed
 
+        Args:
+            * spec: The UnitSpec of unit_type, looked up from the config if not given
+
         """
-        self.unit_type = unit_type
-        self.config = config
+        self.spec = get_unit_specs(config)[unit_type] if spec is None else spec
         self.player_index = player_index
         self.pending_removal = False
         self.x = x
         self.y = y
-        self.__serialize_type()
-        self.stability = self.max_stability if not stability else stability
-
-    def __serialize_type(self):
-        from .game_state import FIREWALL_TYPES, UNIT_TYPE_TO_INDEX, ENCRYPTOR, REMOVE
-        if self.unit_type == REMOVE:
-            self.max_stability = 0
-            return
-        self.stationary = is_stationary(self.unit_type, FIREWALL_TYPES)
-        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[self.unit_type]]
-        if self.stationary:
-            self.speed = 0
-            if self.unit_type == ENCRYPTOR:
-                self.damage = type_config["shieldAmount"]
-            else:
-                self.damage = type_config["damage"]
-        else:
-            self.speed = type_config["speed"]
-            self.damage_f = type_config["damageF"]
-            self.damage_i = type_config["damageI"]
-        self.range = type_config["range"]
-        self.max_stability = type_config["stability"]
-        self.cost = type_config["cost"]
+        self.stability = self.spec.max_stability if not stability else stability
+
+    unit_type = _spec_field("unit_type")
+    config = _spec_field("config")
+    stationary = _spec_field("stationary")
+    speed = _spec_field("speed")
+    damage = _spec_field("damage")
+    damage_f = _spec_field("damage_f")
+    damage_i = _spec_field("damage_i")
+    range = _spec_field("range")
+    max_stability = _spec_field("max_stability")
+    cost = _spec_field("cost")
 
     def __toString(self):
         owner = "Friendly" if self.player_index == 0 else "Enemy"
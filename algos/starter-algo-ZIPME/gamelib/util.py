@@ -1,4 +1,17 @@
 import sys
+import json
+
+# Use a faster json decoder when one is installed, they all return the same plain dicts and lists
+try:
+    from orjson import loads as _fast_loads
+    JSON_DECODER = "orjson"
+except ImportError:
+    try:
+        from ujson import loads as _fast_loads
+        JSON_DECODER = "ujson"
+    except ImportError:
+        _fast_loads = json.loads
+        JSON_DECODER = "json"
 
 
 BANNER_TEXT = "---------------- Starting Your Algo --------------------"
@@ -21,6 +34,18 @@ def get_command():
         exit()
     return ret
 
+def decode_json(string):
+    """Decodes a json string with the fastest decoder available
+
+    Args:
+        * string: The json string
+
+    Returns:
+        The decoded object
+
+    """
+    return _fast_loads(string)
+
 def send_command(cmd):
     """Sends your turn to standard output.
     Should usually only be called by 'GameState.submit_turn()'